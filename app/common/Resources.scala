@@ -1,9 +1,12 @@
 package common
 
+import java.io.{File, IOException}
+import java.nio.file.{Files, Paths}
 import java.util
 
-import com.typesafe.config.{Config, ConfigObject}
-import game.Gameboard
+import akka.util.ByteString
+import com.typesafe.config.{Config, ConfigException, ConfigFactory, ConfigObject}
+import game.{Gameboard, GameboardBinary, GameboardGraph, GameboardHitGrid, GameboardTopology}
 import game.mode.GameMode
 import models._
 import play.api.data.Form
@@ -68,6 +71,7 @@ object Resources {
     val MaximumPlayers = "app.gameplay.maxPlayers"
     val SkirmishInitialArmy = "app.gameplay.skirmish.initialArmy"
     var SkirmishGameboard = "app.gameplay.skirmish.gameboard"
+    val SkirmishGameboardFile = "app.gameplay.skirmish.gameboardFile"
     val SkirmishReinforcementDivisor = "app.gameplay.skirmish.reinforcementDivisor"
     val SkirmishReinforcementBase = "app.gameplay.skirmish.reinforcementBase"
     val DiceFaces = "app.gameplay.skirmish.diceFaces"
@@ -113,6 +117,8 @@ object Resources {
   var MaximumPlayers: Int = _
   var SkirmishInitialArmy: Int = _
   var SkirmishGameboard: Gameboard = _
+  /** The binary gameboard, if the skirmish gameboard was loaded from one */
+  var SkirmishGameboardBinary: Option[ByteString] = None
   var SkirmishReinforcementDivisor: Int = _
   var SkirmishReinforcementBase: Int = _
   var DiceFaces: Int = _
@@ -169,9 +175,17 @@ object Resources {
         config.get[String](Resources.ConfigKeys.GameMode))
         .asSubclass(classOf[GameMode])
         .getDeclaredConstructor().newInstance()
-      Resources.SkirmishGameboard = loadGameboard(unwrapOrThrow(
-        config.getOptional[Configuration](Resources.ConfigKeys.SkirmishGameboard),
-        Resources.ConfigKeys.SkirmishGameboard))
+      config.getOptional[String](Resources.ConfigKeys.SkirmishGameboardFile) match {
+        case Some(path) =>
+          val (gameboard, binary) = loadGameboardFile(path)
+          Resources.SkirmishGameboard = gameboard
+          Resources.SkirmishGameboardBinary = binary
+        case None =>
+          Resources.SkirmishGameboard = loadGameboard(unwrapOrThrow(
+            config.getOptional[Configuration](Resources.ConfigKeys.SkirmishGameboard),
+            Resources.ConfigKeys.SkirmishGameboard))
+          Resources.SkirmishGameboardBinary = None
+      }
       Resources.SkirmishReinforcementDivisor = config.get[Int](Resources.ConfigKeys.SkirmishReinforcementDivisor)
       Resources.SkirmishReinforcementBase = config.get[Int](Resources.ConfigKeys.SkirmishReinforcementBase)
       Resources.DiceFaces = config.get[Int](Resources.ConfigKeys.DiceFaces)
@@ -181,6 +195,27 @@ object Resources {
     }
   }
 
+  /**
+    * Loads a Gameboard object from a map encoder output file, either the
+    * binary format (.bin) or the json output
+    * @param path The path to the gameboard file
+    * @return A deserialized Gameboard object, along with the file contents if
+    *         it was in the binary format
+    * @throws ConfigLoadException if the file could not be read or parsed
+    */
+  @throws[ConfigLoadException]
+  def loadGameboardFile(path: String): (Gameboard, Option[ByteString]) =
+    try {
+      if (path.endsWith(".bin")) {
+        val bytes = Files.readAllBytes(Paths.get(path))
+        (GameboardBinary.decode(bytes), Some(ByteString(bytes)))
+      } else {
+        (loadGameboard(Configuration(ConfigFactory.parseFile(new File(path)))), None)
+      }
+    } catch {
+      case _: IOException | _: IllegalArgumentException | _: ConfigException => throw ConfigLoadException(path)
+    }
+
   /**
     * Parses a Gameboard object from its sub-config
     * @param configuration The sub-config with all gameboard keys at root level
@@ -193,33 +228,80 @@ object Resources {
     val waterConnections: Seq[Connection] = configList("waterConnections").map(parseConnection)
     val regions: Seq[Inclusive] = getAbTuples("regions").map { case (a, b) => a to b }
     val edgeList: Seq[(Int, Int)] = getAbTuples("edges")
-    val nodes: Seq[Node] = configList("nodes")
+    val connections: Map[Int, Set[Int]] = edgeList
+      .flatMap { case (a, b) => Seq(a -> b, b -> a) }
+      .groupBy(_._1)
+      .map { case (node, pairs) => node -> pairs.map(_._2).toSet }
+    val nodeConfigs: Seq[Config] = configList("nodes")
       .sortWith((c1, c2) => c1.getInt("node") < c2.getInt("node"))
-      .map(parseNode(_, edgeList))
+    // territories written as shared arcs have their path data built back up
+    val arcPaths: Seq[Option[String]] = get("topology", (c, k) => parseTopology(c.getConfig(k), nodeConfigs))
+      .getOrElse(nodeConfigs.map(_ => None))
+    val nodes: Seq[Node] = nodeConfigs.zip(arcPaths).map { case (c, path) => parseNode(c, connections, path) }
     val size: Location = getLocation("size")
-    Gameboard(nodes, regions, waterConnections, size)
+    val lodTolerances: Seq[Float] = get("lodTolerances", (c, k) =>
+      c.getDoubleList(k).asScala.map(_.toFloat).toVector).getOrElse(Nil)
+    val graph: Option[GameboardGraph] = get("graph", (c, k) => parseGraph(c.getConfig(k)))
+    val hitGrid: Option[GameboardHitGrid] = get("hitGrid", (c, k) => parseHitGrid(c.getConfig(k), nodeConfigs))
+    Gameboard(nodes, regions, waterConnections, size, lodTolerances, graph, hitGrid)
   }
 
   /**
     * Parses a single node object from its specific sub-config
     * @param config The sub-config with all node keys at root level
-    * @param edges The list of node connections used to include in node metadata
+    * @param connections The land connections of every node, used to include
+    *                    in node metadata
+    * @param arcPath The path data built from the shared arcs the node
+    *                references, if it has no path data of its own
     * @return A deserialized Node object
     * @throws ConfigLoadException if parsing fails
     */
   @throws[ConfigLoadException]
-  def parseNode(config: Config, edges: Seq[(Int, Int)]): Node = {
+  def parseNode(config: Config, connections: Map[Int, Set[Int]], arcPath: Option[String] = None): Node = {
     val i         = config.getInt("node")
-    val data      = config.getString("data")
+    val data      = arcPath.getOrElse(config.getString("data"))
     val iconData  = config.getString("iconData")
     val center    = getLocation("center", ("x", "y"))(config)
     val castle    = get("castle", (conf, key) => getLocation(key, ("x", "y"))(conf))(config)
-    val connected = edges.flatMap {
-      case (a, b) if a == i => Some(b)
-      case (a, b) if b == i => Some(a)
-      case _                => None
-    }
-    Node(data, iconData, center, Territory(connected.toSet, castle))
+    val lod       = get("lod", (conf, key) => conf.getStringList(key).asScala.toVector)(config)
+    Node(data, iconData, center, Territory(connections.getOrElse(i, Set()), castle), lod.getOrElse(Nil))
+  }
+
+  /**
+    * Builds the path data of nodes written as shared arcs by the map encoder
+    * @param config The sub-config with all topology keys at root level
+    * @param nodes The sub-configs of every node, in order
+    * @return The path data of each node referencing arcs, None for the others
+    */
+  def parseTopology(config: Config, nodes: Seq[Config]): Seq[Option[String]] = {
+    val arcs = config.getStringList("arcs").asScala.toVector
+    val referencing = nodes.filter(_.hasPath("arcs"))
+    val paths = GameboardTopology.decode(arcs, config.getInt("places"),
+      referencing.map(_.getStringList("arcs").asScala.toVector)).iterator
+    nodes.map(node => if (node.hasPath("arcs")) Some(paths.next()) else None)
+  }
+
+  /**
+    * Parses the precomputed connection graph written by the map encoder
+    * @param config The sub-config with all graph keys at root level
+    * @return A deserialized GameboardGraph object
+    */
+  def parseGraph(config: Config): GameboardGraph = {
+    def ints(key: String): IndexedSeq[Int] = config.getIntList(key).asScala.map(_.toInt).toVector
+    GameboardGraph(ints("offsets"), ints("neighbours"), ints("components"), ints("borders").toSet)
+  }
+
+  /**
+    * Parses the hit testing grid written by the map encoder
+    * @param config The sub-config with all hit grid keys at root level
+    * @param nodes The sub-configs of every node, in order, holding their bounds
+    * @return A deserialized GameboardHitGrid object
+    */
+  def parseHitGrid(config: Config, nodes: Seq[Config]): GameboardHitGrid = {
+    def ints(key: String): IndexedSeq[Int] = config.getIntList(key).asScala.map(_.toInt).toVector
+    val bounds = nodes.map(_.getDoubleList("bounds").asScala.map(_.toFloat).toVector).toVector
+    GameboardHitGrid(config.getDouble("width").toFloat, config.getDouble("height").toFloat,
+      config.getInt("columns"), config.getInt("rows"), ints("offsets"), ints("territories"), bounds)
   }
 
   /**
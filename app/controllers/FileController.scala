@@ -1,10 +1,15 @@
 package controllers
 
-import java.io.File
+import java.io.{File, FileInputStream}
 import common.Resources
 import common.Resources.StatusCodes
-import play.api.mvc.{Action, AnyContent, MessagesBaseController, MessagesControllerComponents}
+import play.api.libs.json.{JsValue, Json}
+import play.api.mvc.{Action, AnyContent, MessagesBaseController, MessagesControllerComponents,
+  RequestHeader, Result}
+import scala.annotation.tailrec
+import scala.collection.concurrent.TrieMap
 import scala.concurrent.ExecutionContext
+import scala.util.control.NonFatal
 
 /**
   * Instantiated controller to handle file requests, child object of a
@@ -13,6 +18,20 @@ import scala.concurrent.ExecutionContext
 class FileController(val controllerComponents: MessagesControllerComponents)
     extends MessagesBaseController {
   val Wildcard = "."
+  /** Manifest listing the hash and precompressed copies of the files in its
+    * directory and below, written by transform-docs.py */
+  val AssetManifestFile = "asset-manifest.json"
+  /** Extension of the precompressed copy of a file by content encoding, in
+    * order of preference */
+  val CompressedExtensions: Seq[(String, String)] = Seq("br" -> ".br", "gzip" -> ".gz")
+  /** Cache headers for files with a known hash, revalidated by their ETag */
+  val RevalidateCacheControl = "no-cache"
+
+  /** Represents a file listed in an asset manifest */
+  case class Asset(hash: String, encodings: Seq[String])
+
+  /** Parsed asset manifests with their modification times, by path */
+  val assetManifests: TrieMap[String, (Long, Map[String, Asset])] = TrieMap()
 
   /**
     * Builds a path by removing the first folder if it exists
@@ -149,6 +168,105 @@ class FileController(val controllerComponents: MessagesControllerComponents)
     }
   }
 
+  /**
+    * Finds the asset manifest entry of a file, from the closest manifest in
+    * its directory or one of its parents
+    * @param file The (relative) file to look up
+    * @return the entry, or None if no manifest lists the file
+    */
+  def findAsset(file: File): Option[Asset] = {
+    @tailrec
+    def search(directory: File, key: String): Option[Asset] =
+      if (directory == null) {
+        None
+      } else {
+        val manifest = new File(directory, AssetManifestFile)
+        if (manifest.isFile) {
+          loadAssetManifest(manifest).get(key)
+        } else {
+          search(directory.getParentFile, s"${directory.getName}/$key")
+        }
+      }
+    search(file.getParentFile, file.getName)
+  }
+
+  /**
+    * Loads an asset manifest, reusing the parsed manifest until the file is
+    * modified
+    * @param manifest The manifest file
+    * @return the manifest's entries by path relative to its directory, or
+    *         an empty map if it could not be read
+    */
+  def loadAssetManifest(manifest: File): Map[String, Asset] = {
+    val modified = manifest.lastModified
+    assetManifests.get(manifest.getPath) match {
+      case Some((time, assets)) if time == modified => assets
+      case _ =>
+        val assets = parseAssetManifest(manifest)
+        assetManifests.put(manifest.getPath, (modified, assets))
+        assets
+    }
+  }
+
+  def parseAssetManifest(manifest: File): Map[String, Asset] =
+    try {
+      val stream = new FileInputStream(manifest)
+      try {
+        Json.parse(stream).asOpt[Map[String, JsValue]].getOrElse(Map()).flatMap {
+          case (key, entry) =>
+            for {
+              hash <- (entry \ "hash").asOpt[String]
+              encodings <- (entry \ "encodings").asOpt[Seq[String]]
+            } yield key -> Asset(hash, encodings)
+        }
+      } finally {
+        stream.close()
+      }
+    } catch {
+      case NonFatal(_) => Map()
+    }
+
+  /**
+    * Determines whether a request accepts a content encoding, ignoring
+    * encodings it gives a quality of 0
+    * @param encoding The content encoding
+    * @param request The request to check the Accept-Encoding headers of
+    * @return true if the encoding is accepted
+    */
+  def acceptsEncoding(encoding: String)(implicit request: RequestHeader): Boolean =
+    request.headers.getAll(ACCEPT_ENCODING).flatMap(_.split(',')).exists { coding =>
+      val parts = coding.split(';').map(_.trim.toLowerCase)
+      (parts.head == encoding || parts.head == "*") && !parts.tail.exists(_.matches("q\\s*=\\s*0(\\.0*)?"))
+    }
+
+  /**
+    * Sends a resolved file. Files listed in an asset manifest are sent as
+    * the precompressed copy matching the request's Accept-Encoding if there
+    * is one, tagged with their hash so that clients can revalidate them
+    * @param file The file to send
+    * @param request The request for the file
+    * @return the response
+    */
+  def serveFile(file: File)(implicit request: RequestHeader, ec: ExecutionContext): Result =
+    findAsset(file) match {
+      case None => Ok.sendFile(file)
+      case Some(asset) =>
+        // every encoding of the file is the same content
+        val etag = "W/\"" + asset.hash + "\""
+        val headers = Seq(ETAG -> etag, CACHE_CONTROL -> RevalidateCacheControl, VARY -> ACCEPT_ENCODING)
+        if (request.headers.get(IF_NONE_MATCH).exists(_.split(',').map(_.trim).contains(etag))) {
+          NotModified.withHeaders(headers: _*)
+        } else {
+          CompressedExtensions.collectFirst {
+            case (encoding, extension) if asset.encodings.contains(encoding) && acceptsEncoding(encoding) &&
+              new File(file.getPath + extension).isFile =>
+              // typed by the original file's name rather than the copy's
+              Ok.sendFile(new File(file.getPath + extension), fileName = _ => file.getName)
+                .withHeaders(CONTENT_ENCODING -> encoding)
+          }.getOrElse(Ok.sendFile(file)).withHeaders(headers: _*)
+        }
+    }
+
   /**
     * Router method to route file requests (default) to their proper targets
     * @param path The raw file path included with the HTTP request
@@ -156,10 +274,10 @@ class FileController(val controllerComponents: MessagesControllerComponents)
     *         or the actual file (if it was successfully resolved)
     */
   def route(path: String)(implicit ec: ExecutionContext): Action[AnyContent] =
-    Action {
+    Action { implicit request =>
       resolveFile(path) match {
         case Error(m, c) => ErrorHandler.renderErrorPage(c, m)
-        case ResolvedFile(file) => Ok.sendFile(file)
+        case ResolvedFile(file) => serveFile(file)
         case UrlRedirect(to) => Redirect(to)
       }
     }
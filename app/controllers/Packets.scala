@@ -1,6 +1,7 @@
 package controllers
 
 import akka.actor.ActorRef
+import akka.util.ByteString
 import RequestResponse.Response
 import game.Gameboard
 import game.state.{GameState, PlayerState}
@@ -64,6 +65,8 @@ case class PingPlayer(identity: String = "ping") extends OutPacket
 case class SendConfig(config: String) extends OutPacket
 /** Sends the Gameboard object parsed from the data/maps folder */
 case class SendGameboard(gameboard: Gameboard) extends OutPacket
+/** Sends the binary Gameboard from the data/maps folder as a binary frame */
+case class SendBinaryGameboard(data: ByteString) extends OutPacket
 /** Updates the gamestate of the gameboard (all territories) */
 case class UpdateBoardState(armies: Map[Int, (Int, Int)]) extends OutPacket
 
@@ -7,10 +7,14 @@ import akka.stream.scaladsl.{Flow, GraphDSL, Merge, Sink, Source}
 import common.Resources
 import models.Player
 import play.api.Logger
+import play.api.http.websocket.{BinaryMessage, CloseCodes, CloseMessage, Message, TextMessage,
+  WebSocketCloseException}
+import play.api.libs.json.{JsError, JsSuccess, Json}
 import play.api.mvc.{MessagesBaseController, MessagesControllerComponents, WebSocket}
 import play.api.mvc.WebSocket.MessageFlowTransformer
 
 import scala.concurrent.{ExecutionContext, Future}
+import scala.util.Try
 
 class WebSocketController(val controllerComponents: MessagesControllerComponents,
                           val gameSupervisor: ActorRef)
@@ -58,10 +62,37 @@ class WebSocketController(val controllerComponents: MessagesControllerComponents
   /**
     * Uses <code>JsonMarshallers</code> to transform incoming websocket JSON
     * to InPackets, and outgoing OutPackets to outgoing websocket JSON implicitly
-    * within the actor flow
+    * within the actor flow. Binary gameboards are sent as they are, in binary
+    * frames, instead of being encoded into JSON
     */
   implicit val messageFlowTransformer: MessageFlowTransformer[InPacket, OutPacket] =
-    MessageFlowTransformer.jsonMessageFlowTransformer[InPacket, OutPacket]
+    new MessageFlowTransformer[InPacket, OutPacket] {
+      override def transform(flow: Flow[InPacket, OutPacket, _]): Flow[Message, Message, _] =
+        Flow[Message].collect {
+          case TextMessage(text)   => parsePacket(text)
+          case BinaryMessage(data) => parsePacket(data.utf8String)
+        }.via(flow).map {
+          case SendBinaryGameboard(data) => BinaryMessage(data)
+          case packet                    => TextMessage(Json.stringify(Json.toJson(packet)))
+        }
+    }
+
+  /**
+    * Parses an incoming websocket message as an InPacket, closing the
+    * connection (as the JSON message flow transformer does) if it is not one
+    * @param text The text of the message
+    * @return The parsed packet
+    * @throws WebSocketCloseException if the message is not a valid InPacket
+    */
+  @throws[WebSocketCloseException]
+  def parsePacket(text: String): InPacket =
+    Try(Json.parse(text)).map(_.validate[InPacket]).toOption match {
+      case Some(JsSuccess(packet, _)) => packet
+      case Some(JsError(errors)) => throw WebSocketCloseException(
+        CloseMessage(Some(CloseCodes.Unacceptable), Json.stringify(JsError.toJson(errors))))
+      case None => throw WebSocketCloseException(
+        CloseMessage(Some(CloseCodes.Unacceptable), "Unable to parse json message"))
+    }
   /** Defines the creation method for ActorRefs that get attached to player DTOs */
   val playerActorSource: Source[OutPacket, ActorRef] =
     Source.actorRef[OutPacket](Resources.IncomingPacketBufferSize, OverflowStrategy.fail)
@@ -1,7 +1,7 @@
 package controllers.format
 
 import controllers._
-import game.Gameboard
+import game.{Gameboard, GameboardGraph, GameboardHitGrid}
 import game.state.{PlayerState, TurnState}
 import models._
 import play.api.libs.json.{JsString, Json, Reads, Writes}
@@ -26,6 +26,8 @@ object JsonMarshallers {
   implicit val territoryW: Writes[Territory] = Json.writes[Territory]
   implicit val connectionW: Writes[Connection] = Json.writes[Connection]
   implicit val nodeW: Writes[Node] = Json.writes[Node]
+  implicit val gameboardGraphW: Writes[GameboardGraph] = Json.writes[GameboardGraph]
+  implicit val gameboardHitGridW: Writes[GameboardHitGrid] = Json.writes[GameboardHitGrid]
   implicit val gameboardW: Writes[Gameboard] = Json.writes[Gameboard]
 
   // Deserializers
@@ -51,6 +53,9 @@ object JsonMarshallers {
   implicit val pingPlayer: Writes[PingPlayer] = Json.writes[PingPlayer]
   implicit val sendConfig: Writes[SendConfig] = Json.writes[SendConfig]
   implicit val sendGameboard: Writes[SendGameboard] = Json.writes[SendGameboard]
+  // Sent as a binary frame rather than as json (see WebSocketController)
+  implicit val sendBinaryGameboard: Writes[SendBinaryGameboard] =
+    new UndefinedWriter[SendBinaryGameboard]("SendBinaryGameboard")
   implicit val updateBoardState: Writes[UpdateBoardState] = Json.writes[UpdateBoardState]
 
   // Trait marshallers
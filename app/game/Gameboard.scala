@@ -12,9 +12,19 @@ import scala.collection.immutable.Range.Inclusive
   * @param waterConnections The water connections that exist on the map,
   *                         including optional display information
   * @param size             The bounds (width/height) of the gameboard
+  * @param lodTolerances    The error bound (in gameboard units) of each level
+  *                         of detail tier of the node paths, from finest to
+  *                         coarsest
+  * @param graph            The precomputed connection graph, if the map
+  *                         encoder included one
+  * @param hitGrid          The index of node bounds for finding the nodes
+  *                         under a point, if the map encoder included one
   */
 case class Gameboard(nodes: Seq[Node], regions: Seq[Inclusive],
-                     waterConnections: Seq[Connection], size: Location) {
+                     waterConnections: Seq[Connection], size: Location,
+                     lodTolerances: Seq[Float] = Nil,
+                     graph: Option[GameboardGraph] = None,
+                     hitGrid: Option[GameboardHitGrid] = None) {
   /**
     * @return The size of the nodes list
     */
@@ -0,0 +1,190 @@
+package game
+
+import java.nio.charset.StandardCharsets
+import java.nio.{BufferUnderflowException, ByteBuffer, ByteOrder}
+
+import models.{Connection, Location, Node, Territory}
+
+import scala.collection.immutable.Range.Inclusive
+
+/**
+  * Loads gameboards from the compact binary format written alongside the json
+  * output by the map encoder (see data/gameboard.py for the layout)
+  */
+object GameboardBinary {
+  /** Leading bytes of every binary gameboard */
+  val Magic: Array[Byte] = "RSKB".getBytes(StandardCharsets.US_ASCII)
+  /** Version of the binary format this object can read */
+  val Version: Int = 5
+
+  /**
+    * Decodes a Gameboard from its binary representation. Land connections
+    * are gathered from the edge list in a single pass
+    * @param data The encoded gameboard
+    * @return A deserialized Gameboard object
+    * @throws IllegalArgumentException if the data is not a valid binary gameboard
+    */
+  @throws[IllegalArgumentException]
+  def decode(data: Array[Byte]): Gameboard = {
+    val buffer = ByteBuffer.wrap(data).order(ByteOrder.LITTLE_ENDIAN)
+    try {
+      val magic = new Array[Byte](Magic.length)
+      buffer.get(magic)
+      require(magic.sameElements(Magic) && buffer.get() == Version,
+        s"Not a version $Version binary gameboard")
+      val nodeCount   = buffer.getInt
+      val edgeCount   = buffer.getInt
+      val waterCount  = buffer.getInt
+      val regionCount = buffer.getInt
+      val size        = readLocation(buffer)
+
+      val centers     = Array.fill(nodeCount)(readLocation(buffer))
+      val castleFlags = Array.fill(nodeCount)(buffer.get() != 0)
+      val castles     = Array.fill(castleFlags.count(identity))(readLocation(buffer)).iterator
+      val paths       = Array.fill(nodeCount) {
+        val path = readPath(buffer)
+        (path, readPath(buffer))
+      }
+
+      val connections = Array.fill(nodeCount)(Set.newBuilder[Int])
+      for (_ <- 0 until edgeCount) {
+        val a = buffer.getInt
+        val b = buffer.getInt
+        connections(a) += b
+        connections(b) += a
+      }
+      val regions: Seq[Inclusive] = Vector.fill(regionCount) {
+        val first = buffer.getInt
+        first to buffer.getInt
+      }
+      val waterConnections: Seq[Connection] = Vector.fill(waterCount) {
+        val a = buffer.getInt
+        val b = buffer.getInt
+        val tension = buffer.getFloat
+        val midpoints = Vector.fill(readVarint(buffer).toInt) {
+          val x = buffer.getFloat
+          (x, buffer.getFloat)
+        }
+        Connection(a, b, midpoints, bz = false, tension)
+      }
+
+      val graph = readGraph(buffer, nodeCount)
+
+      val lodTolerances = Vector.fill(buffer.get() & 0xFF)(buffer.getFloat)
+      val lodPaths = Array.fill(nodeCount)(Vector.fill(lodTolerances.length)(readPath(buffer)))
+
+      val hitGrid = readHitGrid(buffer, nodeCount)
+
+      val nodes: Seq[Node] = (0 until nodeCount).map { i =>
+        val (path, iconPath) = paths(i)
+        val castle = if (castleFlags(i)) Some(castles.next()) else None
+        Node(path, iconPath, centers(i), Territory(connections(i).result(), castle), lodPaths(i))
+      }
+      Gameboard(nodes, regions, waterConnections, size, lodTolerances, Some(graph), Some(hitGrid))
+    } catch {
+      case _: BufferUnderflowException | _: IndexOutOfBoundsException =>
+        throw new IllegalArgumentException("Truncated or corrupt binary gameboard")
+    }
+  }
+
+  /**
+    * Reads the precomputed connection graph section
+    * @param buffer The buffer to read from
+    * @param nodeCount The number of nodes on the gameboard
+    * @return The read GameboardGraph
+    */
+  private def readGraph(buffer: ByteBuffer, nodeCount: Int): GameboardGraph = {
+    val offsets = Vector.fill(nodeCount + 1)(buffer.getInt)
+    val neighbours = Vector.fill(offsets.last)(buffer.getInt)
+    val components = Vector.fill(nodeCount)(buffer.getInt)
+    val borders = Vector.fill(readVarint(buffer).toInt)(buffer.getInt).toSet
+    GameboardGraph(offsets, neighbours, components, borders)
+  }
+
+  /**
+    * Reads the node bounds and the hit testing grid indexing them
+    * @param buffer The buffer to read from
+    * @param nodeCount The number of nodes on the gameboard
+    * @return The read GameboardHitGrid
+    */
+  private def readHitGrid(buffer: ByteBuffer, nodeCount: Int): GameboardHitGrid = {
+    val bounds = Vector.fill(nodeCount, 4)(buffer.getFloat)
+    val width = buffer.getFloat
+    val height = buffer.getFloat
+    val columns = buffer.getInt
+    val rows = buffer.getInt
+    val offsets = Vector.fill(columns * rows + 1)(buffer.getInt)
+    val territories = Vector.fill(offsets.last)(buffer.getInt)
+    GameboardHitGrid(width, height, columns, rows, offsets, territories, bounds)
+  }
+
+  /**
+    * Reads a pair of floats as a Location
+    * @param buffer The buffer to read from
+    * @return The read Location
+    */
+  private def readLocation(buffer: ByteBuffer): Location = {
+    val a = buffer.getFloat
+    Location(a, buffer.getFloat)
+  }
+
+  /**
+    * Reads a single path, writing its numbers back out the same way as the
+    * map encoder's path minifier
+    * @param buffer The buffer to read from
+    * @return The svg path data string
+    */
+  private def readPath(buffer: ByteBuffer): String = {
+    val commands = Array.fill(readVarint(buffer).toInt) {
+      val command = (buffer.get() & 0xFF).toChar
+      (command, readVarint(buffer).toInt)
+    }
+    val builder = new StringBuilder
+    for ((command, count) <- commands) {
+      builder += command
+      for (i <- 0 until count) {
+        val value = readVarint(buffer)
+        val negative = (value & 0x8) != 0
+        // numbers are only separated when they would otherwise run together
+        if (i > 0 && !negative) builder += ' '
+        if (negative) builder += '-'
+        appendFixedPoint(builder, value >>> 4, (value & 0x7).toInt)
+      }
+    }
+    builder.toString
+  }
+
+  /**
+    * Writes out an unsigned fixed point number
+    * @param builder The builder to append to
+    * @param digits The digits of the number, without the decimal point
+    * @param decimals The number of digits after the decimal point
+    */
+  private def appendFixedPoint(builder: StringBuilder, digits: Long, decimals: Int): Unit = {
+    val text = digits.toString
+    if (decimals == 0) {
+      builder ++= text
+    } else {
+      val padded = "0" * (decimals + 1 - text.length) + text
+      val point = padded.length - decimals
+      builder ++= padded.substring(0, point) += '.' ++= padded.substring(point)
+    }
+  }
+
+  /**
+    * Reads an unsigned LEB128 varint
+    * @param buffer The buffer to read from
+    * @return The read value
+    */
+  private def readVarint(buffer: ByteBuffer): Long = {
+    var value = 0L
+    var shift = 0
+    var byte = 0
+    do {
+      byte = buffer.get() & 0xFF
+      value |= (byte & 0x7FL) << shift
+      shift += 7
+    } while (byte >= 0x80)
+    value
+  }
+}
@@ -0,0 +1,68 @@
+package game
+
+import scala.collection.mutable
+
+/**
+  * Connection graph of a gameboard covering both land edges and water
+  * connections, precomputed by the map encoder (see data/graph.py)
+  *
+  * @param offsets    Compressed sparse row offsets; the neighbours of node i
+  *                   are neighbours(offsets(i)) until neighbours(offsets(i + 1))
+  * @param neighbours The sorted neighbours of every node, in node order
+  * @param components The connected component index of each node
+  * @param borders    The nodes that neighbour a node in another region
+  */
+case class GameboardGraph(offsets: IndexedSeq[Int], neighbours: IndexedSeq[Int],
+                          components: IndexedSeq[Int], borders: Set[Int]) {
+  /**
+    * @return The number of nodes in the graph
+    */
+  def nodeCount: Int = offsets.length - 1
+
+  /**
+    * Gets the neighbours of a node over land or water
+    * @param node The index of the node
+    * @return The sorted indices of its neighbours
+    */
+  def neighboursOf(node: Int): IndexedSeq[Int] = neighbours.slice(offsets(node), offsets(node + 1))
+
+  /**
+    * Determines whether there is any path between two nodes
+    * @param a The index of the first node
+    * @param b The index of the second node
+    * @return True if both nodes are in the same connected component
+    */
+  def isConnected(a: Int, b: Int): Boolean = components(a) == components(b)
+
+  /**
+    * Determines whether a node neighbours a node in another region
+    * @param node The index of the node
+    * @return True if the node is on the border of its region
+    */
+  def isBorder(node: Int): Boolean = borders.contains(node)
+
+  /**
+    * Finds the hop distance between two nodes with a breadth first search
+    * over the adjacency arrays
+    * @param a The index of the first node
+    * @param b The index of the second node
+    * @return Some(distance) if the nodes are connected, None otherwise
+    */
+  def distance(a: Int, b: Int): Option[Int] =
+    if (!isConnected(a, b)) {
+      None
+    } else {
+      val hops = Array.fill(nodeCount)(-1)
+      val queue = mutable.Queue(a)
+      hops(a) = 0
+      // both nodes are in the same component, so the search reaches b
+      while (hops(b) == -1) {
+        val node = queue.dequeue()
+        for (neighbour <- neighboursOf(node) if hops(neighbour) == -1) {
+          hops(neighbour) = hops(node) + 1
+          queue.enqueue(neighbour)
+        }
+      }
+      Some(hops(b))
+    }
+}
@@ -0,0 +1,38 @@
+package game
+
+/**
+  * Uniform grid over the gameboard indexing the bounding box of every node,
+  * built by the map encoder (see data/hittest.py) to quickly find the nodes
+  * under a point
+  *
+  * @param width       The width of the area covered by the grid
+  * @param height      The height of the area covered by the grid
+  * @param columns     The number of cells across the grid
+  * @param rows        The number of cells down the grid
+  * @param offsets     Compressed sparse row offsets; the candidates of cell
+  *                    i = row * columns + column are territories(offsets(i))
+  *                    until territories(offsets(i + 1))
+  * @param territories The sorted nodes whose bounds overlap each cell, in cell
+  *                    order
+  * @param bounds      The (x min, y min, x max, y max) bounding box of each node
+  */
+case class GameboardHitGrid(width: Float, height: Float, columns: Int, rows: Int,
+                            offsets: IndexedSeq[Int], territories: IndexedSeq[Int],
+                            bounds: IndexedSeq[IndexedSeq[Float]]) {
+  /**
+    * Finds the nodes whose bounding box contains a point, which are the only
+    * nodes whose path can contain it
+    * @param x The x coordinate of the point
+    * @param y The y coordinate of the point
+    * @return The sorted indices of the candidate nodes
+    */
+  def candidatesAt(x: Float, y: Float): IndexedSeq[Int] = {
+    val column = math.min(math.max(math.floor(x * columns / width).toInt, 0), columns - 1)
+    val row = math.min(math.max(math.floor(y * rows / height).toInt, 0), rows - 1)
+    val cell = row * columns + column
+    territories.slice(offsets(cell), offsets(cell + 1)).filter { node =>
+      val box = bounds(node)
+      box(0) <= x && x <= box(2) && box(1) <= y && y <= box(3)
+    }
+  }
+}
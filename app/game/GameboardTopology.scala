@@ -0,0 +1,161 @@
+package game
+
+import scala.collection.mutable
+
+/**
+  * Builds territory path data from the shared border (arc topology) output
+  * of the map encoder (see data/topology.py). Territories reference the arcs
+  * that make up each of their rings, and the path data is written out the
+  * same way as the encoder writes it
+  */
+object GameboardTopology {
+  /** A path segment as its start, control and end points in 10^-places units */
+  type Segment = IndexedSeq[(Long, Long)]
+
+  /** Command letters and numbers used in arc path data */
+  private val Token = "([Mhvlcs])|(-?[0-9]+(?:\\.[0-9]+)?)".r
+  /** Numbers read by each repetition of an arc command */
+  private val CommandSizes = Map('h' -> 1, 'v' -> 1, 'l' -> 2, 's' -> 4, 'c' -> 6)
+
+  /**
+    * Builds the path data of territories from the shared arcs
+    * @param arcs           The path data of each shared arc
+    * @param places         The number of decimal places the arcs are snapped to
+    * @param territoryRings The rings of each territory, as strings of space
+    *                       separated arc references (~i for arc i reversed)
+    * @return The path data of each territory
+    */
+  def decode(arcs: IndexedSeq[String], places: Int, territoryRings: Seq[Seq[String]]): Seq[String] = {
+    val scale = math.pow(10, places)
+    val parsed = arcs.map(parseArc(_, scale))
+    territoryRings.map(_.map { ring =>
+      val segments = ring.split(' ').filter(_.nonEmpty).map(_.toInt).toSeq.flatMap { ref =>
+        if (ref >= 0) parsed(ref) else reverse(parsed(~ref))
+      }
+      formatSegments(segments, places) + "z"
+    }.mkString)
+  }
+
+  /**
+    * Reverses the direction of a chain of segments
+    * @param segments The segments to reverse
+    * @return The segments from the end of the chain back to its start
+    */
+  private def reverse(segments: IndexedSeq[Segment]): IndexedSeq[Segment] =
+    segments.reverseMap(_.reverse)
+
+  /**
+    * Reads an arc's path data back into its segments
+    * @param arc The arc's path data
+    * @param scale The number of units per map unit
+    * @return The segments of the arc
+    */
+  private def parseArc(arc: String, scale: Double): IndexedSeq[Segment] = {
+    val segments = mutable.ArrayBuffer[Segment]()
+    val values = mutable.ArrayBuffer[Long]()
+    var current = (0L, 0L)
+    var command = ' '
+
+    def readCommand(): Unit = command match {
+      case 'M' => current = (values(0), values(1))
+      case ' ' =>
+      case _ =>
+        val size = CommandSizes(command)
+        for (i <- values.indices by size) {
+          val (x, y) = current
+          val points: IndexedSeq[(Long, Long)] = command match {
+            case 'h' => Vector((x + values(i), y))
+            case 'v' => Vector((x, y + values(i)))
+            case _ =>
+              val absolute = (i until i + size by 2).map(j => (x + values(j), y + values(j + 1)))
+              if (command == 's') {
+                // reflect the previous curve's second control point
+                val (controlX, controlY) = segments.last(2)
+                (x + x - controlX, y + y - controlY) +: absolute
+              } else absolute
+          }
+          segments += current +: points
+          current = points.last
+        }
+    }
+
+    for (token <- Token.findAllMatchIn(arc)) {
+      if (token.group(1) != null) {
+        readCommand()
+        command = token.group(1).head
+        values.clear()
+      } else {
+        values += math.round(token.group(2).toDouble * scale)
+      }
+    }
+    readCommand()
+    segments.toVector
+  }
+
+  /**
+    * Writes a chain of segments as an absolute move followed by relative
+    * commands, using the h, v and s shorthands where they apply
+    * @param segments The segments to write
+    * @param places The number of decimal places of the coordinates
+    * @return The path data of the chain
+    */
+  private def formatSegments(segments: Seq[Segment], places: Int): String = {
+    val builder = new StringBuilder
+    val (startX, startY) = segments.head.head
+    builder += 'M'
+    appendNumbers(builder, Seq(startX, startY), places)
+    var command = ' '
+    val numbers = mutable.ArrayBuffer[Long]()
+    var previous: Option[Segment] = None
+    for (segment <- segments) {
+      val (x0, y0) = segment.head
+      val deltas = segment.tail.map { case (x, y) => (x - x0, y - y0) }
+      val (segmentCommand, values) =
+        if (segment.length == 2) {
+          val (dx, dy) = deltas.head
+          if (dy == 0) ('h', Seq(dx)) else if (dx == 0) ('v', Seq(dy)) else ('l', Seq(dx, dy))
+        } else if (previous.exists(p => p.length == 4 &&
+          deltas.head == (p(3)._1 - p(2)._1, p(3)._2 - p(2)._2))) {
+          ('s', deltas.tail.flatMap { case (dx, dy) => Seq(dx, dy) })
+        } else {
+          ('c', deltas.flatMap { case (dx, dy) => Seq(dx, dy) })
+        }
+      if (segmentCommand != command) {
+        if (numbers.nonEmpty) {
+          builder += command
+          appendNumbers(builder, numbers, places)
+        }
+        command = segmentCommand
+        numbers.clear()
+      }
+      numbers ++= values
+      previous = Some(segment)
+    }
+    builder += command
+    appendNumbers(builder, numbers, places)
+    builder.toString
+  }
+
+  /**
+    * Writes out numbers, only separating them when they would otherwise run
+    * together
+    * @param builder The builder to append to
+    * @param numbers The numbers in 10^-places units
+    * @param places The number of decimal places of the numbers
+    */
+  private def appendNumbers(builder: StringBuilder, numbers: Seq[Long], places: Int): Unit =
+    for ((number, i) <- numbers.zipWithIndex) {
+      if (i > 0 && number >= 0) builder += ' '
+      if (number < 0) builder += '-'
+      val text = math.abs(number).toString
+      if (places == 0) {
+        builder ++= text
+      } else {
+        val padded = "0" * (places + 1 - text.length) + text
+        val point = padded.length - places
+        val fraction = padded.substring(point).reverse.dropWhile(_ == '0').reverse
+        builder ++= padded.substring(0, point)
+        if (fraction.nonEmpty) builder += '.' ++= fraction
+      }
+    }
+}
@@ -3,7 +3,7 @@ package game.mode
 import actors.PlayerWithActor
 import common.{Impure, Pure}
 import controllers._
-import game.GameContext
+import game.{GameContext, Gameboard}
 import game.state.GameState
 
 import scala.util.Random
@@ -36,13 +36,22 @@ trait GameMode {
     // Call initialize game hook
     val processedContext = hookInitializeGame(GameContext(state))
     GameContext(processedContext.state)
-      .thenBroadcast(SendGameboard(processedContext.state.gameboard))
+      .thenBroadcast(gameboardPacket(processedContext.state.gameboard))
       .thenBroadcast(UpdatePlayerState(processedContext.state))
       .thenBroadcast(UpdateBoardState(processedContext.state))
       // Send all other format spawned from the hook
       .thenSendAll(processedContext)
   }
 
+  /**
+    * Creates the packet used to broadcast the chosen gameboard upon start
+    *
+    * @param gameboard The gameboard of the game being started
+    * @return An outgoing packet containing the gameboard
+    */
+  @Pure
+  def gameboardPacket(gameboard: Gameboard): OutPacket = SendGameboard(gameboard)
+
   /**
     * Assigns turn order of each player based on their position of joining
     * (first player is the host)
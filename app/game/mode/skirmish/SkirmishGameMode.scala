@@ -18,6 +18,14 @@ class SkirmishGameMode extends GameMode {
   /** GameMode-specific gameboard, loaded through Resource injection */
   lazy val gameboard: Gameboard = Resources.SkirmishGameboard
 
+  @Pure
+  override def gameboardPacket(board: Gameboard): OutPacket =
+    Resources.SkirmishGameboardBinary match {
+      // The pre-encoded binary is only valid for the gameboard it was loaded from
+      case Some(data) if board eq gameboard => SendBinaryGameboard(data)
+      case _                                => super.gameboardPacket(board)
+    }
+
   @Impure.Nondeterministic
   override def hookInitializeGame(implicit context: GameContext): GameContext = {
     import game.mode.skirmish.InitializationHandler._
@@ -10,5 +10,8 @@ package models
   *               get rendered)
   * @param dto The data object giving critical information about its functional
   *            properties
+  * @param lodPaths Simplified data paths of the svg path, one for each level
+  *                 of detail tier of the gameboard
   */
-case class Node(path: String, iconPath: String, center: Location, dto: Territory)
+case class Node(path: String, iconPath: String, center: Location, dto: Territory,
+                lodPaths: Seq[String] = Nil)
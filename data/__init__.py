@@ -0,0 +1,11 @@
+__author__      = "Joseph Azevedo"
+
+"""
+data
+----
+Map tooling: encoder.py converts the svg maps in source/ into the gameboards
+in maps/, using the geometry, graph and output modules beside it. The modules
+import each other relative to this package, so the encoder can be imported
+from anywhere (as data.encoder, with the repository root on sys.path) or run
+as a script from this directory
+"""
@@ -0,0 +1,81 @@
+from itertools import chain
+from collections import defaultdict
+from .geometry import parse_segments
+
+__author__      = "Joseph Azevedo"
+
+"""
+adjacency.py
+------------
+Land adjacency inferred from territory geometry, as an alternative (or a
+check) to the edge lines drawn in the svg. Every outline is cut into its
+segments, with coordinates quantised to a fixed number of decimal places,
+and each segment is hashed (in whichever direction it is drawn) to the
+territories drawing it. Territories sharing any segment of border are
+linked, in a single pass over the segments rather than by testing every pair
+of polygons against each other.
+
+Shared borders are only found where both territories draw them with the same
+vertices (as in exported maps and those from generate.py); territories that
+only meet at a corner share no segment and are not linked
+"""
+
+# Drawn and inferred links listed by each line of a difference report
+REPORT_LIMIT = 12
+
+
+def infer_links(paths, places):
+    """
+    Finds the pairs of paths whose outlines share at least one segment,
+    returning the sorted (a, b) links (with a < b) and the number of paths
+    that could not be split into segments (they use arcs or quadratic curves)
+    """
+    scale = 10 ** places
+    owners = defaultdict(set)
+    unsupported = 0
+    for territory, path_data in enumerate(paths):
+        segments = parse_segments(path_data)
+        if not segments:
+            unsupported += 1
+            continue
+        for _, coords in segments:
+            owners[segment_key(coords, scale)].add(territory)
+    # segments that snap to a single point join territories meeting at a corner
+    owners.pop(None, None)
+    links = set()
+    for territories in owners.values():
+        if len(territories) > 1:
+            ordered = sorted(territories)
+            links.update((a, b) for i, a in enumerate(ordered) for b in ordered[i + 1:])
+    return sorted(links), unsupported
+
+
+def segment_key(coords, scale):
+    """
+    Quantises the flat (x, y) coordinates of a segment's points to units of
+    1 / scale, as the same tuple whichever direction it is drawn in (the
+    lesser of its points forwards and backwards, as topology.canonical), or
+    None if every point snaps to the same one
+    """
+    points = [round(value * scale) for value in coords]
+    xs, ys = points[0::2], points[1::2]
+    if xs.count(xs[0]) == len(xs) and ys.count(ys[0]) == len(ys):
+        return None
+    return min(tuple(points), tuple(chain.from_iterable(zip(reversed(xs), reversed(ys)))))
+
+
+def diff_links(drawn, inferred):
+    """
+    Compares drawn (a, b) links with inferred ones regardless of their
+    direction, returning the sorted links that were drawn but not inferred
+    (missing from the borders) and inferred but not drawn (extra). Self loops
+    are ignored
+    """
+    drawn = {(min(a, b), max(a, b)) for a, b in drawn if a != b}
+    inferred = {(min(a, b), max(a, b)) for a, b in inferred if a != b}
+    return sorted(drawn - inferred), sorted(inferred - drawn)
+
+
+def format_links(links):
+    listed = ', '.join('{}-{}'.format(a, b) for a, b in links[:REPORT_LIMIT])
+    return listed + (', ...' if len(links) > REPORT_LIMIT else '')
@@ -0,0 +1,945 @@
+import io
+import os
+import re
+import sys
+import math
+import random
+import timeit
+import tempfile
+import contextlib
+import tracemalloc
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree.ElementTree import iterparse
+
+if not __package__:
+    # run as a script rather than imported from the data package: import the
+    # package from its parent directory instead, so that the modules loaded
+    # from it resolve relative to this file and none of them is importable
+    # under its bare name
+    _directory = os.path.dirname(os.path.abspath(__file__))
+    sys.path = [os.path.dirname(_directory) if os.path.abspath(entry or '.') == _directory else entry
+                for entry in sys.path]
+    __package__ = os.path.basename(_directory)
+
+__author__      = "Joseph Azevedo"
+
+"""
+benchmark.py
+------------
+Micro-benchmarks for the map encoder. Each benchmark first checks that the
+optimized code produces exactly the same output as the reference route it
+replaces, then reports the timings of both.
+"""
+
+HELP = """
+benchmark.py
+
+Usage:
+  benchmark.py <benchmark> [options]
+
+Benchmarks:
+  icons    Batch icon normalization (geometry.fit_paths) against the
+           per-path svgpathtools route
+  numbers  Single-pass number rounding (minify.round_numbers) against the
+           previous round_numbers, pretty_float and remove_exp passes
+  minify   Path minification (minify.minify_path) against scour's cleanPath,
+           over every path in the source svg and synthetic territories.
+           Requires scour to be installed
+  stages   Times each stage of encoding synthetic maps of increasing size
+           (see generate.py), reporting throughput and the peak memory each
+           stage allocates on top of what it starts with
+  binary   Binary gameboard encoding (gameboard.py) of an encoded map,
+           checking that it decodes back to the json output and comparing
+           its size and write time with the json
+  topology Shared border encoding (topology.py) of the source svg and a
+           synthetic map, checking that every decoded territory matches
+           its cleaned path data and re-encodes to the same arcs, and
+           comparing its size and time with cleaning each path
+  hittest  Point to territory lookup through the hit testing grid
+           (hittest.py) of a synthetic map, checking that it finds the
+           same territories as testing the point against every territory
+  precision
+           Precision tuning (precision.py) of the source svg and a
+           synthetic map, checking that every tuned territory stays within
+           the error bound of its source when both are flattened, and
+           comparing the control polygon error metric with the distance
+           between flattened outlines
+  adjacency
+           Edge inference from shared borders (adjacency.py) of a
+           synthetic map, checking that it finds exactly the drawn edges,
+           reporting how much slower it is than snapping the drawn edge
+           lines and comparing it with testing every pair of outlines for a
+           shared segment; also reports how the source svg's drawn edges
+           differ from its borders
+  startup  Cold start of encoder.py, checking that importing it loads none
+           of the geometry dependencies (through python -X importtime)
+           and that a run over maps that are all up to date finishes
+           within the startup budget, against a run with them imported
+
+Options:
+  -h --help            Show this help description
+  --territories N      Number of synthetic territories (default 500)
+  --vertices N         Vertices per synthetic territory (default 200, or
+                       24 for stages)
+  --repeat N           Number of timed runs to keep the best of (default 3,
+                       or 1 for stages)
+  --sizes N,N,...      Territories per map for stages
+                       (default 50,200,1000,5000,20000)
+  --no-memory          Skip measuring the memory of each stage (tracing
+                       allocations slows the stages down several times)
+  --threads N          Threads for the concurrent minify run (default 4)
+  --points N           Random points to look up for hittest (default 2000)
+  --max-error E        Error bound in map units for precision (default 0.5)
+  --source FILE        Source svg for the minify and topology benchmarks,
+                       whose directory is encoded for startup
+                       (default source/skirmish.svg)
+  --map FILE           Encoded json map for the binary benchmark
+                       (default maps/skirmish.json)"""
+
+SEED = 2340
+MINIFY_ACCURACIES = [2, 3, 4, 5]
+DEFAULT_SOURCE = 'source/skirmish.svg'
+DEFAULT_MAP = 'maps/skirmish.json'
+STAGE_SIZES = '50,200,1000,5000,20000'
+ROUNDING_PLACES = [0, 2, 4]
+# Largest distance (in map units) that a territory decoded from its shared arcs
+# may be from its cleaned path data, on top of how far the cleaned path data
+# itself strays from the source (it rounds to significant digits)
+TOPOLOGY_TOLERANCE = 0.05
+# Largest distance (in map units) that the flattened outline of a territory
+# tuned for precision may stray from its source beyond the error bound, since
+# the error metric measures control polygons rather than flattened curves
+PRECISION_TOLERANCE = 0.02
+# (text, places, expected) cases for minify.round_numbers. Exponents are rounded
+# like any other number, where the previous passes rounded their mantissa alone
+# (9.7e-05 became 10e-05 at no places) and then zeroed some of them
+GOLDEN_NUMBERS = [
+    ('M 10.5,20.25 L 30.123456,40.0', 4, 'M 10.5,20.25 L 30.1235,40'),
+    ('M 10.5,20.25 L 30.123456,40.0', 0, 'M 10,20 L 30,40'),
+    ('C 1.00001,2.99999 100.0,0.5', 4, 'C 1,3 100,0.5'),
+    ('-0.00001,-0.00004', 4, '-0,-0'),
+    ('-0.00005,0.00015', 4, '-0.0001,0.0001'),
+    ('0.125 0.375', 2, '0.12 0.38'),
+    ('.5 .05', 1, '0.5 0.1'),
+    ('7 42 1000 007', 2, '7 42 1000 007'),
+    ('1.5.25', 1, '1.50.2'),
+    ('123.456', 2, '123.46'),
+    ('99.999', 2, '100'),
+    ('1.5e-05,2.5', 4, '0,2.5'),
+    ('5.3e-05 9.7e-05', 4, '0.0001 0.0001'),
+    ('9.7e-05', 0, '0'),
+    ('-3.2e-07 4', 4, '-0 4'),
+    ('1e-05', 4, '0'),
+    ('2.5e-3', 4, '0.0025'),
+    ('1.2e+16', 2, '12000000000000000'),
+    ('1E+2', 2, '100'),
+    ('', 4, ''),
+    ('M z', 4, 'M z'),
+]
+# Modules that importing the encoder must not load (they take most of a second)
+HEAVY_MODULES = ['numpy', 'scipy', 'svgpathtools']
+# Modules encoding a map imports, loaded up front by the eager startup run
+EAGER_MODULES = ['svgpathtools', 'adjacency', 'gameboard', 'hittest', 'precision', 'topology']
+# Seconds a run of the encoder over up to date maps may take, interpreter included
+STARTUP_BUDGET = 0.1
+NUMBER_REGEX = re.compile(r'-?[0-9]*\.?[0-9]+(?:e-?[0-9]+)?')
+
+
+def main():
+    if len(sys.argv) < 2 or '--help' in sys.argv or '-h' in sys.argv:
+        print(HELP)
+        quit()
+    name = sys.argv[1]
+    if name not in BENCHMARKS:
+        print('Unknown benchmark {}'.format(name))
+        print(HELP)
+        quit()
+    BENCHMARKS[name]()
+
+
+def string_option(name, default):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return default
+
+
+def option(name, default):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return int(sys.argv[index + 1])
+    return default
+
+
+def best_time(function, repeat):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def report(label, reference_time, optimized_time, count, unit):
+    print('{}:'.format(label))
+    print('    - reference: {:.3f} s ({:.0f} {}/s)'.format(
+        reference_time, count / reference_time, unit))
+    print('    - optimized: {:.3f} s ({:.0f} {}/s)'.format(
+        optimized_time, count / optimized_time, unit))
+    print('    - speedup:   {:.1f}x'.format(reference_time / optimized_time))
+
+
+def synthetic_path(rng, vertices):
+    """
+    Builds a closed, roughly star-shaped territory outline mixing straight and
+    curved segments, written with relative commands like cleaned path data
+    """
+    cx = rng.uniform(100, 900)
+    cy = rng.uniform(100, 700)
+    points = []
+    for i in range(vertices):
+        angle = 2 * math.pi * i / vertices
+        radius = rng.uniform(20, 60)
+        points.append((cx + radius * math.cos(angle), cy + radius * math.sin(angle)))
+    parts = ['m{:.4f},{:.4f}'.format(*points[0])]
+    for (x0, y0), (x1, y1) in zip(points, points[1:]):
+        dx, dy = x1 - x0, y1 - y0
+        if rng.random() < 0.5:
+            parts.append('l{:.4f},{:.4f}'.format(dx, dy))
+        else:
+            parts.append('c{:.4f},{:.4f} {:.4f},{:.4f} {:.4f},{:.4f}'.format(
+                dx / 3 + rng.uniform(-2, 2), dy / 3 + rng.uniform(-2, 2),
+                2 * dx / 3 + rng.uniform(-2, 2), 2 * dy / 3 + rng.uniform(-2, 2), dx, dy))
+    parts.append('z')
+    return ''.join(parts)
+
+
+def reference_fit(data, size):
+    from svgpathtools import parse_path
+    from svgpathtools.path import translate, scale
+    path = parse_path(data)
+    x_min, x_max, y_min, y_max = path.bbox()
+    w = x_max - x_min
+    h = y_max - y_min
+    k = min(size / w, size / h)
+    origin = translate(path, complex(-x_min, -y_min))
+    normalized = scale(origin, k)
+    offset = ((size - (w * k)) / 2, (size - (h * k)) / 2)
+    return translate(normalized, complex(*offset)).d()
+
+
+def benchmark_icons():
+    from .geometry import fit_paths
+    territories = option('--territories', 500)
+    vertices = option('--vertices', 200)
+    repeat = option('--repeat', 3)
+    rng = random.Random(SEED)
+    paths = [synthetic_path(rng, vertices) for _ in range(territories)]
+
+    expected = [reference_fit(data, 100) for data in paths]
+    actual = fit_paths(paths, 100)
+    mismatches = sum(1 for e, a in zip(expected, actual) if e != a)
+    if mismatches:
+        print('Icon normalization differs from svgpathtools for {} of {} paths'
+              .format(mismatches, territories))
+        sys.exit(1)
+
+    reference_time = best_time(lambda: [reference_fit(data, 100) for data in paths], repeat)
+    optimized_time = best_time(lambda: fit_paths(paths, 100), repeat)
+    report('Icon normalization ({} territories x {} vertices)'.format(territories, vertices),
+           reference_time, optimized_time, territories, 'territories')
+
+
+def reference_round_numbers(text, places):
+    import decimal
+
+    def pretty_float(num):
+        try:
+            dec = decimal.Decimal(num)
+        except decimal.InvalidOperation:
+            return 'bad'
+        tup = dec.as_tuple()
+        delta = len(tup.digits) + tup.exponent
+        digits = ''.join(str(d) for d in tup.digits)
+        if delta <= 0:
+            zeros = abs(tup.exponent) - len(tup.digits)
+            val = '0.' + ('0'*zeros) + digits
+        else:
+            val = digits[:delta] + ('0'*tup.exponent) + '.' + digits[delta:]
+        val = val.rstrip('0')
+        if val[-1] == '.':
+            val = val[:-1]
+        if tup.sign:
+            return '-' + val
+        return val
+
+    def round_match(match):
+        return pretty_float(("{:." + str(places) + "f}").format(float(match.group())))
+    rounded = re.sub(r"\d*\.\d+", round_match, text)
+    return re.sub('([0-9]+(?:[.][0-9]+)(?:e-([0-9]+))+)', '0', rounded)
+
+
+def synthetic_numbers(rng, count):
+    """
+    Builds absolute path data from random floats written as python writes them,
+    including the occasional tiny coordinate in exponent form
+    """
+    values = [rng.uniform(-1000, 1000) if rng.random() < 0.98 else rng.uniform(-1e-4, 1e-4)
+              for _ in range(2 * count)]
+    return 'M ' + ' L '.join('{},{}'.format(x, y) for x, y in zip(values[::2], values[1::2]))
+
+
+def benchmark_numbers():
+    from .minify import round_numbers
+    territories = option('--territories', 500)
+    vertices = option('--vertices', 200)
+    repeat = option('--repeat', 3)
+    for text, places, expected in GOLDEN_NUMBERS:
+        actual = round_numbers(text, places)
+        if actual != expected:
+            print('round_numbers({!r}, {}) returned {!r} instead of {!r}'
+                  .format(text, places, actual, expected))
+            sys.exit(1)
+
+    rng = random.Random(SEED)
+    texts = source_paths(string_option('--source', DEFAULT_SOURCE))
+    texts += [synthetic_numbers(rng, vertices) for _ in range(territories)]
+    cases = [(text, places) for text in texts for places in ROUNDING_PLACES]
+    for text, places in cases:
+        actual = round_numbers(text, places)
+        expected = reference_round_numbers(text, places)
+        # the previous passes mishandled exponents; those are covered above
+        if 'e' in actual or (actual != expected and 'e' not in text):
+            print('round_numbers differs from the previous passes for {!r} at {} places'
+                  .format(text[:80], places))
+            sys.exit(1)
+    print('Rounded {} golden cases and {} path strings as expected'
+          .format(len(GOLDEN_NUMBERS), len(cases)))
+
+    reference_time = best_time(
+        lambda: [reference_round_numbers(text, places) for text, places in cases], repeat)
+    optimized_time = best_time(lambda: [round_numbers(text, places) for text, places in cases],
+                               repeat)
+    report('Number rounding ({} path strings)'.format(len(cases)),
+           reference_time, optimized_time, len(cases), 'paths')
+
+
+def source_paths(source_path):
+    """
+    Collects the path data of every path and polygon in an svg file, both as
+    written and in the absolute form svgpathtools serializes before cleaning
+    """
+    from svgpathtools import parse_path
+    paths = []
+    for _, element in iterparse(source_path):
+        tag = element.tag.rsplit('}', 1)[-1]
+        if tag == 'path':
+            data = element.get('d')
+        elif tag == 'polygon':
+            data = 'M' + element.get('points').strip() + 'z'
+        else:
+            continue
+        paths.append(data)
+        paths.append(parse_path(data).d())
+    return paths
+
+
+def rounded_path(data, places):
+    return NUMBER_REGEX.sub(lambda m: '{:.{}f}'.format(float(m.group(0)), places), data)
+
+
+def reference_minify(path_data, accuracy):
+    import decimal
+    import scour.scour
+    from xml.dom import Node
+
+    # noinspection PyPep8Naming, PyMethodMayBeStatic
+    class ElementWrapper:
+        def __init__(self, data):
+            self.data = data
+
+        def getAttribute(self, attr):
+            return self.data if attr == 'd' else ''
+
+        def hasAttribute(self, attr):
+            return attr == 'd'
+
+        def setAttribute(self, attr, value):
+            if attr == 'd':
+                self.data = value
+
+        def nodeType(self):
+            return Node.ELEMENT_NODE
+
+    scour.scour._num_path_segments_removed = 0
+    scour.scour._num_bytes_saved_in_path_data = 0
+    context = decimal.Context(prec=accuracy)
+    scour.scour.scouringContext = context
+    scour.scour.scouringContextC = context
+    wrapper = ElementWrapper(path_data)
+    scour.scour.cleanPath(wrapper, scour.scour.sanitizeOptions(None))
+    return wrapper.data
+
+
+def minify_cases(cases):
+    from .minify import MinifyContext, minify_path
+    # one context per accuracy, as in the encoder
+    contexts = {accuracy: MinifyContext(accuracy) for accuracy in MINIFY_ACCURACIES}
+    return [minify_path(data, contexts[accuracy]) for data, accuracy in cases]
+
+
+def benchmark_minify():
+    from .minify import MinifyContext, minify_path
+    try:
+        import scour  # noqa: F401
+    except ImportError:
+        print('The minify benchmark compares against scour; install it with pip install scour')
+        sys.exit(1)
+    territories = option('--territories', 500)
+    vertices = option('--vertices', 200)
+    repeat = option('--repeat', 3)
+    threads = option('--threads', 4)
+    rng = random.Random(SEED)
+    paths = source_paths(string_option('--source', DEFAULT_SOURCE))
+    paths += [rounded_path(data, places) for data in list(paths) for places in [0, 2]]
+    paths += [synthetic_path(rng, vertices) for _ in range(territories)]
+    cases = [(data, accuracy) for data in paths for accuracy in MINIFY_ACCURACIES]
+
+    expected = [reference_minify(data, accuracy) for data, accuracy in cases]
+    actual = minify_cases(cases)
+    mismatches = [case for case, e, a in zip(cases, expected, actual) if e != a]
+    if mismatches:
+        print('Minified path data differs from scour for {} of {} paths, e.g. {}'
+              .format(len(mismatches), len(cases), mismatches[0]))
+        sys.exit(1)
+
+    # every accuracy at once through shared contexts, to check that they do not interfere
+    contexts = {accuracy: MinifyContext(accuracy) for accuracy in MINIFY_ACCURACIES}
+    with ThreadPoolExecutor(threads) as executor:
+        concurrent = list(executor.map(lambda case: minify_path(case[0], contexts[case[1]]),
+                                       cases))
+    if concurrent != expected:
+        print('Concurrent minification differs from sequential minification')
+        sys.exit(1)
+    print('Minified {} paths identically to scour (sequentially and with {} threads)'
+          .format(len(cases), threads))
+
+    reference_time = best_time(lambda: [reference_minify(*case) for case in cases], repeat)
+    optimized_time = best_time(lambda: minify_cases(cases), repeat)
+    report('Path minification ({} paths)'.format(len(cases)),
+           reference_time, optimized_time, len(cases), 'paths')
+
+
+class StageRun:
+    """
+    Runs the stages of encoding one map in order, keeping each stage's result
+    for the stages after it
+    """
+
+    def __init__(self, encoder, source_path, output_path):
+        self.encoder = encoder
+        self.source_path = source_path
+        self.output_path = output_path
+
+    def stages(self):
+        return [('parse', self.parse),
+                ('clean_path', self.clean_paths),
+                ('parse_territory', self.parse_territories),
+                ('icons', self.icons),
+                ('lod', self.lods),
+                ('edges', self.edges),
+                ('parse_regions', self.regions),
+                ('build_graph', self.graph),
+                ('hit_grid', self.hit_grid),
+                ('write_to_file', self.write)]
+
+    def parse(self):
+        self.svg_element = None
+        self.style_elements = []
+        self.territory_groups = []
+        self.edge_groups = []
+        with open(self.source_path, 'rb') as source_file:
+            for event, element in self.encoder.iterate_svg(source_file):
+                if event == 'svg':
+                    self.svg_element = element
+                elif event == 'style':
+                    self.style_elements.append(element)
+                elif any(child.tag == 'text' for child in element.children):
+                    self.territory_groups.append(element)
+                else:
+                    self.edge_groups.append(element)
+
+    def clean_paths(self):
+        for group in self.territory_groups:
+            for child in group.children:
+                if child.tag == 'polygon':
+                    source_data = self.encoder.polygon_to_path(child.attributes['points'])
+                elif child.tag == 'path':
+                    source_data = child.attributes['d']
+                else:
+                    continue
+                self.encoder.clean_path(source_data, self.encoder.MAP_ACCURACY)
+
+    def parse_territories(self):
+        self.territories = [self.encoder.parse_territory(group.children)
+                            for group in self.territory_groups]
+
+    def icons(self):
+        icons = self.encoder.generate_icons([t.data for t in self.territories])
+        for t, icon_data in zip(self.territories, icons):
+            t.icon_data = icon_data
+
+    def lods(self):
+        self.lod_tiers = self.encoder.reachable_lod_tiers(self.encoder.parse_size(self.svg_element))
+        lods = self.encoder.generate_lods([t.source_data for t in self.territories], tiers=self.lod_tiers)
+        for t, lod_data in zip(self.territories, lods):
+            t.lod_data = lod_data
+
+    def edges(self):
+        # the water connections are the group with the widest stroke
+        line_styles = self.encoder.parse_styles(self.style_elements)
+        groups = {group.children[0].attributes['class']: group.children
+                  for group in self.edge_groups}
+        water_class = max((c for c in groups if c in line_styles), key=lambda c: line_styles[c])
+        center_index = self.encoder.CenterIndex(self.encoder.territory_centers(self.territories))
+        self.edge_list = array('i', [n for style, nodes in groups.items() if style != water_class
+                                     for node in nodes
+                                     for n in self.encoder.parse_edge(node, center_index)])
+        self.water_connections = [self.encoder.parse_water_connection(node, center_index)
+                                  for node in groups[water_class]]
+
+    def regions(self):
+        self.region_list = self.encoder.parse_regions(self.territories)
+
+    def graph(self):
+        from .graph import build_graph
+        links = self.encoder.edge_links(self.edge_list, self.water_connections)
+        self.graph_data = build_graph(len(self.territories), links, self.region_list)
+
+    def hit_grid(self):
+        from .hittest import territory_bounds, build_hit_grid
+        self.size = self.encoder.parse_size(self.svg_element)
+        self.bounds = territory_bounds([t.data for t in self.territories])
+        self.grid = build_hit_grid(self.bounds, *self.size)
+
+    def write(self):
+        data = self.encoder.serialize_gameboard(self.territories, self.edge_list,
+                                                self.water_connections, self.size, self.region_list,
+                                                self.graph_data, self.bounds, self.grid,
+                                                lod_tiers=self.lod_tiers)
+        self.encoder.write_to_file(self.output_path, data)
+
+
+def benchmark_stages():
+    from . import encoder
+    from .generate import generate_map
+    sizes = [int(size) for size in string_option('--sizes', STAGE_SIZES).split(',')]
+    vertices = option('--vertices', 24)
+    repeat = option('--repeat', 1)
+    memory = '--no-memory' not in sys.argv
+    print('Encoder stages ({} vertices per territory, best of {}):'.format(vertices, repeat))
+    print('    {:>11}  {:<16}{:>10}{:>16}{:>12}'.format(
+        'territories', 'stage', 'time (s)', 'territories/s', 'peak (MB)'))
+    with tempfile.TemporaryDirectory() as directory:
+        for size in sizes:
+            source_path = os.path.join(directory, 'synthetic.svg')
+            with open(source_path, 'w') as source_file:
+                source_file.write(generate_map(size, vertices=vertices, seed=SEED))
+            output_path = os.path.join(directory, 'synthetic.json')
+            # the encoder logs as it goes
+            with contextlib.redirect_stdout(io.StringIO()):
+                timed = StageRun(encoder, source_path, output_path)
+                times = [best_time(stage, repeat) for _, stage in timed.stages()]
+                peaks = stage_peaks(StageRun(encoder, source_path, output_path)) if memory \
+                    else [None] * len(times)
+            for (name, _), time, peak in zip(timed.stages(), times, peaks):
+                print('    {:>11}  {:<16}{:>10.3f}{:>16.0f}{:>12}'.format(
+                    size, name, time, size / time,
+                    '{:.1f}'.format(peak / 2**20) if peak is not None else '-'))
+
+
+def stage_peaks(run):
+    peaks = []
+    tracemalloc.start()
+    for _, stage in run.stages():
+        start = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        stage()
+        peaks.append(tracemalloc.get_traced_memory()[1] - start)
+    tracemalloc.stop()
+    return peaks
+
+
+def benchmark_binary():
+    import json
+    from .gameboard import encode_gameboard, decode_gameboard
+    repeat = option('--repeat', 3)
+    with open(string_option('--map', DEFAULT_MAP), 'r') as map_file:
+        text = map_file.read()
+    data = json.loads(text)
+    encoded = encode_gameboard(data)
+    mismatches = binary_mismatches(data, decode_gameboard(encoded))
+    if mismatches:
+        print('Decoded gameboard differs from the json output at {} places, e.g. {}'
+              .format(len(mismatches), mismatches[0]))
+        sys.exit(1)
+    print('Decoded {} nodes identically to the json output'.format(len(data['nodes'])))
+
+    compact = json.dumps(data, separators=(',', ':'))
+    print('Gameboard size:')
+    # the client is sent the binary gameboard as it is, in a binary websocket frame
+    for label, size in [('json (indented)', len(text)), ('json (compact)', len(compact)),
+                        ('binary', len(encoded))]:
+        print('    - {:<16} {:>9} bytes ({:.0%})'.format(label, size, size / len(text)))
+    # the binary output is written in addition to the json, so this is added encoder time
+    print('Gameboard write time:')
+    print('    - json:   {:.3f} s'.format(best_time(lambda: json.dumps(data, indent=2), repeat)))
+    print('    - binary: {:.3f} s'.format(best_time(lambda: encode_gameboard(data), repeat)))
+
+
+def binary_mismatches(expected, actual):
+    from .gameboard import node_paths
+
+    def close(a, b):
+        # locations are stored as 32 bit floats
+        return math.isclose(float(a), float(b), rel_tol=1e-6, abs_tol=1e-4)
+
+    def point(item, key):
+        return (float(item[key]['x']), float(item[key]['y'])) if key in item else None
+
+    mismatches = []
+    for e, a, path_data in zip(expected['nodes'], actual['nodes'], node_paths(expected)):
+        if path_data != a['data']:
+            mismatches.append(('node {} data'.format(e['node']), path_data, a['data']))
+        if 'bounds' in e and not all(map(close, e['bounds'], a['bounds'])):
+            mismatches.append(('node {} bounds'.format(e['node']), e['bounds'], a['bounds']))
+        for key in ['iconData', 'lod']:
+            if e.get(key, []) != a[key]:
+                mismatches.append(('node {} {}'.format(e['node'], key), e[key], a[key]))
+        for key in ['center', 'castle']:
+            ep, ap = point(e, key), point(a, key)
+            if (ep is None) != (ap is None) or ep and not all(map(close, ep, ap)):
+                mismatches.append(('node {} {}'.format(e['node'], key), ep, ap))
+    for key in ['nodes', 'edges', 'regions', 'waterConnections']:
+        if len(expected[key]) != len(actual[key]):
+            mismatches.append((key, len(expected[key]), len(actual[key])))
+    for key in ['edges', 'regions']:
+        mismatches += [(key, e, a) for e, a in zip(expected[key], actual[key]) if e != a]
+    for e, a in zip(expected['waterConnections'], actual['waterConnections']):
+        midpoints = [v for point in e.get('midpoints', []) for v in point]
+        decoded = [v for point in a.get('midpoints', []) for v in point]
+        if (e['a'], e['b']) != (a['a'], a['b']) or len(midpoints) != len(decoded) \
+                or not all(map(close, midpoints, decoded)) \
+                or not close(e.get('tension', 0), a.get('tension', 0)):
+            mismatches.append(('waterConnections', e, a))
+    if 'graph' in expected and expected['graph'] != actual['graph']:
+        mismatches.append(('graph', expected['graph'], actual['graph']))
+    if 'hitGrid' in expected:
+        e, a = expected['hitGrid'], actual['hitGrid']
+        if any(e[key] != a[key] for key in ['columns', 'rows', 'offsets', 'territories']) \
+                or not all(map(close, [e['width'], e['height']], [a['width'], a['height']])):
+            mismatches.append(('hitGrid', e, a))
+    if not all(map(close, [expected['size']['a'], expected['size']['b']],
+                   [actual['size']['a'], actual['size']['b']])):
+        mismatches.append(('size', expected['size'], actual['size']))
+    return mismatches
+
+
+def territory_sources(source_path):
+    """
+    Collects the source path data of every territory in an svg file
+    """
+    from . import encoder
+    run = StageRun(encoder, source_path, None)
+    run.parse()
+    paths = []
+    for group in run.territory_groups:
+        child = next(c for c in group.children if c.tag in encoder.PATH_TAGS)
+        paths.append(encoder.polygon_to_path(child.attributes['points'])
+                     if child.tag == 'polygon' else child.attributes['d'])
+    return run, paths
+
+
+def outline_distance(a, b):
+    """
+    Largest distance from a vertex of either flattened outline to the other
+    outline
+    """
+    import numpy as np
+    from .lod import territory_rings
+
+    def vertices(path_data):
+        return np.array([point for ring in territory_rings(path_data) for point in ring])
+
+    def edges(path_data):
+        rings = [np.array(ring) for ring in territory_rings(path_data)]
+        return np.concatenate([np.hstack([ring, np.roll(ring, -1, axis=0)]) for ring in rings])
+
+    def farthest(points, segments):
+        start, end = segments[None, :, :2], segments[None, :, 2:]
+        direction = end - start
+        length_squared = np.maximum((direction ** 2).sum(axis=2), 1e-12)
+        offset = points[:, None, :] - start
+        t = np.clip((offset * direction).sum(axis=2) / length_squared, 0, 1)
+        distances = np.hypot(*np.moveaxis(offset - t[..., None] * direction, 2, 0))
+        return distances.min(axis=1).max()
+
+    return max(farthest(vertices(a), edges(b)), farthest(vertices(b), edges(a)))
+
+
+def benchmark_topology():
+    import json
+    from .generate import generate_map
+    from .topology import build_topology, decode_territories, format_refs
+    repeat = option('--repeat', 3)
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic_path = os.path.join(directory, 'synthetic.svg')
+        with open(synthetic_path, 'w') as synthetic_file:
+            synthetic_file.write(generate_map(option('--territories', 500),
+                                              vertices=option('--vertices', 24), seed=SEED))
+        maps = [(label, territory_sources(path)) for label, path in
+                [('source', string_option('--source', DEFAULT_SOURCE)), ('synthetic', synthetic_path)]]
+
+    for label, (run, paths) in maps:
+        encoder = run.encoder
+        places = encoder.TOPOLOGY_PLACES
+        datas = [encoder.clean_path(path_data, encoder.MAP_ACCURACY) for path_data in paths]
+        arcs, territory_refs = build_topology(paths, places)
+        decoded = decode_territories(arcs, territory_refs, places)
+        distances = [outline_distance(data, path_data) - outline_distance(data, source_data)
+                     for data, path_data, source_data in zip(datas, decoded, paths)]
+        worst = max(range(len(paths)), key=lambda i: distances[i])
+        if distances[worst] > TOPOLOGY_TOLERANCE:
+            print('Territory {} of the {} map decodes {:.3f} units further from its cleaned path '
+                  'data than its source'.format(worst, label, distances[worst]))
+            sys.exit(1)
+        if build_topology(decoded, places) != (arcs, territory_refs):
+            print('Decoded territories of the {} map re-encode to different arcs'.format(label))
+            sys.exit(1)
+        print('Decoded {} territories of the {} map to within {:.3f} units of their cleaned path '
+              'data (beyond its own rounding)'.format(len(paths), label, max(distances[worst], 0)))
+
+        path_bytes = sum(map(len, datas))
+        arc_bytes = sum(map(len, arcs)) + len(json.dumps([format_refs(refs) for refs in territory_refs]))
+        print('    - path data: {} bytes, shared arcs: {} bytes in {} arcs ({:.0%})'.format(
+            path_bytes, arc_bytes, len(arcs), arc_bytes / path_bytes))
+        reference_time = best_time(
+            lambda: [encoder.clean_path(path_data, encoder.MAP_ACCURACY) for path_data in paths], repeat)
+        optimized_time = best_time(lambda: decode_territories(*build_topology(paths, places), places), repeat)
+        report('Territory path data ({} map, {} territories)'.format(label, len(paths)),
+               reference_time, optimized_time, len(paths), 'territories')
+
+
+def contains(rings, x, y):
+    # even-odd ray casting over the flattened rings of a territory
+    inside = False
+    for ring in rings:
+        for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]):
+            if (y0 > y) != (y1 > y) and x < x0 + (y - y0) * (x1 - x0) / (y1 - y0):
+                inside = not inside
+    return inside
+
+
+def benchmark_hittest():
+    from .generate import generate_map
+    from .lod import territory_rings
+    from .hittest import territory_bounds, build_hit_grid, candidates_at
+    repeat = option('--repeat', 3)
+    territories = option('--territories', 500)
+    with tempfile.TemporaryDirectory() as directory:
+        source_path = os.path.join(directory, 'synthetic.svg')
+        with open(source_path, 'w') as source_file:
+            source_file.write(generate_map(territories, vertices=option('--vertices', 24), seed=SEED))
+        run, paths = territory_sources(source_path)
+    encoder = run.encoder
+    datas = [encoder.clean_path(path_data, encoder.MAP_ACCURACY) for path_data in paths]
+    width, height = map(float, encoder.parse_size(run.svg_element))
+    bounds = territory_bounds(datas)
+    grid = build_hit_grid(bounds, width, height)
+    rings = [territory_rings(data) for data in datas]
+    rng = random.Random(SEED)
+    points = [(rng.uniform(0, width), rng.uniform(0, height)) for _ in range(option('--points', 2000))]
+
+    def reference():
+        return [[i for i in range(len(rings)) if contains(rings[i], x, y)] for x, y in points]
+
+    def optimized():
+        return [[i for i in candidates_at(grid, bounds, x, y) if contains(rings[i], x, y)]
+                for x, y in points]
+
+    expected = reference()
+    if optimized() != expected:
+        print('Hit testing grid finds different territories than testing every territory')
+        sys.exit(1)
+    candidates = sum(len(candidates_at(grid, bounds, x, y)) for x, y in points) / len(points)
+    print('Found the same territories for {} points ({} hits) through a {} x {} grid, with {:.1f} '
+          'candidates per point'.format(len(points), sum(map(len, expected)),
+                                        grid['columns'], grid['rows'], candidates))
+    report('Point lookup ({} territories)'.format(len(paths)), best_time(reference, repeat),
+           best_time(optimized, repeat), len(points), 'points')
+
+
+def benchmark_precision():
+    from .generate import generate_map
+    from .precision import control_polygon, polygon_error
+    repeat = option('--repeat', 3)
+    max_error = float(string_option('--max-error', '0.5'))
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic_path = os.path.join(directory, 'synthetic.svg')
+        with open(synthetic_path, 'w') as synthetic_file:
+            synthetic_file.write(generate_map(option('--territories', 500),
+                                              vertices=option('--vertices', 24), seed=SEED))
+        maps = [(label, territory_sources(path)) for label, path in
+                [('source', string_option('--source', DEFAULT_SOURCE)), ('synthetic', synthetic_path)]]
+
+    for label, (run, paths) in maps:
+        encoder = run.encoder
+        datas = [encoder.clean_path(path_data, encoder.MAP_ACCURACY) for path_data in paths]
+        for per_territory in [False, True]:
+            options = encoder.EncodeOptions(max_error=max_error, per_territory=per_territory)
+            tuned = [encoder.Territory(i, (0, 0), data, None, None, path_data)
+                     for i, (data, path_data) in enumerate(zip(datas, paths))]
+            tuning = encoder.tune_precision(tuned, options)
+            distances = [outline_distance(t.data, path_data) for t, path_data in zip(tuned, paths)]
+            worst = max(range(len(paths)), key=lambda i: distances[i])
+            if distances[worst] > max(max_error, tuning[worst][1]) + PRECISION_TOLERANCE:
+                print('Territory {} of the {} map strays {:.3f} units from its source after tuning '
+                      'to {} digits'.format(worst, label, distances[worst], tuning[worst][0]))
+                sys.exit(1)
+            accuracies = [accuracy for accuracy, _ in tuning]
+            tuned_bytes = sum(len(t.data) for t in tuned)
+            default_bytes = sum(map(len, datas))
+            print('Tuned {} territories of the {} map {} to {}-{} digits, within {:.3f} units of their '
+                  'source ({} bytes against {} at {} digits, {:.0%})'.format(
+                      len(paths), label, 'each' if per_territory else 'together', min(accuracies),
+                      max(accuracies), distances[worst], tuned_bytes, default_bytes,
+                      encoder.MAP_ACCURACY, tuned_bytes / default_bytes))
+
+        references = [control_polygon(path_data) for path_data in paths]
+        reference_time = best_time(
+            lambda: [outline_distance(data, path_data) for data, path_data in zip(datas, paths)], repeat)
+        optimized_time = best_time(
+            lambda: [polygon_error(reference, data) for reference, data in zip(references, datas)], repeat)
+        report('Path error metric ({} map, {} territories)'.format(label, len(paths)),
+               reference_time, optimized_time, len(paths), 'territories')
+
+
+def benchmark_adjacency():
+    from .generate import generate_map
+    from .adjacency import infer_links, diff_links
+    from .topology import path_rings, canonical
+    repeat = option('--repeat', 3)
+    with tempfile.TemporaryDirectory() as directory:
+        synthetic_path = os.path.join(directory, 'synthetic.svg')
+        with open(synthetic_path, 'w') as synthetic_file:
+            synthetic_file.write(generate_map(option('--territories', 500),
+                                              vertices=option('--vertices', 24), seed=SEED))
+        maps = [(label, territory_sources(path)) for label, path in
+                [('source', string_option('--source', DEFAULT_SOURCE)), ('synthetic', synthetic_path)]]
+
+    for label, (run, paths) in maps:
+        encoder = run.encoder
+        places = encoder.ADJACENCY_PLACES
+        with contextlib.redirect_stdout(io.StringIO()):
+            run.parse_territories()
+            run.edges()
+        drawn = [(a, b) for a, b in zip(run.edge_list[0::2], run.edge_list[1::2]) if a != -1 and b != -1]
+        inferred, _ = infer_links(paths, places)
+        missing, extra = diff_links(drawn, inferred)
+        if label == 'source':
+            print('Inferred {} edges of the source map from shared borders, against {} drawn ({} drawn '
+                  'edges are not shared borders, {} shared borders are not drawn)'.format(
+                      len(inferred), len(drawn), len(missing), len(extra)))
+            continue
+        if missing or extra:
+            print('Edges inferred from shared borders differ from the drawn edges of the synthetic map '
+                  '({} missing, {} extra)'.format(len(missing), len(extra)))
+            sys.exit(1)
+        print('Inferred the {} drawn edges of the synthetic map from shared borders'.format(len(drawn)))
+
+        def snapped():
+            with contextlib.redirect_stdout(io.StringIO()):
+                run.edges()
+
+        def pairwise():
+            segments = [{canonical(segment) for ring in path_rings(path_data, 10 ** places)
+                         for segment in ring} for path_data in paths]
+            return [(a, b) for a in range(len(paths)) for b in range(a + 1, len(paths))
+                    if not segments[a].isdisjoint(segments[b])]
+
+        if pairwise() != inferred:
+            print('Testing every pair of outlines finds different edges than hashing their segments')
+            sys.exit(1)
+        optimized_time = best_time(lambda: infer_links(paths, places), repeat)
+        # inference saves drawing the edges by hand rather than time, so it
+        # is not reported as a speedup over snapping the drawn lines
+        snapped_time = best_time(snapped, repeat)
+        print('Edges from shared borders against drawn lines ({} edges, {} territories):'.format(
+            len(drawn), len(paths)))
+        print('    - drawn lines:    {:.3f} s'.format(snapped_time))
+        print('    - shared borders: {:.3f} s ({:.1f}x as long)'.format(
+            optimized_time, optimized_time / snapped_time))
+        report('Edges from every pair of outlines ({} territories)'.format(len(paths)),
+               best_time(pairwise, repeat), optimized_time, len(paths), 'territories')
+
+
+def benchmark_startup():
+    import subprocess
+    repeat = option('--repeat', 3)
+    directory = os.path.dirname(os.path.abspath(__file__))
+    ingest_path = os.path.dirname(os.path.abspath(string_option('--source', DEFAULT_SOURCE)))
+
+    def run(*args):
+        return subprocess.run([sys.executable, *args], cwd=directory, check=True,
+                              stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+
+    # -X importtime lists every module imported, innermost first
+    imported = [line.split('|')[-1].strip() for line in run('-X', 'importtime', '-c', 'import encoder')
+                .stderr.splitlines() if line.startswith('import time:') and '|' in line]
+    heavy = sorted({name.split('.')[0] for name in imported} & set(HEAVY_MODULES))
+    if heavy:
+        print('Importing the encoder loads {}'.format(', '.join(heavy)))
+        sys.exit(1)
+    print('Importing the encoder loads {} modules, none of {}'.format(len(imported), ', '.join(HEAVY_MODULES)))
+
+    with tempfile.TemporaryDirectory() as output_path:
+        run('encoder.py', ingest_path, output_path)
+        no_op = ['encoder.py', ingest_path, output_path]
+        # the encoder's own modules are loaded from its package, as it does
+        eager_modules = [name if name in HEAVY_MODULES else '{}.{}'.format(__package__, name)
+                         for name in EAGER_MODULES]
+        eager = ['-c', 'import sys, runpy; sys.path.insert(0, {!r}); import {}; sys.argv = {!r}; '
+                 'runpy.run_path({!r}, run_name={!r})'.format(
+                     os.path.dirname(directory), ', '.join(eager_modules), no_op, 'encoder.py', '__main__')]
+        if 'Parsing' in run(*no_op).stdout:
+            print('Encoding {} again re-encodes maps that are up to date'.format(ingest_path))
+            sys.exit(1)
+
+        def timed(args):
+            return lambda: run(*args)
+
+        optimized_time = best_time(timed(no_op), repeat)
+        report('Run over up to date maps ({})'.format(ingest_path),
+               best_time(timed(eager), repeat), optimized_time, 1, 'runs')
+        print('    - interpreter: {:.3f} s'.format(best_time(timed(['-c', 'pass']), repeat)))
+    if optimized_time > STARTUP_BUDGET:
+        print('Run over up to date maps takes {:.3f} s, over the {} s budget'.format(
+            optimized_time, STARTUP_BUDGET))
+        sys.exit(1)
+
+
+BENCHMARKS = {
+    'icons': benchmark_icons,
+    'numbers': benchmark_numbers,
+    'minify': benchmark_minify,
+    'stages': benchmark_stages,
+    'binary': benchmark_binary,
+    'topology': benchmark_topology,
+    'hittest': benchmark_hittest,
+    'precision': benchmark_precision,
+    'adjacency': benchmark_adjacency,
+    'startup': benchmark_startup
+}
+
+
+# Run script
+if __name__ == '__main__':
+    main()
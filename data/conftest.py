@@ -0,0 +1,47 @@
+import io
+import os
+import pytest
+from .generate import generate_map
+
+__author__      = "Joseph Azevedo"
+
+"""
+conftest.py
+-----------
+Shared pytest fixtures for the encoder's checks: the skirmish source svg, a
+small synthetic map whose territories share their borders exactly, and the
+territories parsed from each (in number order, as encode_svg lists them)
+"""
+
+SKIRMISH_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'source', 'skirmish.svg')
+SYNTHETIC_TERRITORIES = 60
+SYNTHETIC_SEED = 3
+
+
+def parse_territories(source):
+    from . import encoder
+    territories = [encoder.parse_territory(element.children)
+                   for event, element in encoder.iterate_svg(source)
+                   if event == 'g' and any(child.tag == 'text' for child in element.children)]
+    return sorted(filter(None, territories), key=lambda t: t.number)
+
+
+@pytest.fixture(scope='session')
+def skirmish_svg():
+    with open(SKIRMISH_SOURCE, 'rb') as source_file:
+        return source_file.read()
+
+
+@pytest.fixture(scope='session')
+def synthetic_svg():
+    return generate_map(SYNTHETIC_TERRITORIES, vertices=24, seed=SYNTHETIC_SEED).encode()
+
+
+@pytest.fixture(scope='session')
+def skirmish_territories(skirmish_svg):
+    return parse_territories(io.BytesIO(skirmish_svg))
+
+
+@pytest.fixture(scope='session')
+def synthetic_territories(synthetic_svg):
+    return parse_territories(io.BytesIO(synthetic_svg))
@@ -1,15 +1,26 @@
+import io
 import os
 import re
 import math
 import json
-import decimal
+import time
+import hashlib
+import functools
+import contextlib
+from array import array
 from itertools import groupby
-from svgpathtools import parse_path
-from svgpathtools.path import translate, scale
-from scour.scour import cleanPath, sanitizeOptions
-from xml.dom.minidom import parse, Node
 import sys
 
+if not __package__:
+    # run as a script rather than imported from the data package: import the
+    # package from its parent directory instead, so that the modules loaded
+    # from it resolve relative to this file and none of them is importable
+    # under its bare name
+    _directory = os.path.dirname(os.path.abspath(__file__))
+    sys.path = [os.path.dirname(_directory) if os.path.abspath(entry or '.') == _directory else entry
+                for entry in sys.path]
+    __package__ = os.path.basename(_directory)
+
 __author__      = "Joseph Azevedo"
 
 """
@@ -29,6 +40,19 @@ specific way:
 
   - For the water connections, there can be an optional group of <line> or
     <polyline> tags (*with their stroke width greater than the edges*)
+
+Besides the command line, maps can be encoded in memory by importing this
+module: encode_svg turns the text, bytes or path of a single svg into the
+gameboard dictionary written to json, and encode_batch encodes many maps in
+the same process, reusing the loaded modules and minifier contexts between
+them and giving each map a path cache. The modules it uses are imported
+relative to the data package, so it can be imported as data.encoder from
+anywhere (with the repository root on sys.path) as well as run from here.
+
+The geometry modules (and through them svgpathtools, numpy and scipy, which
+take most of a second to load) and the standard modules only some runs need
+are imported by the functions that use them, so that --help and runs where
+every map is up to date return at once
 """
 
 HELP = """
@@ -38,12 +62,40 @@ Usage:
   encoder.py <source_dir> <destination_dir> [options]
     
 Options:
-  -h --help    Show this help description"""
+  -h --help      Show this help description
+  -j --jobs [N]  Encode maps in N parallel processes (defaults to the
+                 number of CPUs when N is omitted)
+  -f --force     Re-encode every map, even if it is unchanged since the
+                 last build
+  -p --profile [FILE]
+                 Record the wall time and allocations of each encoding
+                 phase and territory, and write them to a JSON report
+                 (defaults to .profile.json in the destination directory)
+  -t --topology  Store each border shared between territories once, as
+                 arcs referenced by every territory that draws it, on maps
+                 where that is smaller than each territory's own path data
+  -w --watch     After encoding, keep running and re-encode each map as
+                 soon as its source changes (Ctrl+C to stop)
+  --poll         Watch by polling the source directory instead of through
+                 inotify
+  --max-error E  Clean each map's territory paths to the lowest number of
+                 significant digits that keeps them within E map units of
+                 the source, instead of a fixed number (not with --topology)
+  --per-territory
+                 With --max-error, pick the number of digits of each
+                 territory separately rather than one for the whole map
+  --budget BYTES Report whether each map's gameboard payload (its compact
+                 json) fits within BYTES
+  --infer-edges  Link the territories whose outlines share a border instead
+                 of snapping the drawn edge lines to territory centers
+                 (keeping the drawn edges, with a warning, on maps whose
+                 outlines leave territories with drawn edges unlinked)
+  --check-edges  Keep the drawn edges, but report the ones that are not
+                 shared borders and the shared borders that are not drawn"""
 
-INGEST_PATH = sys.argv[1]
 INGEST_EXTENSION = '.svg'
-OUTPUT_PATH = sys.argv[2]
 OUTPUT_EXTENSION = '.json'
+BINARY_EXTENSION = '.bin'
 TOLERANCE = 15
 STYLE_REGEX = '^[.](\\S+){.+stroke-width:([0-9.])+;.+}$'
 PATH_TAGS = ['polygon', 'path']
@@ -53,180 +105,903 @@ POLYLINE_ATTRIBUTE = 'points'
 CURVE_TENSION = 0.3
 COORD_REGEX = '^(-?[0-9]+[.]?[0-9]*),(-?[0-9]+[.]?[0-9]*)$'
 PREVIEW_SIZE = 100
-DECIMAL_REGEX = re.compile(r"\d*\.\d+")
 MIDDLE_LINE_START_REGEX = '( M [0-9]+(?:[.][0-9]+),[0-9]+(?:[.][0-9]+))'
-EXP_FIX_REGEX = '([0-9]+(?:[.][0-9]+)(?:e-([0-9]+))+)'
 ICON_ACCURACY = 2
 # Important because of zooming in
 MAP_ACCURACY = 4
+# (error bound in map units, decimal places) of each level of detail tier
+# written alongside the full detail data, for rendering when zoomed out. Every
+# tier is sent to each client with the gameboard, so only a coarse one is kept,
+# and only on maps that the client zooms out far enough on to draw it
+LOD_TIERS = [(4, 0)]
+# The client (GameCanvas.vue) draws a tier once its error bound is at most
+# LOD_PIXEL_ERROR pixels on screen. It zooms out to the smaller of MIN_SCALE
+# and the scale that fits the map in VIEWPORT_FILL of the smaller dimension
+# of the viewport, which is taken to be at least MIN_VIEWPORT pixels
+LOD_PIXEL_ERROR = 1
+MIN_SCALE = 0.8
+VIEWPORT_FILL = 0.75
+MIN_VIEWPORT = 320
+# Decimal places that territory outlines are snapped to in topology mode
+TOPOLOGY_PLACES = 2
+# Decimal places that outlines are quantised to when inferring edges
+ADJACENCY_PLACES = 2
+# Accuracies (as MAP_ACCURACY) searched when tuning precision to an error bound
+TUNING_ACCURACIES = [1, 2, 3, 4, 5, 6]
 SIZE_ACCURACY = 2
+# Bump whenever a change to this script alters its output
+ENCODER_VERSION = 13
+MANIFEST_FILE = '.manifest.json'
+CACHE_DIRECTORY = '.cache'
+PROFILE_FILE = '.profile.json'
+# Number of territories listed in each map's profile
+PROFILE_SLOWEST = 10
+# Path minifier settings, one per accuracy
+MINIFY_CONTEXTS = {}
+
+
+class EncodeOptions:
+    """
+    Options that can change between encodes (every other setting is one of
+    the constants above):
+
+      topology  store each border shared between territories once, as arcs
+                referenced by every territory that draws it (see topology.py),
+                if that is smaller than the territories' own path data
+      log       function called with each line of progress, or None to
+                encode silently
+      max_error largest distance (in map units) that cleaned territory paths
+                may stray from their source, or None to clean them all to
+                MAP_ACCURACY (see precision.py)
+      per_territory
+                tune the precision of each territory separately rather than
+                using the lowest one that keeps the whole map within max_error
+      byte_budget
+                size in bytes that the compact json of each gameboard should
+                fit in, reported after encoding, or None
+      infer_edges
+                link territories whose outlines share a border (see
+                adjacency.py) instead of using the drawn edge lines, unless
+                that leaves territories with drawn edges unlinked
+      check_edges
+                keep the drawn edges, reporting how they differ from the
+                borders shared by territory outlines
+    """
+
+    def __init__(self, topology=False, log=None, max_error=None, per_territory=False, byte_budget=None,
+                 infer_edges=False, check_edges=False):
+        self.topology = topology
+        self.log = log if log is not None else ignore_line
+        self.max_error = max_error
+        self.per_territory = per_territory
+        self.byte_budget = byte_budget
+        self.infer_edges = infer_edges
+        self.check_edges = check_edges
+
+
+def ignore_line(_):
+    pass
 
 
 def main():
-    if '--help' in sys.argv or '-h' in sys.argv:
+    if '--help' in sys.argv or '-h' in sys.argv or len(sys.argv) < 3:
         # Display help and stop
         print(HELP)
         quit()
 
-    ingest_files = [os.path.join(INGEST_PATH, f) for f in os.listdir(INGEST_PATH)
-                    if not (os.path.isdir(os.path.join(INGEST_PATH, f)))]
-
-    for source_path in ingest_files:
-        if INGEST_EXTENSION not in source_path:
-            continue
-        print('Parsing {}'.format(source_path))
-        with open(source_path, 'r') as source_file:
-            source_dom = parse(source_file)
-            groups = source_dom.getElementsByTagName('g')
-
-            # parse style elements and look for ones that specify stroke width
-            style_elements = source_dom.getElementsByTagName('style')
-            line_styles = parse_styles(style_elements)
-            if not line_styles:
-                print('    - Cannot find definition of <style>! This map will '
-                      'not support any water connections')
-
-            # parse all group tags
-            territories = []
-            edge_groups = []
-            territory_count = 0
-            for group in groups:
-                children = list(filter(lambda n: n.nodeType != n.TEXT_NODE, group.childNodes))
-                if children:
-                    text_elements = list(filter(lambda text: text.nodeName == 'text', children))
-                    if text_elements:
-                        territory_count += 1
-                        territory = parse_territory(children)
-                        if territory:
-                            territories.append(territory)
-                    else:
-                        edge_groups.append(group)
-            if territories:
-                print('    - Successfully parsed {} out of {} territories'.format(
-                    len(territories), territory_count))
-
-            castle_count = 0
-            for t in territories:
-                if t[5] is not None:
-                    castle_count += 1
-            if castle_count > 0:
-                print('    - Successfully parsed {} castles'.format(castle_count))
-
-            edges = []
-            water_connections = []
-            edge_count = 0
-            water_connection_count = 0
-            if not edge_groups:
-                print('    - Cannot find any <g> tags containing only lines! '
-                      'This map will not have any graph edges or water connections')
+    ingest_path, output_path = sys.argv[1], sys.argv[2]
+    options = EncodeOptions(topology='--topology' in sys.argv or '-t' in sys.argv, log=print,
+                            max_error=parse_value('--max-error', float),
+                            per_territory='--per-territory' in sys.argv,
+                            byte_budget=parse_value('--budget', int),
+                            infer_edges='--infer-edges' in sys.argv,
+                            check_edges='--check-edges' in sys.argv)
+    jobs = parse_jobs()
+    force = '--force' in sys.argv or '-f' in sys.argv
+    watch = '--watch' in sys.argv or '-w' in sys.argv
+    profile_path = parse_profile_path(output_path)
+    profiler = Profiler('main') if profile_path else NULL_PROFILER
+    ingest_files = sorted(os.path.join(ingest_path, f) for f in os.listdir(ingest_path)
+                          if not (os.path.isdir(os.path.join(ingest_path, f)))
+                          and INGEST_EXTENSION in f)
+
+    # skip maps whose source and encoder settings match the last build
+    with profiler.phase('hash sources'):
+        manifest = load_manifest(output_path)
+        source_hashes = {}
+        stale_files = []
+        for source_path in ingest_files:
+            key = os.path.relpath(source_path, ingest_path)
+            source_hashes[key] = hash_source(source_path, options)
+            if not force and manifest.get(key) == source_hashes[key] \
+                    and os.path.exists(destination_for(source_path, ingest_path, output_path)):
+                print('Skipping {} (unchanged since last build)'.format(source_path))
+            else:
+                stale_files.append(source_path)
+
+    # with every map and the manifest up to date there is nothing to write,
+    # so stop before any of the modules used for encoding are loaded
+    if not stale_files and not profile_path and not watch and manifest.keys() == source_hashes.keys():
+        return
+
+    with profiler.phase('encode maps'):
+        results = []
+        map_profiles = []
+        if jobs > 1 and len(stale_files) > 1:
+            # each worker buffers its own log so the lines for a map stay together,
+            # and imap hands them back in source order
+            import multiprocessing
+            with multiprocessing.Pool(min(jobs, len(stale_files))) as pool:
+                encode = functools.partial(encode_map_buffered, ingest_path=ingest_path,
+                                           output_path=output_path, options=options,
+                                           profile=bool(profile_path))
+                for log, written, map_profile in pool.imap(encode, stale_files):
+                    print(log, end='')
+                    results.append(written)
+                    map_profiles.append(map_profile)
+        else:
+            for source_path in stale_files:
+                map_profiler = Profiler(source_path) if profile_path else NULL_PROFILER
+                results.append(encode_map(source_path, ingest_path, output_path, options, map_profiler))
+                map_profiles.append(map_profiler.report())
+
+    with profiler.phase('save manifest'):
+        for source_path, written in zip(stale_files, results):
+            key = os.path.relpath(source_path, ingest_path)
+            if written:
+                manifest[key] = source_hashes[key]
             else:
-                edge_group_styles_map = {}
-                edge_group_styles = []
-                for edge_group in edge_groups:
-                    valid_nodes = list(filter(lambda s: s.nodeType != s.TEXT_NODE
-                                              and 'class' in s.attributes, edge_group.childNodes))
-                    group_styles = list(set(
-                        map(lambda n: n.attributes['class'].value, valid_nodes)))
-                    if len(group_styles) > 1:
-                        print('    - Found more than one class in a single group: {}'
-                              .format(group_styles))
-                    elif len(group_styles) == 1:
-                        edge_group_styles_map[group_styles[0]] = valid_nodes
-                        edge_group_styles.append(group_styles[0])
-
-                matching_styles = {style: line_styles[style] for style in line_styles
-                                   if style in edge_group_styles}
-                water_class = max(matching_styles, key=lambda k: matching_styles[k])
-                water_connection_nodes = edge_group_styles_map[water_class]
-                water_connection_count = len(water_connection_nodes)
-                connection_styles = {style: edge_group_styles_map[style] for style
-                                     in edge_group_styles_map if style != water_class}
-                edge_nodes = [item for sublist in connection_styles.values() for item in sublist]
-                edge_count = len(edge_nodes)
-                centers = dict(list(map(lambda ter: (ter[0], ter[1]), territories)))
-
-                # parse edges
-                for edge_node in edge_nodes:
-                    parsed = parse_edge(edge_node, centers)
-                    if parsed and parsed[0] != -1 and parsed[1] != -1:
-                        edges.append(parsed)
-
-                # parse water connections
-                for water_connection_node in water_connection_nodes:
-                    parsed = parse_water_connection(water_connection_node, centers)
-                    if parsed and parsed[0] != -1 and parsed[1] != -1:
-                        water_connections.append(parsed)
-
-            if edges:
-                print('    - Successfully parsed {} out of {} edges'.format(
-                    len(edges), edge_count))
-            if water_connections:
-                print('    - Successfully parsed {} out of {} water connections'.format(
-                    len(water_connections), water_connection_count))
-
-            # parse size
-            size = parse_size(source_dom.getElementsByTagName('svg')[0])
-            if size[0] != 0 and size[1] != 0:
-                size = list(map(lambda f: round_numbers(f, SIZE_ACCURACY), size))
-                print('    - Successfully parsed map bounds [{} x {}]'.format(
-                    size[0], size[1]))
-
-            # parse regions
-            regions = parse_regions(territories)
-            if len(regions) != 0:
-                print('    - Successfully parsed {} regions from territory data'.format(
-                    len(regions)))
-
-            # serialize to JSON
-            if len(territories) > 0 and len(edges) > 0:
-                destination_path = os.path.join(OUTPUT_PATH, os.path.relpath(source_path, INGEST_PATH)
-                                                .replace(INGEST_EXTENSION, OUTPUT_EXTENSION))
-                write_to_file(destination_path, territories, edges, water_connections, size, regions)
-
-
-def write_to_file(path, territories, edges, water_connections, size, regions):
+                manifest.pop(key, None)
+        save_manifest(output_path, {key: manifest[key] for key in sorted(manifest)
+                                    if key in source_hashes})
+
+    if profile_path:
+        write_profile(profile_path, profiler.report(), map_profiles)
+
+    if watch:
+        watch_maps(ingest_path, output_path, options, polling='--poll' in sys.argv)
+
+
+def watch_maps(ingest_path, output_path, options, polling=False):
+    """
+    Re-encodes each map in the source directory whenever its source changes,
+    keeping this process and the path cache of each map warm between encodes
+    """
+    from .watch import watch_directory
+    path_caches = {}
+    options.log('Watching {} for changes (Ctrl+C to stop)'.format(ingest_path))
+    try:
+        for changed in watch_directory(ingest_path, INGEST_EXTENSION, polling=polling):
+            manifest = load_manifest(output_path)
+            for source_path in sorted(changed):
+                key = os.path.relpath(source_path, ingest_path)
+                try:
+                    source_hash = hash_source(source_path, options)
+                except FileNotFoundError:
+                    manifest.pop(key, None)
+                    continue
+                if manifest.get(key) == source_hash:
+                    continue
+                if source_path not in path_caches:
+                    path_caches[source_path] = PathCache(cache_path_for(source_path, ingest_path, output_path),
+                                                         options)
+                start = time.perf_counter()
+                try:
+                    written = encode_map(source_path, ingest_path, output_path, options,
+                                         path_cache=path_caches[source_path])
+                except Exception as error:
+                    # the source may be mid-save or broken; the next save retries it
+                    options.log('Failed to encode {}: {}'.format(source_path, error))
+                    written = False
+                    del path_caches[source_path]
+                if written:
+                    manifest[key] = source_hash
+                    options.log('Re-encoded {} in {:.3f} s'.format(source_path, time.perf_counter() - start))
+                else:
+                    manifest.pop(key, None)
+            save_manifest(output_path, manifest)
+    except KeyboardInterrupt:
+        options.log('Stopped watching {}'.format(ingest_path))
+
+
+def parse_jobs():
+    for flag in ['--jobs', '-j']:
+        if flag in sys.argv:
+            index = sys.argv.index(flag)
+            if index + 1 < len(sys.argv) and sys.argv[index + 1].isdigit():
+                return max(1, int(sys.argv[index + 1]))
+            return os.cpu_count() or 1
+    return 1
+
+
+def parse_value(flag, convert):
+    if flag in sys.argv:
+        index = sys.argv.index(flag)
+        if index + 1 < len(sys.argv):
+            return convert(sys.argv[index + 1])
+    return None
+
+
+def parse_profile_path(output_path):
+    for flag in ['--profile', '-p']:
+        if flag in sys.argv:
+            index = sys.argv.index(flag)
+            if index + 1 < len(sys.argv) and not sys.argv[index + 1].startswith('-'):
+                return sys.argv[index + 1]
+            return os.path.join(output_path, PROFILE_FILE)
+    return None
+
+
+def encode_map_buffered(source_path, ingest_path, output_path, options, profile=False):
+    buffer = io.StringIO()
+    profiler = Profiler(source_path) if profile else NULL_PROFILER
+    with contextlib.redirect_stdout(buffer):
+        written = encode_map(source_path, ingest_path, output_path, options, profiler)
+    return buffer.getvalue(), written, profiler.report()
+
+
+def destination_for(source_path, ingest_path, output_path):
+    return os.path.join(output_path, os.path.relpath(source_path, ingest_path)
+                        .replace(INGEST_EXTENSION, OUTPUT_EXTENSION))
+
+
+def cache_path_for(source_path, ingest_path, output_path):
+    return os.path.join(output_path, CACHE_DIRECTORY, os.path.relpath(source_path, ingest_path)
+                        .replace(INGEST_EXTENSION, OUTPUT_EXTENSION))
+
+
+@contextlib.contextmanager
+def atomic_open(path, mode='w'):
+    """
+    Opens a temporary file in the same directory as path, which replaces the
+    file at path once it is closed, so readers never see a partial write
+    """
+    import tempfile
     directory = os.path.dirname(path)
-    if not os.path.exists(directory):
+    if directory and not os.path.exists(directory):
         os.makedirs(directory)
-    with open(path, 'w+') as output_file:
-        print('--------------------------------------------------------')
-        print('Writing output to {}'.format(path))
-        print()
-        data = {
-            'nodes': list(map(lambda t: serialize_territory(t), territories)),
-            'edges': list(map(lambda e: {
-                'a': e[0],
-                'b': e[1]
-            }, edges)),
-            'size': {
-                'a': size[0],
-                'b': size[1]
-            },
-            'regions': list(map(lambda r: {
-                'a': r[0],
-                'b': r[1]
-            }, regions)),
-            'waterConnections': list(map(serialize_water_connection, water_connections))
+    descriptor, temp_path = tempfile.mkstemp(dir=directory or '.', suffix='.tmp',
+                                             prefix='.' + os.path.basename(path) + '.')
+    try:
+        with os.fdopen(descriptor, mode) as temp_file:
+            yield temp_file
+        # mkstemp creates files only the owner can read
+        os.chmod(temp_path, 0o666 & ~current_umask())
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def current_umask():
+    umask = os.umask(0)
+    os.umask(umask)
+    return umask
+
+
+def encoder_settings(options):
+    return {
+        'version': ENCODER_VERSION,
+        'mapAccuracy': MAP_ACCURACY,
+        'iconAccuracy': ICON_ACCURACY,
+        'sizeAccuracy': SIZE_ACCURACY,
+        'tolerance': TOLERANCE,
+        'curveTension': CURVE_TENSION,
+        'previewSize': PREVIEW_SIZE,
+        # lists rather than tuples, to compare equal to the settings saved in caches
+        'lodTiers': [list(tier) for tier in LOD_TIERS],
+        'lodReach': [LOD_PIXEL_ERROR, MIN_SCALE, VIEWPORT_FILL, MIN_VIEWPORT],
+        'topology': options.topology,
+        'topologyPlaces': TOPOLOGY_PLACES,
+        'maxError': options.max_error,
+        'perTerritory': options.per_territory,
+        'tuningAccuracies': TUNING_ACCURACIES
+    }
+
+
+def hash_source(source_path, options):
+    # the source of the edges changes the files written but not the paths
+    # cached, so it is left out of the settings the path cache compares
+    settings = {**encoder_settings(options),
+                'inferEdges': options.infer_edges, 'checkEdges': options.check_edges,
+                'adjacencyPlaces': ADJACENCY_PLACES}
+    digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode())
+    with open(source_path, 'rb') as source_file:
+        digest.update(source_file.read())
+    return digest.hexdigest()
+
+
+def load_manifest(output_path):
+    try:
+        with open(os.path.join(output_path, MANIFEST_FILE), 'r') as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(output_path, manifest):
+    with atomic_open(os.path.join(output_path, MANIFEST_FILE)) as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+
+class Profiler:
+    """
+    Records the wall time and memory allocated by each phase of an encode, and
+    by each territory's stages (keyed by node ID). Phases started within
+    another phase are listed under it. Allocations are traced with
+    tracemalloc, which is started by the first profiler: phases report the
+    peak memory allocated above what was in use when they started, and the
+    memory they left allocated
+    """
+
+    def __init__(self, name, enabled=True):
+        self.name = name
+        self.enabled = enabled
+        self.phases = []
+        self.territories = {}
+        # peak memory seen so far and finished sub-phases of each open phase
+        self.open_phases = []
+        if enabled:
+            import tracemalloc
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+
+    @contextlib.contextmanager
+    def phase(self, name, node=None):
+        if not self.enabled:
+            yield
+            return
+        import tracemalloc
+        current, peak = tracemalloc.get_traced_memory()
+        if self.open_phases:
+            parent = self.open_phases[-1]
+            parent['peak'] = max(parent['peak'], peak)
+        tracemalloc.reset_peak()
+        self.open_phases.append({'peak': current, 'phases': []})
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start_time
+            end, peak = tracemalloc.get_traced_memory()
+            frame = self.open_phases.pop()
+            phase_peak = max(frame['peak'], peak)
+            record = {
+                'seconds': seconds,
+                'allocatedBytes': phase_peak - current,
+                'retainedBytes': end - current
+            }
+            if frame['phases']:
+                record['phases'] = frame['phases']
+            siblings = self.phases
+            if self.open_phases:
+                parent = self.open_phases[-1]
+                parent['peak'] = max(parent['peak'], phase_peak)
+                siblings = parent['phases']
+            if node is None:
+                siblings.append({'name': name, **record})
+            else:
+                self.add_territory_stage(node, name, record)
+
+    def add_territory_stage(self, node, name, record):
+        territory = self.territories.setdefault(node, {
+            'node': node,
+            'seconds': 0,
+            'allocatedBytes': 0,
+            'stages': {}
+        })
+        territory['seconds'] += record['seconds']
+        territory['allocatedBytes'] = max(territory['allocatedBytes'], record['allocatedBytes'])
+        territory['stages'][name] = record
+
+    def report(self):
+        if not self.enabled:
+            return None
+        slowest = sorted(self.territories.values(), key=lambda t: t['seconds'], reverse=True)
+        return {
+            'name': self.name,
+            'seconds': sum(phase['seconds'] for phase in self.phases),
+            'phases': self.phases,
+            'territories': len(self.territories),
+            'slowestTerritories': slowest[:PROFILE_SLOWEST]
         }
+
+
+NULL_PROFILER = Profiler(None, enabled=False)
+
+
+def write_profile(path, main_report, map_reports):
+    with atomic_open(path) as profile_file:
+        json.dump({
+            'seconds': main_report['seconds'],
+            'phases': main_report['phases'],
+            'maps': [r for r in map_reports if r is not None]
+        }, profile_file, indent=2)
+    print('Wrote profile to {}'.format(path))
+
+
+class PathCache:
+    """
+    Per-map cache of the cleaned territory paths ('paths', keyed by a hash of
+    the source path data), of the generated icons ('icons', keyed by a hash
+    of the cleaned path data), of the level of detail tiers ('lod', keyed
+    by a hash of every territory's source path data, since neighbours are
+    simplified together) and of the paths cleaned to each accuracy tried
+    when tuning precision ('precision', keyed like 'paths'). Only the entries used by the latest encode are
+    saved, so territories removed from the map drop out of the cache. Saving
+    also carries those entries over to the next encode with the same cache,
+    and a cache without a path is only kept in memory
+    """
+    SECTIONS = ['paths', 'icons', 'lod', 'precision']
+
+    def __init__(self, path=None, options=None):
+        self.path = path
+        self.settings = encoder_settings(options if options is not None else EncodeOptions())
+        self.entries = {section: {} for section in PathCache.SECTIONS}
+        self.used = {section: {} for section in PathCache.SECTIONS}
+        if path is None:
+            return
+        try:
+            with open(path, 'r') as cache_file:
+                contents = json.load(cache_file)
+            if contents.get('settings') == self.settings:
+                for section in PathCache.SECTIONS:
+                    self.entries[section] = contents.get(section, {})
+        except (OSError, ValueError):
+            pass
+
+    @staticmethod
+    def key(path_data):
+        return hashlib.sha256(path_data.encode()).hexdigest()
+
+    def get(self, section, path_data):
+        key = PathCache.key(path_data)
+        entry = self.entries[section].get(key)
+        if entry is not None:
+            self.used[section][key] = entry
+        return entry
+
+    def put(self, section, path_data, result):
+        self.used[section][PathCache.key(path_data)] = result
+
+    def save(self):
+        if self.path is not None:
+            with atomic_open(self.path) as cache_file:
+                json.dump({'settings': self.settings, **self.used}, cache_file)
+        self.entries = self.used
+        self.used = {section: {} for section in PathCache.SECTIONS}
+
+
+def encode_map(source_path, ingest_path, output_path, options, profiler=NULL_PROFILER, path_cache=None):
+    """
+    Encodes a map from the source directory to its json and binary output,
+    returning whether it was written. The map's path cache is loaded from the
+    destination directory unless one is given
+    """
+    options.log('Parsing {}'.format(source_path))
+    if path_cache is None:
+        path_cache = PathCache(cache_path_for(source_path, ingest_path, output_path), options)
+    with open(source_path, 'rb') as source_file:
+        data = encode_svg(source_file, options, path_cache, profiler)
+    if data is None:
+        options.log('    - Warning: {} has no territories or edges, so nothing is written'.format(source_path))
+        return False
+    with profiler.phase('write'):
+        write_to_file(destination_for(source_path, ingest_path, output_path), data, options.log)
+    return True
+
+
+def encode_batch(sources, options=None, path_caches=None):
+    """
+    Encodes many svg maps (see encode_svg) in this process, so the loaded
+    modules are shared between them. Each map gets an in-memory PathCache
+    unless its own are given; passing the same PathCache per map to the next
+    batch skips re-cleaning the paths that did not change since the last one
+    """
+    if path_caches is None:
+        path_caches = [PathCache(None, options) for _ in sources]
+    return [encode_svg(source, options, path_cache) for source, path_cache in zip(sources, path_caches)]
+
+
+def encode_svg(source, options=None, path_cache=None, profiler=NULL_PROFILER):
+    """
+    Encodes a single svg map, given as its text, its bytes, the path of its
+    file (as an os.PathLike, such as a pathlib.Path) or a binary file object,
+    into the gameboard dictionary written to json, or None if the map has no
+    territories or edges. Nothing is written to disk other than by the given
+    PathCache
+    """
+    if isinstance(source, os.PathLike):
+        with open(source, 'rb') as source_file:
+            return encode_svg(source_file, options, path_cache, profiler)
+    from .graph import build_graph
+    from .adjacency import infer_links
+    from .hittest import territory_bounds, build_hit_grid
+    from .topology import UNSUPPORTED, build_topology, decode_territories, format_refs
+    options = options if options is not None else EncodeOptions()
+    log = options.log
+    # file objects know where they were opened from, for warnings
+    map_name = getattr(source, 'name', 'the map')
+    if isinstance(source, str):
+        source = source.encode()
+    if isinstance(source, bytes):
+        source = io.BytesIO(source)
+    with profiler.phase('parse svg'):
+        # stream the svg, parsing each territory group as soon as it closes
+        svg_element = None
+        style_elements = []
+        territories = []
+        edge_groups = []
+        territory_count = 0
+        for event, element in iterate_svg(source):
+            if event == 'svg':
+                svg_element = element
+            elif event == 'style':
+                style_elements.append(element)
+            elif element.children:
+                text_elements = list(filter(lambda text: text.tag == 'text', element.children))
+                if text_elements:
+                    territory_count += 1
+                    territory = parse_territory(element.children, path_cache, profiler, log)
+                    if territory:
+                        territories.append((element.index, territory))
+                else:
+                    edge_groups.append(element)
+
+        # nested groups close before their parents, so restore document order,
+        # then list the territories by number: edges and regions refer to them
+        # by number, while the graph, hit grid and binary output index them by
+        # their place in the list
+        territories = [t for _, t in sorted(territories, key=lambda pair: pair[0])]
+        territories.sort(key=lambda t: t.number)
+        edge_groups.sort(key=lambda group: group.index)
+
+    # split every territory's outline into shared arcs, building its path data
+    # back from them so that neighbours draw exactly the same border. Maps
+    # whose borders are mostly unshared come out larger, so keep the arcs only
+    # when they are smaller than the territories' own path data
+    topology = None
+    if options.topology:
+        with profiler.phase('topology'):
+            arcs, territory_refs = build_topology([t.source_data for t in territories],
+                                                  TOPOLOGY_PLACES)
+            plain_bytes = sum(len(json.dumps(t.data)) for t in territories)
+            topology_bytes = len(json.dumps(arcs)) + sum(
+                len(json.dumps(t.data if refs is UNSUPPORTED else format_refs(refs)))
+                for t, refs in zip(territories, territory_refs))
+            if topology_bytes < plain_bytes:
+                topology = arcs, territory_refs
+                datas = decode_territories(arcs, territory_refs, TOPOLOGY_PLACES)
+                for t, data in zip(territories, datas):
+                    if data is not None:
+                        t.data = data
+            else:
+                log('    - Shared arcs would take {} bytes, more than the {} bytes of the '
+                    'territory paths, so the map is written without them'.format(
+                        topology_bytes, plain_bytes))
+
+    # re-clean each territory's path data at the lowest precision that keeps
+    # it within the error bound, before the icons are generated from it
+    tuning = None
+    if options.max_error is not None and topology is not None:
+        log('    - Precision tuning does not apply in topology mode')
+    elif options.max_error is not None:
+        with profiler.phase('precision'):
+            default_bytes = sum(len(t.data) for t in territories)
+            tuning = tune_precision(territories, options, path_cache)
+
+    # generate every territory's icon in a single batch
+    with profiler.phase('icons'):
+        icons = generate_icons([t.data for t in territories], path_cache, profiler,
+                               [t.number for t in territories])
+        for t, icon_data in zip(territories, icons):
+            t.icon_data = icon_data
+
+    # parse size
+    size = parse_size(svg_element, log)
+    if size[0] != 0 and size[1] != 0:
+        size = tuple(round(f, SIZE_ACCURACY) for f in size)
+        log('    - Successfully parsed map bounds [{} x {}]'.format(
+            format_number(size[0], SIZE_ACCURACY), format_number(size[1], SIZE_ACCURACY)))
+
+    # simplify every territory's outline to each level of detail together, so
+    # that neighbours keep sharing their borders
+    lod_tiers = reachable_lod_tiers(size)
+    if len(lod_tiers) < len(LOD_TIERS):
+        log('    - Skipped {} of {} level of detail tiers, which the client never zooms '
+            'out far enough on this map to draw'.format(len(LOD_TIERS) - len(lod_tiers), len(LOD_TIERS)))
+    with profiler.phase('lod'):
+        lods = generate_lods([t.source_data for t in territories], path_cache, lod_tiers)
+        for t, lod_data in zip(territories, lods):
+            t.lod_data = lod_data
+
+    # parse style elements and look for ones that specify stroke width
+    line_styles = parse_styles(style_elements)
+    if not line_styles:
+        log('    - Cannot find definition of <style>! This map will '
+            'not support any water connections')
+
+    if territories:
+        log('    - Successfully parsed {} out of {} territories'.format(
+            len(territories), territory_count))
+
+    castle_count = sum(1 for t in territories if t.castle is not None)
+    if castle_count > 0:
+        log('    - Successfully parsed {} castles'.format(castle_count))
+
+    if topology is not None:
+        log('    - Split territory outlines into {} shared arcs'.format(len(topology[0])))
+
+    if tuning:
+        accuracies = [accuracy for accuracy, _ in tuning]
+        tuned_bytes = sum(len(t.data) for t in territories)
+        log('    - Tuned path data to {} significant digits with at most {:.3g} units of error, '
+            '{} {} bytes ({:.1%}) of the {} bytes at {} digits'.format(
+                min(accuracies) if min(accuracies) == max(accuracies) else
+                '{}-{}'.format(min(accuracies), max(accuracies)),
+                max(error for _, error in tuning), 'saving' if tuned_bytes <= default_bytes else 'adding',
+                abs(default_bytes - tuned_bytes), abs(default_bytes - tuned_bytes) / max(default_bytes, 1),
+                default_bytes, MAP_ACCURACY))
+        over_bound = sum(1 for _, error in tuning if error > options.max_error)
+        if over_bound:
+            log('    - {} territories exceed the error bound of {} units even at {} significant '
+                'digits'.format(over_bound, options.max_error, TUNING_ACCURACIES[-1]))
+
+    # edges are held as a flat array of (a, b) node pairs
+    edges = array('i')
+    water_connections = []
+    edge_nodes = []
+    edge_count = 0
+    water_connection_count = 0
+    if not edge_groups:
+        log('    - Cannot find any <g> tags containing only lines! '
+            'This map will not have any graph edges or water connections')
+    else:
+        edge_group_styles_map = {}
+        edge_group_styles = []
+        for edge_group in edge_groups:
+            valid_nodes = list(filter(lambda s: 'class' in s.attributes, edge_group.children))
+            group_styles = list(set(
+                map(lambda n: n.attributes['class'], valid_nodes)))
+            if len(group_styles) > 1:
+                log('    - Found more than one class in a single group: {}'
+                    .format(group_styles))
+            elif len(group_styles) == 1:
+                edge_group_styles_map[group_styles[0]] = valid_nodes
+                edge_group_styles.append(group_styles[0])
+
+        matching_styles = {style: line_styles[style] for style in line_styles
+                           if style in edge_group_styles}
+        water_class = max(matching_styles, key=lambda k: matching_styles[k])
+        water_connection_nodes = edge_group_styles_map[water_class]
+        water_connection_count = len(water_connection_nodes)
+        connection_styles = {style: edge_group_styles_map[style] for style
+                             in edge_group_styles_map if style != water_class}
+        edge_nodes = [item for sublist in connection_styles.values() for item in sublist]
+        edge_count = len(edge_nodes)
+        center_index = CenterIndex(territory_centers(territories))
+
+        # parse edges (kept when inferring them from the territory outlines,
+        # in case the outlines do not share their borders)
+        with profiler.phase('edges'):
+            for edge_node in edge_nodes:
+                parsed = parse_edge(edge_node, center_index)
+                if parsed and parsed[0] != -1 and parsed[1] != -1:
+                    edges.extend(parsed)
+
+        # parse water connections
+        with profiler.phase('water connections'):
+            for water_connection_node in water_connection_nodes:
+                parsed = parse_water_connection(water_connection_node, center_index, log)
+                if parsed and parsed.a != -1 and parsed.b != -1:
+                    water_connections.append(parsed)
+
+    if edges:
+        log('    - Successfully parsed {} out of {} edges'.format(
+            len(edges) // 2, edge_count))
+
+    # link the territories sharing a border, replacing or checking the drawn edges
+    if options.infer_edges or options.check_edges:
+        with profiler.phase('adjacency'):
+            inferred, unsupported = infer_links([t.source_data for t in territories], ADJACENCY_PLACES)
+        log('    - Inferred {} edges from borders shared by territory outlines'.format(len(inferred)))
+        if unsupported:
+            log('    - Could not infer the edges of {} territories whose paths use arcs or quadratic '
+                'curves'.format(unsupported))
+        # outlines drawn with gaps between them share no borders, which would
+        # cut territories that have drawn edges off from the rest of the map
+        isolated = set(edges) - {n for link in inferred for n in link}
+        if options.check_edges:
+            report_edges(list(zip(edges[0::2], edges[1::2])), inferred, log)
+        elif not inferred or isolated:
+            log('    - Warning: inferring the edges of {} left {} territories with drawn edges '
+                'without any, so its {} drawn edges are kept'.format(
+                    map_name, len(isolated), len(edges) // 2))
+        else:
+            if edge_nodes:
+                log('    - Ignored {} drawn edges in favor of shared borders'.format(edge_count))
+            edges = array('i', [n for link in inferred for n in link])
+    if water_connections:
+        log('    - Successfully parsed {} out of {} water connections'.format(
+            len(water_connections), water_connection_count))
+
+    # parse regions
+    with profiler.phase('regions'):
+        regions = parse_regions(territories, log)
+    if len(regions) != 0:
+        log('    - Successfully parsed {} regions from territory data'.format(
+            len(regions)))
+
+    # build connection graph
+    with profiler.phase('graph'):
+        graph = build_graph(len(territories), edge_links(edges, water_connections), regions)
+    if graph['neighbours']:
+        log('    - Successfully built graph with {} links in {} connected components '
+            '({} region border territories)'.format(
+                len(graph['neighbours']) // 2, max(graph['components']) + 1, len(graph['borders'])))
+
+    # index every territory's bounding box for looking up the territory at a point
+    with profiler.phase('hit grid'):
+        bounds = territory_bounds([t.data for t in territories])
+        hit_grid = build_hit_grid(bounds, size[0], size[1])
+    if territories:
+        log('    - Successfully indexed territory bounds in a {} x {} hit testing grid'.format(
+            hit_grid['columns'], hit_grid['rows']))
+
+    if path_cache is not None:
+        with profiler.phase('save cache'):
+            path_cache.save()
+
+    if len(territories) > 0 and len(edges) > 0:
+        data = serialize_gameboard(territories, edges, water_connections, size, regions,
+                                   graph, bounds, hit_grid, topology, lod_tiers)
+        if options.byte_budget is not None:
+            payload = len(json.dumps(data, separators=(',', ':')))
+            if payload <= options.byte_budget:
+                log('    - Payload of {} bytes fits within the budget of {} bytes'.format(
+                    payload, options.byte_budget))
+            else:
+                log('    - Payload of {} bytes is {} bytes over the budget of {} bytes{}'.format(
+                    payload, payload - options.byte_budget, options.byte_budget,
+                    '' if topology is not None else
+                    ' (raise the error bound to shrink it)' if tuning else
+                    ' (set an error bound to tune its precision)'))
+        return data
+    return None
+
+
+class SvgElement:
+    """
+    Lightweight copy of an element read from the source svg, holding only the
+    parts the encoder reads: its tag, attributes, leading text and children
+    """
+    __slots__ = ['tag', 'attributes', 'text', 'children', 'index']
+
+    def __init__(self, tag, attributes, text=None, children=None, index=0):
+        self.tag = tag
+        self.attributes = attributes
+        self.text = text
+        self.children = children if children is not None else []
+        self.index = index
+
+
+def local_name(name):
+    return name.rsplit('}', 1)[-1]
+
+
+def copy_element(element, index=0):
+    return SvgElement(local_name(element.tag),
+                      {local_name(k): v for k, v in element.attrib.items()},
+                      element.text,
+                      [copy_element(child) for child in element],
+                      index)
+
+
+def iterate_svg(source_file):
+    """
+    Streams an svg file in a single pass, yielding ('svg', element) for the
+    root's attributes, then ('style', element) and ('g', element) as each
+    <style> and <g> closes. Group elements carry their document order in
+    index. The subtree of every group is dropped once it has been copied, so
+    memory stays bounded by the size of a single group
+    """
+    from xml.etree.ElementTree import iterparse
+    root = None
+    stack = []
+    group_count = 0
+    for event, element in iterparse(source_file, events=('start', 'end')):
+        tag = local_name(element.tag)
+        if event == 'start':
+            index = 0
+            if root is None:
+                root = element
+                if tag == 'svg':
+                    yield 'svg', SvgElement(tag, {local_name(k): v for k, v in element.attrib.items()})
+            elif tag == 'g':
+                index = group_count
+                group_count += 1
+            stack.append(index)
+        else:
+            index = stack.pop()
+            if tag == 'g':
+                yield 'g', copy_element(element, index)
+                # keep the group's own tag and attributes for its parent
+                del element[:]
+                element.text = None
+            elif tag == 'style':
+                yield 'style', copy_element(element)
+            if len(stack) == 1:
+                # finished top-level elements are no longer needed
+                root.remove(element)
+
+
+def serialize_gameboard(territories, edges, water_connections, size, regions, graph,
+                        bounds, hit_grid, topology=None, lod_tiers=LOD_TIERS):
+    territory_refs = topology[1] if topology is not None else [None] * len(territories)
+    data = {
+        'nodes': list(map(serialize_territory, territories, bounds, territory_refs)),
+        'edges': list(map(lambda a, b: {
+            'a': a,
+            'b': b
+        }, edges[0::2], edges[1::2])),
+        'size': {
+            'a': format_number(size[0], SIZE_ACCURACY),
+            'b': format_number(size[1], SIZE_ACCURACY)
+        },
+        'regions': list(map(lambda r: {
+            'a': r[0],
+            'b': r[1]
+        }, regions)),
+        'waterConnections': list(map(serialize_water_connection, water_connections)),
+        'lodTolerances': [tolerance for tolerance, _ in lod_tiers],
+        'graph': graph,
+        'hitGrid': hit_grid
+    }
+    if topology is not None:
+        data['topology'] = {
+            'places': TOPOLOGY_PLACES,
+            'arcs': topology[0]
+        }
+    return data
+
+
+def write_to_file(path, data, log=print):
+    binary_path = os.path.splitext(path)[0] + BINARY_EXTENSION
+    log('--------------------------------------------------------')
+    log('Writing output to {}'.format(path))
+    log('Writing binary output to {}'.format(binary_path))
+    with atomic_open(path) as output_file:
         json.dump(data, output_file, indent=2)
+    log('')
+    from .gameboard import encode_gameboard
+    with atomic_open(binary_path, 'wb') as binary_file:
+        binary_file.write(encode_gameboard(data))
 
 
-def serialize_territory(territory):
+def serialize_territory(territory, bounds, refs=None):
     base = {
-        'node': territory[0],
+        'node': territory.number,
         'center': {
-            'x': territory[1][0],
-            'y': territory[1][1]
-        },
-        'data': territory[2],
-        'iconData': territory[4]
+            'x': format_number(territory.center[0], MAP_ACCURACY),
+            'y': format_number(territory.center[1], MAP_ACCURACY)
+        }
     }
+    # territories split into shared arcs reference them instead of
+    # carrying their own path data
+    if refs is not None:
+        from .topology import format_refs
+        base['arcs'] = format_refs(refs)
+    else:
+        base['data'] = territory.data
+    base['iconData'] = territory.icon_data
+    base['lod'] = territory.lod_data
+    base['bounds'] = bounds
     add = {}
-    if territory[5] is not None:
+    if territory.castle is not None:
         add = {
             'castle':  {
-                'x': territory[5][0],
-                'y': territory[5][1]
+                'x': format_number(territory.castle[0], MAP_ACCURACY),
+                'y': format_number(territory.castle[1], MAP_ACCURACY)
             }
         }
     return {**base, **add}
@@ -234,23 +1009,38 @@ def serialize_territory(territory):
 
 def serialize_water_connection(water_connection):
     base = {
-        'a': water_connection[0],
-        'b': water_connection[1]
+        'a': water_connection.a,
+        'b': water_connection.b
     }
     add = {}
-    if len(water_connection[2]) != 0:
+    midpoints = water_connection.midpoints
+    if len(midpoints) != 0:
         add = {
-            'midpoints': water_connection[2],
+            'midpoints': [[shortest_number(midpoints[i]), shortest_number(midpoints[i + 1])]
+                          for i in range(0, len(midpoints), 2)],
             'tension': CURVE_TENSION
         }
     return {**base, **add}
 
 
+def format_number(value, places):
+    # the same text as round_numbers gives for the source number
+    rounded = format(value, '.{}f'.format(places))
+    return rounded.rstrip('0').rstrip('.') if '.' in rounded else rounded
+
+
+def shortest_number(value):
+    # the shortest text that reads back as the same float, without a
+    # trailing .0 on whole numbers
+    text = repr(value)
+    return text[:-2] if text.endswith('.0') else text
+
+
 def parse_styles(style_elements):
     style_map = {}
     if style_elements:
         for style_element in style_elements:
-            style_content = style_element.firstChild.nodeValue
+            style_content = style_element.text
             if style_content:
                 styles = list(
                     map(lambda s: s.strip(), style_content.splitlines()))
@@ -261,168 +1051,262 @@ def parse_styles(style_elements):
     return style_map
 
 
-def parse_territory(children):
+def parse_territory(children, path_cache=None, profiler=NULL_PROFILER, log=print):
+    # parse text (first, so that the territory can be profiled by its number)
+    number = None
+    text_tag = next(filter(lambda t: t.tag == 'text', children), None)
+    if text_tag:
+        if text_tag.text:
+            number = int(text_tag.text)
+
     # parse data and class
-    data = None
+    source_data = None
     class_value = None
-    path_tag = next(filter(lambda t: t.tagName in PATH_TAGS, children), None)
+    path_tag = next(filter(lambda t: t.tag in PATH_TAGS, children), None)
     if path_tag:
         if 'class' in path_tag.attributes:
-            class_value = path_tag.attributes['class'].value
-        if path_tag.tagName == 'polygon':
-            if path_tag.attributes['points']:
-                data = clean_path(polygon_to_path(path_tag.attributes['points'].value), MAP_ACCURACY)
+            class_value = path_tag.attributes['class']
+        if path_tag.tag == 'polygon':
+            if path_tag.attributes.get('points'):
+                source_data = polygon_to_path(path_tag.attributes['points'])
         else:
-            if path_tag.attributes['d']:
-                data = clean_path(path_tag.attributes['d'].value, MAP_ACCURACY)
-
-    # parse icon data
-    icon_data = None
-    if data is not None:
-        path = parse_path(data)
-        x_min, x_max, y_min, y_max = path.bbox()
-        w = x_max - x_min
-        h = y_max - y_min
-        kx = PREVIEW_SIZE / w
-        ky = PREVIEW_SIZE / h
-        k = min(kx, ky)
-        origin = translate(path, complex(-x_min, -y_min))
-        normalized = scale(origin, k)
-        offset = ((PREVIEW_SIZE - (w * k)) / 2,
-                  (PREVIEW_SIZE - (h * k)) / 2)
-        centered = translate(normalized, complex(*offset))
-        icon_data = clean_path(centered.d(), ICON_ACCURACY)
+            if path_tag.attributes.get('d'):
+                source_data = path_tag.attributes['d']
+
+    # parse data, reusing the cleaned output of unchanged paths (the icon and
+    # level of detail data are filled in afterwards by generate_icons and
+    # generate_lods from the cleaned and source data, and in topology mode the
+    # data may be rebuilt from the shared arcs once every territory is parsed)
+    data = None
+    if source_data is not None:
+        with profiler.phase('clean_path', node=number):
+            data = path_cache.get('paths', source_data) if path_cache is not None else None
+            if data is None:
+                data = clean_path(source_data, MAP_ACCURACY)
+                if path_cache is not None:
+                    path_cache.put('paths', source_data, data)
 
     # parse center
     center = None
-    circle_tag = next(filter(lambda t: t.tagName == 'circle', children), None)
+    circle_tag = next(filter(lambda t: t.tag == 'circle', children), None)
     if circle_tag:
-        if circle_tag.attributes['cx'] and circle_tag.attributes['cy']:
-            center = (round_numbers(circle_tag.attributes['cx'].value, MAP_ACCURACY),
-                      round_numbers(circle_tag.attributes['cy'].value, MAP_ACCURACY))
+        if circle_tag.attributes.get('cx') and circle_tag.attributes.get('cy'):
+            center = (round(float(circle_tag.attributes['cx']), MAP_ACCURACY),
+                      round(float(circle_tag.attributes['cy']), MAP_ACCURACY))
 
     # parse castle
     castle = None
-    rect_tag = next(filter(lambda t: t.tagName == 'rect', children), None)
+    rect_tag = next(filter(lambda t: t.tag == 'rect', children), None)
     if rect_tag:
-        if rect_tag.attributes['x'] and rect_tag.attributes['y']:
-            castle = (round_numbers(rect_tag.attributes['x'].value, MAP_ACCURACY),
-                      round_numbers(rect_tag.attributes['y'].value, MAP_ACCURACY))
-
-    # parse text
-    number = None
-    text_tag = next(filter(lambda t: t.tagName == 'text', children), None)
-    if text_tag:
-        if text_tag.firstChild and text_tag.firstChild.nodeValue:
-            number = int(text_tag.firstChild.nodeValue)
+        if rect_tag.attributes.get('x') and rect_tag.attributes.get('y'):
+            castle = (round(float(rect_tag.attributes['x']), MAP_ACCURACY),
+                      round(float(rect_tag.attributes['y']), MAP_ACCURACY))
 
     if number is not None and center is not None and data is not None:
-        return number, center, data, class_value, icon_data, castle
+        return Territory(number, center, data, class_value, castle, source_data)
     else:
-        print('    - Failed to parse node {} with center at ({}, {}) and path data [{}]'
-              .format(number, center[0], center[1], data))
+        log('    - Failed to parse node {} with center at ({}, {}) and path data [{}]'
+            .format(number, center[0], center[1], data))
         return None
 
 
+def tune_precision(territories, options, path_cache=None):
+    """
+    Re-cleans the path data of each territory at the lowest accuracy that
+    keeps it within the error bound of the options (see precision.py),
+    returning the (accuracy, error) of each one that could be measured.
+    Territories whose paths use arcs or quadratic curves keep their
+    MAP_ACCURACY data
+    """
+    from .precision import tune_accuracies
+    evaluators = [precision_evaluator(t.source_data, path_cache) for t in territories]
+    accuracies = tune_accuracies(evaluators, options.max_error, TUNING_ACCURACIES,
+                                 options.per_territory)
+    tuning = []
+    for territory, evaluate, accuracy in zip(territories, evaluators, accuracies):
+        if accuracy is not None:
+            territory.data, error = evaluate(accuracy)
+            tuning.append((accuracy, error))
+    return tuning
+
+
+def precision_evaluator(source_data, path_cache=None):
+    """
+    Returns a function giving the (data, error) of a source path cleaned to
+    an accuracy, which remembers every accuracy tried in the path cache, or
+    None if the path cannot be measured
+    """
+    from .precision import control_polygon, polygon_error
+    results = path_cache.get('precision', source_data) if path_cache is not None else None
+    reference = None
+    if results is None:
+        reference = control_polygon(source_data)
+        if reference is None:
+            return None
+        results = {}
+        if path_cache is not None:
+            path_cache.put('precision', source_data, results)
+
+    def evaluate(accuracy):
+        nonlocal reference
+        key = str(accuracy)
+        if key not in results:
+            if reference is None:
+                reference = control_polygon(source_data)
+            data = clean_path(source_data, accuracy)
+            results[key] = [data, polygon_error(reference, data)]
+        return results[key]
+
+    return evaluate
+
+
+def generate_icons(datas, path_cache=None, profiler=NULL_PROFILER, nodes=None):
+    icons = [path_cache.get('icons', data) if path_cache is not None else None
+             for data in datas]
+    missing = [i for i, icon_data in enumerate(icons) if icon_data is None]
+    if missing:
+        from .geometry import fit_paths
+        with profiler.phase('fit icons'):
+            fitted = fit_paths([datas[i] for i in missing], PREVIEW_SIZE)
+        for i, fitted_data in zip(missing, fitted):
+            with profiler.phase('icon', node=nodes[i] if nodes is not None else i):
+                if fitted_data is not None:
+                    icons[i] = clean_path(fitted_data, ICON_ACCURACY)
+                else:
+                    # paths with arcs or quadratic curves take the svgpathtools route
+                    icons[i] = generate_icon(datas[i])
+            if path_cache is not None:
+                path_cache.put('icons', datas[i], icons[i])
+    return icons
+
+
+def reachable_lod_tiers(size):
+    # the client fits the map to the smallest viewport at the lowest scale
+    # (margins of an eighth of its smaller dimension on each side)
+    extent = max(size)
+    fit_scale = VIEWPORT_FILL * MIN_VIEWPORT / extent if extent > 0 else MIN_SCALE
+    min_scale = min(MIN_SCALE, fit_scale)
+    return [tier for tier in LOD_TIERS if tier[0] * min_scale <= LOD_PIXEL_ERROR]
+
+
+def generate_lods(source_datas, path_cache=None, tiers=LOD_TIERS):
+    if not tiers:
+        return [[] for _ in source_datas]
+    key = '\n'.join([repr(tiers)] + source_datas)
+    lods = path_cache.get('lod', key) if path_cache is not None else None
+    if lods is None:
+        from .lod import simplify_territories
+        lods = simplify_territories(source_datas, tiers)
+        if path_cache is not None:
+            path_cache.put('lod', key, lods)
+    return lods
+
+
+def generate_icon(data):
+    from svgpathtools import parse_path
+    from svgpathtools.path import translate, scale
+    path = parse_path(data)
+    x_min, x_max, y_min, y_max = path.bbox()
+    w = x_max - x_min
+    h = y_max - y_min
+    kx = PREVIEW_SIZE / w
+    ky = PREVIEW_SIZE / h
+    k = min(kx, ky)
+    origin = translate(path, complex(-x_min, -y_min))
+    normalized = scale(origin, k)
+    offset = ((PREVIEW_SIZE - (w * k)) / 2,
+              (PREVIEW_SIZE - (h * k)) / 2)
+    centered = translate(normalized, complex(*offset))
+    return clean_path(centered.d(), ICON_ACCURACY)
+
+
 def clean_path(path, accuracy):
+    from svgpathtools import parse_path
+    from .minify import round_numbers
     path_obj = parse_path(path)
     no_midpoints = round_numbers(re.sub(MIDDLE_LINE_START_REGEX, '', path_obj.d()), accuracy)
-    data = clean_path_data(remove_exp(no_midpoints), accuracy)
+    data = clean_path_data(no_midpoints, accuracy)
     return data
 
 
 def clean_path_data(path_data, accuracy):
-    # noinspection PyPep8Naming, PyMethodMayBeStatic
-    class ElementWrapper:
-        def __init__(self, data):
-            self.data = data
-
-        def getAttribute(self, attr):
-            if attr == 'd':
-                return self.data
-            else:
-                return ''
+    from .minify import MinifyContext, minify_path
+    if accuracy not in MINIFY_CONTEXTS:
+        MINIFY_CONTEXTS[accuracy] = MinifyContext(accuracy)
+    return minify_path(path_data, MINIFY_CONTEXTS[accuracy])
 
-        def hasAttribute(self, attr):
-            if attr == 'd':
-                return True
-            else:
-                return False
-
-        def setAttribute(self, attr, value):
-            if attr == 'd':
-                self.data = value
-            else:
-                return
 
-        def nodeType(self):
-            return Node.ELEMENT_NODE
+def report_edges(drawn, inferred, log=print):
+    from .adjacency import diff_links, format_links
+    missing, extra = diff_links(drawn, inferred)
+    if not missing and not extra:
+        log('    - Every drawn edge is a shared border, and every shared border is drawn')
+        return
+    if missing:
+        log('    - {} drawn edges are not shared borders: {}'.format(len(missing), format_links(missing)))
+    if extra:
+        log('    - {} shared borders are not drawn edges: {}'.format(len(extra), format_links(extra)))
 
-    import scour
-    scour.scour._num_path_segments_removed = 0
-    scour.scour._num_bytes_saved_in_path_data = 0
-    context = decimal.Context(prec=accuracy)
-    scour.scour.scouringContext = context
-    scour.scour.scouringContextC = context
-    wrapper = ElementWrapper(path_data)
-    cleanPath(wrapper, sanitizeOptions(None))
-    return wrapper.data
 
-
-def parse_edge(edge_node, centers):
+def parse_edge(edge_node, center_index):
     attributes = edge_node.attributes
-    center_list = [centers[i] for i in sorted(centers.keys())]
     if attributes and all(a in attributes for a in LINE_ATTRIBUTES):
         start, end = parse_line(edge_node)
-        start_node = find_rounded_tuple(center_list, start)
-        end_node = find_rounded_tuple(center_list, end)
+        start_node = center_index.find_rounded_tuple(start)
+        end_node = center_index.find_rounded_tuple(end)
         return start_node, end_node
     else:
         return None
 
 
-def parse_water_connection(water_connection_node, centers):
-    center_list = [centers[i] for i in sorted(centers.keys())]
-    if water_connection_node.nodeName in CONNECTION_TAGS:
-        if water_connection_node.nodeName == 'polyline':
+def edge_links(edges, water_connections):
+    """
+    Lists the (a, b) links of a map's edge array and water connections
+    """
+    return list(zip(edges[0::2], edges[1::2])) + [(w.a, w.b) for w in water_connections]
+
+
+def parse_water_connection(water_connection_node, center_index, log=print):
+    if water_connection_node.tag in CONNECTION_TAGS:
+        if water_connection_node.tag == 'polyline':
             # polyline
             if POLYLINE_ATTRIBUTE in water_connection_node.attributes:
                 point_strings = water_connection_node.attributes[POLYLINE_ATTRIBUTE]\
-                    .value.strip().split()
+                    .strip().split()
                 points = list(map(to_point, point_strings))
                 if len(points) >= 2:
-                    start_node = find_rounded_tuple(center_list, points[0])
-                    end_node = find_rounded_tuple(center_list, points[-1])
-                    midpoints = points[1:-1] if len(points) > 2 else []
-                    return start_node, end_node, midpoints
+                    start_node = center_index.find_rounded_tuple(points[0])
+                    end_node = center_index.find_rounded_tuple(points[-1])
+                    midpoints = array('d', [v for point in points[1:-1] for v in point])
+                    return WaterConnection(start_node, end_node, midpoints)
                 else:
-                    print('   - Failed parsing water connection node {} with points {}'
-                          .format(water_connection_node.nodeName, points))
+                    log('   - Failed parsing water connection node {} with points {}'
+                        .format(water_connection_node.tag, points))
             else:
-                print('   - Failed parsing water connection node {} with attributes {}'
-                      .format(water_connection_node.nodeName,
-                              list(map(lambda a: a.value, water_connection_node.attributes))))
+                log('   - Failed parsing water connection node {} with attributes {}'
+                    .format(water_connection_node.tag,
+                            list(water_connection_node.attributes.values())))
         else:
             # line
             start, end = parse_line(water_connection_node)
-            start_node = find_rounded_tuple(center_list, start)
-            end_node = find_rounded_tuple(center_list, end)
-            return start_node, end_node, []
+            start_node = center_index.find_rounded_tuple(start)
+            end_node = center_index.find_rounded_tuple(end)
+            return WaterConnection(start_node, end_node, array('d'))
     else:
-        print('    - Failed parsing water connection node {}: unknown tag type')\
-            .format(water_connection_node.nodeName)
+        log('    - Failed parsing water connection node {}: unknown tag type'
+            .format(water_connection_node.tag))
     return None
 
 
 def parse_line(node):
-    start = (node.attributes['x1'].value, node.attributes['y1'].value)
-    end = (node.attributes['x2'].value, node.attributes['y2'].value)
+    start = (float(node.attributes['x1']), float(node.attributes['y1']))
+    end = (float(node.attributes['x2']), float(node.attributes['y2']))
     return start, end
 
 
-def parse_size(svg_node):
-    if 'viewBox' in svg_node.attributes:
-        view_box = svg_node.attributes['viewBox'].value
+def parse_size(svg_node, log=print):
+    if svg_node is not None and 'viewBox' in svg_node.attributes:
+        view_box = svg_node.attributes['viewBox']
         coords = list(map(lambda s: float(s.strip()), view_box.strip().split()))
         if len(coords) == 4:
             min_bounds = (coords[0], coords[1])
@@ -431,50 +1315,116 @@ def parse_size(svg_node):
             height = max_bounds[1] - min_bounds[1]
             return width, height
         else:
-            print('    - Failed parsing viewBox: invalid value {}'.format(view_box))
+            log('    - Failed parsing viewBox: invalid value {}'.format(view_box))
     return 0, 0
 
 
-def parse_regions(territories):
-    num_class_dict = dict(map(lambda t: (t[0], t[3]), territories))
-    class_list = [num_class_dict[i] for i in sorted(num_class_dict.keys())]
-    class_runs = [x[0] for x in groupby(class_list)]
-    if len(list(set(class_list))) != len(class_runs):
-        print('    - Failed parsing region data: territory numbers are not contiguous '
-              '(parsed list: {})'.format(class_list))
+def parse_regions(territories, log=print):
+    # the class of each territory number, with later duplicates winning
+    num_class_dict = {t.number: t.class_name for t in territories}
+    numbers = sorted(num_class_dict)
+    class_list = [num_class_dict[num] for num in numbers]
+    runs = [(class_value, [num for num, _ in run])
+            for class_value, run in groupby(zip(numbers, class_list), key=lambda pair: pair[1])]
+    if len(set(class_list)) != len(runs):
+        log('    - Failed parsing region data: territory numbers are not contiguous '
+            '(parsed list: {})'.format(class_list))
         return []
     else:
-        full_runs = map(lambda c: list(
-            {num: num_class_dict[num] for num in sorted(num_class_dict.keys()) if num_class_dict[num] == c}
-            .keys()), class_runs)
-        ranges = list(map(lambda l: (l[0], l[-1]), full_runs))
-        return ranges
+        return [(run[0], run[-1]) for _, run in runs]
 
 
 def to_point(string):
     match = re.search(COORD_REGEX, string.strip())
     if match:
-        return match.group(1), match.group(2)
+        return float(match.group(1)), float(match.group(2))
     else:
-        return 0, 0
-
-
-def find_rounded_tuple(source, target):
-    tup1 = float(target[0])
-    tup2 = float(target[1])
-    nearest_dist = 0
-    nearest = -1
-    i = 0
-    for node in source:
-        node1 = float(node[0])
-        node2 = float(node[1])
-        dist = distance(tup1, tup2, node1, node2)
-        if dist <= TOLERANCE:
-            if nearest == -1 or dist < nearest_dist:
-                nearest = i
-                nearest_dist = dist
-        i += 1
-    return nearest
+        return 0.0, 0.0
+
+
+class Territory:
+    """
+    A territory parsed from the source svg. Its center and castle are held as
+    floats (rounded to MAP_ACCURACY places) and only written out as text when
+    serialized; the icon and level of detail data are filled in by the later
+    encoding phases
+    """
+    __slots__ = ['number', 'center', 'data', 'class_name', 'icon_data', 'castle', 'source_data',
+                 'lod_data']
+
+    def __init__(self, number, center, data, class_name, castle, source_data):
+        self.number = number
+        self.center = center
+        self.data = data
+        self.class_name = class_name
+        self.icon_data = None
+        self.castle = castle
+        self.source_data = source_data
+        self.lod_data = None
+
+
+class WaterConnection:
+    """
+    A water connection between two nodes, with the points of its curve in
+    between as a flat array of x, y floats
+    """
+    __slots__ = ['a', 'b', 'midpoints']
+
+    def __init__(self, a, b, midpoints):
+        self.a = a
+        self.b = b
+        self.midpoints = midpoints
+
+
+def territory_centers(territories):
+    """
+    Lays out the centers of a map's territories in one flat array of x, y
+    floats, in node order
+    """
+    # later territories with the same number win, as when snapping to a node
+    numbered = {t.number: t.center for t in territories}
+    centers = array('d')
+    for number in sorted(numbered):
+        centers.extend(numbered[number])
+    return centers
+
+
+class CenterIndex:
+    """
+    Uniform grid over the territory centers, built once per map from their
+    flat array (see territory_centers). Each cell is TOLERANCE units wide, so
+    every center within snapping distance of a point lies in the point's cell
+    or one of its eight neighbors
+    """
+
+    def __init__(self, centers):
+        # centers are indexed by their position in node order
+        self.centers = centers
+        self.cells = {}
+        for i in range(len(centers) // 2):
+            self.cells.setdefault(CenterIndex.cell(centers[2 * i], centers[2 * i + 1]), []).append(i)
+
+    @staticmethod
+    def cell(x, y):
+        return math.floor(x / TOLERANCE), math.floor(y / TOLERANCE)
+
+    def find_rounded_tuple(self, target):
+        tup1, tup2 = target
+        cell_x, cell_y = CenterIndex.cell(tup1, tup2)
+        nearest_dist = 0
+        nearest = -1
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                for i in self.cells.get((cell_x + dx, cell_y + dy), ()):
+                    node1, node2 = self.centers[2 * i], self.centers[2 * i + 1]
+                    dist = distance(tup1, tup2, node1, node2)
+                    if dist <= TOLERANCE:
+                        # ties go to the lowest node, matching a linear scan
+                        if nearest == -1 or dist < nearest_dist or \
+                                (dist == nearest_dist and i < nearest):
+                            nearest = i
+                            nearest_dist = dist
+        return nearest
 
 
 def distance(x1, y1, x2, y2):
@@ -485,40 +1435,6 @@ def polygon_to_path(polygon_data):
     return 'M{}z'.format(polygon_data)
 
 
-def round_numbers(text, places):
-    if isinstance(text, float):
-        text = str(text)
-
-    def round_match(match):
-        return pretty_float(("{:." + str(places) + "f}").format(float(match.group())))
-    return re.sub(DECIMAL_REGEX, round_match, text)
-
-
-def pretty_float(num):
-    try:
-        dec = decimal.Decimal(num)
-    except decimal.InvalidOperation:
-        return 'bad'
-    tup = dec.as_tuple()
-    delta = len(tup.digits) + tup.exponent
-    digits = ''.join(str(d) for d in tup.digits)
-    if delta <= 0:
-        zeros = abs(tup.exponent) - len(tup.digits)
-        val = '0.' + ('0'*zeros) + digits
-    else:
-        val = digits[:delta] + ('0'*tup.exponent) + '.' + digits[delta:]
-    val = val.rstrip('0')
-    if val[-1] == '.':
-        val = val[:-1]
-    if tup.sign:
-        return '-' + val
-    return val
-
-
-def remove_exp(string):
-    return re.sub(EXP_FIX_REGEX, '0', string)
-
-
 # Run script
 if __name__ == "__main__":
     main()
@@ -0,0 +1,326 @@
+import re
+import struct
+from decimal import Decimal
+from .graph import build_graph
+from .topology import decode_territories, parse_refs
+from .hittest import territory_bounds, build_hit_grid
+
+__author__      = "Joseph Azevedo"
+
+"""
+gameboard.py
+------------
+Compact binary encoding of the gameboard written by encoder.py, read by the
+server (game.GameboardBinary) and by the client (vue/src/gameboard.js) in
+place of the json output. All values are little-endian:
+
+  header      "RSKB", u8 version, then u32 node, edge, water connection and
+              region counts, and the size as two f32
+  nodes       f32 x, y center pairs, then a u8 castle flag per node followed
+              by the f32 x, y pairs of the nodes with castles, then the path
+              and icon data of each node (see below)
+  edges       i32 a, b pairs
+  regions     i32 first, last node pairs
+  water       per connection: i32 a, i32 b, f32 tension, varint midpoint
+              count, then f32 x, y midpoint pairs
+  graph       the structures from graph.py: i32 adjacency offsets (one more
+              than the node count) and neighbours, i32 component of each
+              node, then varint border count and i32 borders
+  lod         u8 level of detail tier count and f32 tier error bounds, then
+              the path data of each tier of each node
+  hit grid    the structures from hittest.py: f32 x_min, y_min, x_max, y_max
+              bounds of each node, f32 grid width and height, u32 column and
+              row counts, then i32 cell offsets (one more than the cell count)
+              and candidate territories
+
+Path data is stored as a varint command count, each command as its ascii
+letter and a varint count of its numbers, then every number in order. The
+encoder's paths use relative commands, so their numbers are already small
+deltas; each one is written as a single varint holding its digits shifted
+left by 4 bits, its sign in bit 3 (the minifier writes -0 in places) and its
+number of decimal places (up to 7) in the low bits. Decoding writes the
+numbers back out the way the path minifier does, so the decoded paths match
+the json output, except that numbers in exponent form are written out in full.
+Output written in topology mode is stored with each node's path data built
+back from the shared arcs, so the binary format is the same in both modes
+"""
+
+MAGIC = b'RSKB'
+VERSION = 5
+HEADER = struct.Struct('<4sB4I2f')
+GRID = struct.Struct('<2f2I')
+CONNECTION = struct.Struct('<2if')
+MAX_DECIMALS = 7
+PATH_TOKEN_REGEX = re.compile(r'([A-Za-z])|([-+]?(?:[0-9]*\.[0-9]+|[0-9]+\.?)(?:[Ee][-+]?[0-9]+)?)')
+
+
+def encode_gameboard(data):
+    """
+    Encodes the gameboard dictionary written to json by encoder.py
+    """
+    nodes = data['nodes']
+    edges = data['edges']
+    regions = data['regions']
+    water_connections = data['waterConnections']
+    output = bytearray(HEADER.pack(MAGIC, VERSION, len(nodes), len(edges),
+                                   len(water_connections), len(regions),
+                                   float(data['size']['a']), float(data['size']['b'])))
+    output += floats([float(v) for node in nodes for v in (node['center']['x'],
+                                                            node['center']['y'])])
+    output += bytes(1 if 'castle' in node else 0 for node in nodes)
+    output += floats([float(v) for node in nodes if 'castle' in node
+                      for v in (node['castle']['x'], node['castle']['y'])])
+    # path numbers repeat heavily across a map, so each is only encoded once
+    encoded_numbers = {}
+    for node, path_data in zip(nodes, node_paths(data)):
+        encode_path(path_data, output, encoded_numbers)
+        encode_path(node['iconData'], output, encoded_numbers)
+    output += ints([v for edge in edges for v in (edge['a'], edge['b'])])
+    output += ints([v for region in regions for v in (region['a'], region['b'])])
+    for connection in water_connections:
+        midpoints = connection.get('midpoints', [])
+        output += CONNECTION.pack(connection['a'], connection['b'],
+                                  float(connection.get('tension', 0)))
+        write_varint(len(midpoints), output)
+        output += floats([float(v) for point in midpoints for v in point])
+    graph = data.get('graph')
+    if graph is None:
+        # json output from before the encoder built the graph
+        graph = build_graph(len(nodes), [(e['a'], e['b']) for e in edges + water_connections],
+                            [(r['a'], r['b']) for r in regions])
+    output += ints(graph['offsets'] + graph['neighbours'] + graph['components'])
+    write_varint(len(graph['borders']), output)
+    output += ints(graph['borders'])
+    # json output from before the encoder wrote level of detail tiers has none
+    tolerances = data.get('lodTolerances', [])
+    output.append(len(tolerances))
+    output += floats([float(tolerance) for tolerance in tolerances])
+    for node in nodes:
+        lod = node.get('lod', [])
+        if len(lod) != len(tolerances):
+            raise ValueError('Node {} has {} level of detail tiers instead of {}'
+                             .format(node['node'], len(lod), len(tolerances)))
+        for lod_data in lod:
+            encode_path(lod_data, output, encoded_numbers)
+    hit_grid = data.get('hitGrid')
+    if hit_grid is None:
+        # json output from before the encoder indexed territory bounds
+        bounds = territory_bounds(node_paths(data))
+        hit_grid = build_hit_grid(bounds, float(data['size']['a']), float(data['size']['b']))
+    else:
+        bounds = [node['bounds'] for node in nodes]
+    output += floats([v for box in bounds for v in box])
+    output += GRID.pack(hit_grid['width'], hit_grid['height'], hit_grid['columns'], hit_grid['rows'])
+    output += ints(hit_grid['offsets'] + hit_grid['territories'])
+    return bytes(output)
+
+
+def node_paths(data):
+    """
+    Gets the path data of every node, building it from the shared arcs of
+    output written in topology mode
+    """
+    nodes = data['nodes']
+    if 'topology' not in data:
+        return [node['data'] for node in nodes]
+    topology = data['topology']
+    datas = decode_territories(topology['arcs'], [parse_refs(node['arcs']) if 'arcs' in node else None
+                                                  for node in nodes], topology['places'])
+    return [node['data'] if path_data is None else path_data
+            for node, path_data in zip(nodes, datas)]
+
+
+def decode_gameboard(data):
+    """
+    Decodes an encoded gameboard back into the dictionary written to json by
+    encoder.py (with numbers instead of numeric strings)
+    """
+    magic, version, node_count, edge_count, water_count, region_count, width, height = \
+        HEADER.unpack_from(data, 0)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('Not a version {} binary gameboard'.format(VERSION))
+    reader = Reader(data, HEADER.size)
+    centers = reader.floats(2 * node_count)
+    castle_flags = reader.bytes(node_count)
+    castles = iter(pairs(reader.floats(2 * sum(castle_flags))))
+    nodes = []
+    for i in range(node_count):
+        node = {
+            'node': i,
+            'center': {'x': centers[2 * i], 'y': centers[2 * i + 1]},
+            'data': decode_path(reader),
+            'iconData': decode_path(reader)
+        }
+        if castle_flags[i]:
+            x, y = next(castles)
+            node['castle'] = {'x': x, 'y': y}
+        nodes.append(node)
+    edges = [{'a': a, 'b': b} for a, b in pairs(reader.ints(2 * edge_count))]
+    regions = [{'a': a, 'b': b} for a, b in pairs(reader.ints(2 * region_count))]
+    water_connections = []
+    for _ in range(water_count):
+        a, b, tension = reader.unpack(CONNECTION)
+        midpoints = [list(point) for point in pairs(reader.floats(2 * reader.varint()))]
+        connection = {'a': a, 'b': b}
+        if midpoints:
+            connection.update({'midpoints': midpoints, 'tension': tension})
+        water_connections.append(connection)
+    offsets = reader.ints(node_count + 1)
+    graph = {
+        'offsets': offsets,
+        'neighbours': reader.ints(offsets[-1]),
+        'components': reader.ints(node_count)
+    }
+    graph['borders'] = reader.ints(reader.varint())
+    tolerances = reader.floats(reader.byte())
+    for node in nodes:
+        node['lod'] = [decode_path(reader) for _ in tolerances]
+    bounds = reader.floats(4 * node_count)
+    for i, node in enumerate(nodes):
+        node['bounds'] = bounds[4 * i:4 * i + 4]
+    grid_width, grid_height, columns, rows = reader.unpack(GRID)
+    offsets = reader.ints(columns * rows + 1)
+    hit_grid = {
+        'width': grid_width,
+        'height': grid_height,
+        'columns': columns,
+        'rows': rows,
+        'offsets': offsets,
+        'territories': reader.ints(offsets[-1])
+    }
+    return {
+        'nodes': nodes,
+        'edges': edges,
+        'size': {'a': width, 'b': height},
+        'regions': regions,
+        'waterConnections': water_connections,
+        'lodTolerances': tolerances,
+        'graph': graph,
+        'hitGrid': hit_grid
+    }
+
+
+def encode_path(path_data, output, encoded_numbers=None):
+    if encoded_numbers is None:
+        encoded_numbers = {}
+    commands = []
+    numbers = bytearray()
+    for command, number in PATH_TOKEN_REGEX.findall(path_data):
+        if command:
+            commands.append([command, 0])
+        elif commands:
+            commands[-1][1] += 1
+            encoded = encoded_numbers.get(number)
+            if encoded is None:
+                negative, digits, decimals = fixed_point(number)
+                encoded = encoded_numbers[number] = varint(digits << 4 | negative << 3 | decimals)
+            numbers += encoded
+        else:
+            raise ValueError('Path data [{}] does not start with a command'.format(path_data))
+    write_varint(len(commands), output)
+    for command, count in commands:
+        output.append(ord(command))
+        write_varint(count, output)
+    output += numbers
+
+
+def decode_path(reader):
+    commands = [(chr(reader.byte()), reader.varint()) for _ in range(reader.varint())]
+    parts = []
+    for command, count in commands:
+        parts.append(command)
+        for i in range(count):
+            value = reader.varint()
+            number = format_fixed_point(value >> 3 & 1, value >> 4, value & 7)
+            # numbers are only separated when they would otherwise run together
+            if i > 0 and number[0] != '-':
+                parts.append(' ')
+            parts.append(number)
+    return ''.join(parts)
+
+
+def fixed_point(number):
+    negative = number[0] == '-'
+    whole, _, fraction = number.lstrip('-+').partition('.')
+    if len(fraction) <= MAX_DECIMALS and 'e' not in fraction.lower() and 'e' not in whole.lower():
+        return int(negative), int(whole + fraction or '0'), len(fraction)
+    # exponents and excess decimal places
+    value = Decimal(number)
+    sign, _, exponent = value.as_tuple()
+    decimals = min(max(0, -exponent), MAX_DECIMALS)
+    return sign, int(abs(value).scaleb(decimals).to_integral_value()), decimals
+
+
+def format_fixed_point(negative, digits, decimals):
+    sign = '-' if negative else ''
+    text = str(digits)
+    if decimals == 0:
+        return sign + text
+    text = text.rjust(decimals + 1, '0')
+    return '{}{}.{}'.format(sign, text[:-decimals], text[-decimals:])
+
+
+def write_varint(value, output):
+    while value >= 0x80:
+        output.append(value & 0x7F | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def varint(value):
+    output = bytearray()
+    write_varint(value, output)
+    return bytes(output)
+
+
+def floats(values):
+    return struct.pack('<{}f'.format(len(values)), *values)
+
+
+def ints(values):
+    return struct.pack('<{}i'.format(len(values)), *values)
+
+
+def pairs(values):
+    return zip(values[0::2], values[1::2])
+
+
+class Reader:
+    """
+    Sequential reader over an encoded gameboard
+    """
+
+    def __init__(self, data, offset=0):
+        self.data = data
+        self.offset = offset
+
+    def unpack(self, layout):
+        values = layout.unpack_from(self.data, self.offset)
+        self.offset += layout.size
+        return values
+
+    def floats(self, count):
+        return list(self.unpack(struct.Struct('<{}f'.format(count))))
+
+    def ints(self, count):
+        return list(self.unpack(struct.Struct('<{}i'.format(count))))
+
+    def bytes(self, count):
+        values = self.data[self.offset:self.offset + count]
+        self.offset += count
+        return list(values)
+
+    def byte(self):
+        value = self.data[self.offset]
+        self.offset += 1
+        return value
+
+    def varint(self):
+        value = 0
+        shift = 0
+        while True:
+            byte = self.byte()
+            value |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return value
+            shift += 7
@@ -0,0 +1,352 @@
+import sys
+import math
+import random
+
+__author__      = "Joseph Azevedo"
+
+"""
+generate.py
+-----------
+Generates synthetic maps in the svg format read by encoder.py, for measuring
+how the encoder scales past the hand-drawn maps. Territories are the cells of
+a jittered grid, so neighbouring territories share their borders exactly
+(with the same vertices and curves, traversed in opposite directions), like an
+exported map. Each map has:
+
+  - one <g> per territory with a <polygon> or <path>, a <circle> center, a
+    <text> number and optionally a castle <rect>
+  - a group of edge <line>s between neighbouring territory centers
+  - a group of water connections, as <polyline>s with midpoints or <line>s
+  - regions, as contiguous runs of territory numbers sharing a fill class
+"""
+
+HELP = """
+generate.py
+
+Usage:
+  generate.py <destination_file> [options]
+
+Options:
+  -h --help              Show this help description
+  --territories N        Number of territories (default 50)
+  --vertices N           Approximate vertices per territory (default 24)
+  --edges N              Number of edges (defaults to one between every pair
+                         of territories sharing a side; larger values add
+                         diagonal neighbours)
+  --water-connections N  Number of water connections (default 1 per 20
+                         territories)
+  --castles N            Number of castles (default 1 per 10 territories)
+  --regions N            Number of regions (default 1 per 8 territories)
+  --seed N               Random seed (default 2340)"""
+
+SEED = 2340
+# Coordinates are generated in tenths of svg units, so that shared borders
+# are written out identically by both of their territories
+SCALE = 10
+CELL_SIZE = 60 * SCALE
+MARGIN = 20 * SCALE
+CORNER_JITTER = 0.18
+BORDER_JITTER = 0.06
+CENTER_JITTER = 0.08
+CURVED_SIDES = 0.3
+POLYGON_TERRITORIES = 0.3
+MAX_MIDPOINTS = 4
+CASTLE_SIZE = 16.6
+CENTER_RADIUS = 5.8
+EDGE_STROKE_WIDTH = 2
+WATER_STROKE_WIDTH = 6
+PALETTE = ['#CDE2C3', '#CBE7EF', '#CAEFE3', '#F3DCF4', '#D6DAED',
+           '#E8DCF4', '#EEEFD3', '#F4DFD0', '#F9D2D2']
+
+
+def main():
+    if len(sys.argv) < 2 or '--help' in sys.argv or '-h' in sys.argv:
+        # Display help and stop
+        print(HELP)
+        quit()
+
+    territories = option('--territories', 50)
+    svg = generate_map(territories,
+                       vertices=option('--vertices', 24),
+                       edges=option('--edges', None),
+                       water_connections=option('--water-connections', None),
+                       castles=option('--castles', None),
+                       regions=option('--regions', None),
+                       seed=option('--seed', SEED))
+    with open(sys.argv[1], 'w') as output_file:
+        output_file.write(svg)
+    print('Wrote a map with {} territories to {}'.format(territories, sys.argv[1]))
+
+
+def option(name, default):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return int(sys.argv[index + 1])
+    return default
+
+
+def generate_map(territories, vertices=24, edges=None, water_connections=None,
+                 castles=None, regions=None, seed=SEED):
+    """
+    Returns the svg source of a synthetic map. Unspecified counts default to
+    values in proportion to the number of territories
+    """
+    if territories < 2:
+        raise ValueError('A map needs at least 2 territories, got {}'.format(territories))
+    if water_connections is None:
+        water_connections = max(1, territories // 20)
+    if castles is None:
+        castles = territories // 10
+    if regions is None:
+        regions = max(1, territories // 8)
+    regions = min(regions, territories)
+
+    rng = random.Random(seed)
+    grid = Grid(territories, max(1, round(vertices / 4)), seed)
+    centers = [grid.center(cell, rng) for cell in range(territories)]
+    castle_cells = set(rng.sample(range(territories), min(castles, territories)))
+
+    # territory numbers run through the grid in order, so regions are contiguous
+    region_of = [cell * regions // territories for cell in range(territories)]
+    center_class = 'st{}'.format(regions)
+    text_classes = 'st{} st{}'.format(regions + 1, regions + 2)
+    edge_class = 'st{}'.format(regions + 3)
+    water_class = 'st{}'.format(regions + 4)
+
+    lines = ['<?xml version="1.0" encoding="utf-8"?>',
+             '<svg version="1.1" xmlns="http://www.w3.org/2000/svg" x="0px" y="0px"',
+             '\t viewBox="0 0 {} {}" xml:space="preserve">'.format(
+                 number(grid.width), number(grid.height)),
+             '<style type="text/css">']
+    for region in range(regions):
+        lines.append('\t.st{}{{fill:{};}}'.format(region, PALETTE[region % len(PALETTE)]))
+    lines += ['\t.{}{{fill:#76C377;}}'.format(center_class),
+              "\t.st{}{{font-family:'ArialMT';}}".format(regions + 1),
+              '\t.st{}{{font-size:12px;}}'.format(regions + 2),
+              '\t.{}{{fill:none;stroke:#2111BC;stroke-width:{};stroke-miterlimit:10;}}'
+              .format(edge_class, EDGE_STROKE_WIDTH),
+              '\t.{}{{fill:none;stroke:#8C1738;stroke-width:{};stroke-miterlimit:10;}}'
+              .format(water_class, WATER_STROKE_WIDTH),
+              '</style>']
+
+    for cell in range(territories):
+        cx, cy = centers[cell]
+        fill_class = 'st{}'.format(region_of[cell])
+        lines.append('<g>')
+        if grid.is_polygon(cell):
+            lines.append('\t<polygon class="{}" points="{}"/>'.format(
+                fill_class, grid.polygon_points(cell)))
+        else:
+            lines.append('\t<path class="{}" d="{}"/>'.format(fill_class, grid.path_data(cell)))
+        lines.append('\t<circle class="{}" cx="{}" cy="{}" r="{}"/>'.format(
+            center_class, number(cx), number(cy), CENTER_RADIUS))
+        lines.append('\t<text transform="matrix(1 0 0 1 {} {})" class="{}">{}</text>'.format(
+            number(cx - 4 * SCALE), number(cy + 4 * SCALE), text_classes, cell))
+        if cell in castle_cells:
+            lines.append('\t<rect x="{}" y="{}" width="{}" height="{}"/>'.format(
+                number(cx + 8 * SCALE), number(cy - 8 * SCALE), CASTLE_SIZE, CASTLE_SIZE))
+        lines.append('</g>')
+
+    lines.append('<g>')
+    for a, b in grid.edges(edges, rng):
+        lines.append('\t<line class="{}" x1="{}" y1="{}" x2="{}" y2="{}"/>'.format(
+            edge_class, number(centers[a][0]), number(centers[a][1]),
+            number(centers[b][0]), number(centers[b][1])))
+    lines.append('</g>')
+
+    lines.append('<g>')
+    for _ in range(water_connections):
+        a, b = rng.sample(range(territories), 2)
+        points = water_points(centers[a], centers[b], rng)
+        if len(points) == 2:
+            lines.append('\t<line class="{}" x1="{}" y1="{}" x2="{}" y2="{}"/>'.format(
+                water_class, number(points[0][0]), number(points[0][1]),
+                number(points[1][0]), number(points[1][1])))
+        else:
+            lines.append('\t<polyline class="{}" points="{} \t"/>'.format(
+                water_class, ' '.join(point(p) for p in points)))
+    lines.append('</g>')
+    lines.append('</svg>')
+    return '\n'.join(lines) + '\n'
+
+
+class Grid:
+    """
+    Jittered grid of territory cells, filled row by row. Every side between
+    two lattice corners is subdivided and jittered once, from a random
+    generator seeded by the side itself, so both cells along a side draw
+    exactly the same border
+    """
+
+    def __init__(self, territories, subdivisions, seed):
+        self.territories = territories
+        self.subdivisions = subdivisions
+        self.seed = seed
+        self.columns = math.ceil(math.sqrt(territories))
+        self.rows = math.ceil(territories / self.columns)
+        self.width = 2 * MARGIN + self.columns * CELL_SIZE
+        self.height = 2 * MARGIN + self.rows * CELL_SIZE
+        self.polygons = [self.random('cell', cell).random() < POLYGON_TERRITORIES
+                         for cell in range(territories)]
+        self.sides = {}
+
+    def random(self, *key):
+        return random.Random('{}:{}'.format(self.seed, key))
+
+    def cell_at(self, column, row):
+        if 0 <= column < self.columns and row >= 0:
+            cell = row * self.columns + column
+            if cell < self.territories:
+                return cell
+        return None
+
+    def is_polygon(self, cell):
+        return self.polygons[cell]
+
+    def corner(self, column, row):
+        # corners on the edge of the grid stay put, keeping the outline straight
+        x = MARGIN + column * CELL_SIZE
+        y = MARGIN + row * CELL_SIZE
+        rng = self.random('corner', column, row)
+        if 0 < column < self.columns:
+            x += round(rng.uniform(-CORNER_JITTER, CORNER_JITTER) * CELL_SIZE)
+        if 0 < row < self.rows:
+            y += round(rng.uniform(-CORNER_JITTER, CORNER_JITTER) * CELL_SIZE)
+        return x, y
+
+    def side(self, key):
+        """
+        Returns the segments of a side from its first corner to its second, as
+        (start, control 1, control 2, end) tuples with no controls for lines
+        """
+        if key in self.sides:
+            return self.sides[key]
+        kind, column, row = key
+        start = self.corner(column, row)
+        end = self.corner(column + 1, row) if kind == 'h' else self.corner(column, row + 1)
+        neighbours = [self.cell_at(column, row - 1), self.cell_at(column, row)] if kind == 'h' \
+            else [self.cell_at(column - 1, row), self.cell_at(column, row)]
+        rng = self.random(*key)
+        # polygons cannot draw curves, so only sides between paths are curved
+        curved = rng.random() < CURVED_SIDES and \
+            not any(self.polygons[cell] for cell in neighbours if cell is not None)
+
+        dx, dy = end[0] - start[0], end[1] - start[1]
+        length = math.hypot(dx, dy)
+        normal = (-dy / length, dx / length)
+        points = [start]
+        for i in range(1, self.subdivisions):
+            t = i / self.subdivisions
+            offset = rng.uniform(-BORDER_JITTER, BORDER_JITTER) * CELL_SIZE
+            points.append((round(start[0] + t * dx + offset * normal[0]),
+                           round(start[1] + t * dy + offset * normal[1])))
+        points.append(end)
+
+        segments = []
+        for p0, p1 in zip(points, points[1:]):
+            if curved:
+                bulge = rng.uniform(-BORDER_JITTER, BORDER_JITTER) * CELL_SIZE
+                segments.append((p0, self.control(p0, p1, 1 / 3, bulge, normal),
+                                 self.control(p0, p1, 2 / 3, bulge, normal), p1))
+            else:
+                segments.append((p0, None, None, p1))
+        self.sides[key] = segments
+        return segments
+
+    @staticmethod
+    def control(p0, p1, t, bulge, normal):
+        return (round(p0[0] + t * (p1[0] - p0[0]) + bulge * normal[0]),
+                round(p0[1] + t * (p1[1] - p0[1]) + bulge * normal[1]))
+
+    def outline(self, cell):
+        # clockwise: top, right, then the bottom and left sides in reverse
+        column, row = cell % self.columns, cell // self.columns
+        segments = list(self.side(('h', column, row)))
+        segments += self.side(('v', column + 1, row))
+        segments += [(p1, c2, c1, p0) for p0, c1, c2, p1
+                     in reversed(self.side(('h', column, row + 1)))]
+        segments += [(p1, c2, c1, p0) for p0, c1, c2, p1
+                     in reversed(self.side(('v', column, row)))]
+        return segments
+
+    def polygon_points(self, cell):
+        return ' '.join(point(segment[0]) for segment in self.outline(cell))
+
+    def path_data(self, cell):
+        segments = self.outline(cell)
+        parts = ['M' + point(segments[0][0])]
+        for p0, c1, c2, p1 in segments[:-1]:
+            if c1 is None:
+                parts.append('l' + relative(p0, p1))
+            else:
+                parts.append('c{} {} {}'.format(relative(p0, c1), relative(p0, c2),
+                                                 relative(p0, p1)))
+        p0, c1, c2, p1 = segments[-1]
+        if c1 is not None:
+            parts.append('c{} {} {}'.format(relative(p0, c1), relative(p0, c2),
+                                             relative(p0, p1)))
+        return ''.join(parts) + 'z'
+
+    def center(self, cell, rng):
+        column, row = cell % self.columns, cell // self.columns
+        corners = [self.corner(column + i, row + j) for i in (0, 1) for j in (0, 1)]
+        x = sum(c[0] for c in corners) / 4
+        y = sum(c[1] for c in corners) / 4
+        return (round(x + rng.uniform(-CENTER_JITTER, CENTER_JITTER) * CELL_SIZE),
+                round(y + rng.uniform(-CENTER_JITTER, CENTER_JITTER) * CELL_SIZE))
+
+    def edges(self, count, rng):
+        sides = []
+        diagonals = []
+        for cell in range(self.territories):
+            column, row = cell % self.columns, cell // self.columns
+            for other in [self.cell_at(column + 1, row), self.cell_at(column, row + 1)]:
+                if other is not None:
+                    sides.append((cell, other))
+            for other in [self.cell_at(column + 1, row + 1), self.cell_at(column - 1, row + 1)]:
+                if other is not None:
+                    diagonals.append((cell, other))
+        if count is None:
+            return sides
+        rng.shuffle(sides)
+        rng.shuffle(diagonals)
+        return sorted((sides + diagonals)[:count])
+
+
+def water_points(start, end, rng):
+    count = rng.randint(0, MAX_MIDPOINTS)
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length = math.hypot(dx, dy)
+    normal = (-dy / length, dx / length)
+    points = [start]
+    for i in range(1, count + 1):
+        t = i / (count + 1)
+        offset = rng.uniform(-0.15, 0.15) * length
+        points.append((round(start[0] + t * dx + offset * normal[0]),
+                       round(start[1] + t * dy + offset * normal[1])))
+    points.append(end)
+    return points
+
+
+def number(tenths):
+    """
+    Formats a coordinate in tenths of svg units like an svg exporter would,
+    without trailing zeros
+    """
+    whole, fraction = divmod(abs(int(tenths)), SCALE)
+    sign = '-' if tenths < 0 else ''
+    return '{}{}.{}'.format(sign, whole, fraction) if fraction else '{}{}'.format(sign, whole)
+
+
+def point(p):
+    return '{},{}'.format(number(p[0]), number(p[1]))
+
+
+def relative(p0, p1):
+    return point((p1[0] - p0[0], p1[1] - p0[1]))
+
+
+# Run script
+if __name__ == '__main__':
+    main()
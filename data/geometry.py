@@ -0,0 +1,359 @@
+import re
+import numpy as np
+from svgpathtools.bezier import bezier_real_minmax
+
+__author__      = "Joseph Azevedo"
+
+"""
+geometry.py
+-----------
+Array-backed path geometry for the encoder. A batch of path strings is parsed
+into one flat table of segments (start, two control points, end) stored as
+float arrays, which lets bounding boxes and affine transforms run as
+vectorized numpy operations across every territory of a map at once.
+
+The arithmetic deliberately mirrors svgpathtools (including its polynomial
+round trip when scaling and its Horner evaluation when finding curve extrema)
+so that the resulting path data is identical to the svgpathtools route. Paths
+containing segments that are not supported here (arcs and quadratic curves)
+are flagged so the caller can fall back to svgpathtools for them
+"""
+
+LINE = 0
+CUBIC = 1
+COMMAND_REGEX = re.compile(r'([MmZzLlHhVvCcSsQqTtAa])([^MmZzLlHhVvCcSsQqTtAa]*)')
+NUMBER_REGEX = re.compile(r'[-+]?(?:[0-9]*\.[0-9]+|[0-9]+\.?)(?:[eE][-+]?[0-9]+)?')
+UNSUPPORTED_COMMANDS = ['Q', 'T', 'A']
+COMMAND_ARGS = {'M': 2, 'Z': 0, 'L': 2, 'H': 1, 'V': 1, 'C': 6, 'S': 4, 'Q': 4, 'T': 2, 'A': 7}
+# Matches svgpathtools.constants.FLOAT_EPSILON
+FLOAT_EPSILON = 1e-12
+
+
+class PathArrays:
+    """
+    Flat segment table for a batch of paths. Segment i of the batch has kind
+    kinds[i] and control points (x[i, j], y[i, j]) for j in start, control 1,
+    control 2 and end (lines leave the control columns unused). The segments
+    of path p are offsets[p] through offsets[p + 1] - 1
+    """
+
+    def __init__(self, kinds, x, y, offsets, supported):
+        self.kinds = kinds
+        self.x = x
+        self.y = y
+        self.offsets = offsets
+        self.supported = supported
+
+    def __len__(self):
+        return len(self.supported)
+
+
+def parse_segments(path_data):
+    """
+    Parses a single path string into a list of (kind, points) tuples with
+    absolute coordinates, or None if the path uses an unsupported command
+    """
+    segments = []
+    current_x, current_y = 0.0, 0.0
+    start_x, start_y = 0.0, 0.0
+    command = None
+    for letter, arguments in COMMAND_REGEX.findall(path_data):
+        last_command = command
+        command = letter.upper()
+        absolute = letter.isupper()
+        values = list(map(float, NUMBER_REGEX.findall(arguments)))
+        count = COMMAND_ARGS[command]
+        if command == 'Z':
+            if values:
+                # implicit commands cannot follow a close path
+                return None
+            if current_x != start_x or current_y != start_y:
+                segments.append((LINE, (current_x, current_y, start_x, start_y)))
+            current_x, current_y = start_x, start_y
+            command = None
+            continue
+        if command in UNSUPPORTED_COMMANDS or not values or len(values) % count:
+            return None
+
+        for i in range(0, len(values), count):
+            if i > 0:
+                last_command = command
+            if command == 'M':
+                x, y = values[i], values[i + 1]
+                if not absolute:
+                    x, y = current_x + x, current_y + y
+                current_x, current_y = x, y
+                start_x, start_y = x, y
+                # implicit commands after a move are lines
+                command = 'L'
+                count = COMMAND_ARGS[command]
+            elif command == 'L' or command == 'H' or command == 'V':
+                if command == 'L':
+                    x, y = values[i], values[i + 1]
+                    if not absolute:
+                        x, y = x + current_x, y + current_y
+                elif command == 'H':
+                    x, y = values[i], current_y
+                    if not absolute:
+                        x = x + current_x
+                else:
+                    x, y = current_x, values[i]
+                    if not absolute:
+                        y = y + current_y
+                segments.append((LINE, (current_x, current_y, x, y)))
+                current_x, current_y = x, y
+            else:
+                if command == 'C':
+                    x1, y1 = values[i], values[i + 1]
+                    i += 2
+                elif last_command == 'C' or last_command == 'S':
+                    # reflect the previous second control point about the current point
+                    previous = segments[-1][1]
+                    x1 = current_x + current_x - previous[4]
+                    y1 = current_y + current_y - previous[5]
+                else:
+                    x1, y1 = current_x, current_y
+                x2, y2, x, y = values[i], values[i + 1], values[i + 2], values[i + 3]
+                if not absolute:
+                    if command == 'C':
+                        x1, y1 = x1 + current_x, y1 + current_y
+                    x2, y2 = x2 + current_x, y2 + current_y
+                    x, y = x + current_x, y + current_y
+                segments.append((CUBIC, (current_x, current_y, x1, y1, x2, y2, x, y)))
+                current_x, current_y = x, y
+    return segments
+
+
+def parse_paths(paths):
+    kinds = []
+    points = []
+    offsets = [0]
+    supported = []
+    for path_data in paths:
+        segments = parse_segments(path_data)
+        if not segments:
+            supported.append(False)
+        else:
+            supported.append(True)
+            for kind, coords in segments:
+                kinds.append(kind)
+                if kind == LINE:
+                    points.append((coords[0], coords[1], 0.0, 0.0, 0.0, 0.0, coords[2], coords[3]))
+                else:
+                    points.append(coords)
+        offsets.append(len(kinds))
+    table = np.array(points, dtype=np.float64).reshape(-1, 4, 2)
+    return PathArrays(np.array(kinds, dtype=np.int8),
+                      np.ascontiguousarray(table[:, :, 0]),
+                      np.ascontiguousarray(table[:, :, 1]),
+                      np.array(offsets, dtype=np.intp),
+                      supported)
+
+
+def cubic_point(a0, a1, a2, a3, t):
+    # Horner form, evaluated in the same order as svgpathtools.bezier_point
+    return a0 + t * (3 * (a1 - a0) + t * (3 * (a0 + a2) - 6 * a1 + t * (-a0 + 3 * (a1 - a2) + a3)))
+
+
+def cubic_minmax(a0, a1, a2, a3):
+    """
+    Vectorized svgpathtools.bezier_real_minmax over arrays of cubic control
+    coordinates, returning the (min, max) arrays of each curve along one axis
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denom = a0 - 3 * a1 + 3 * a2 - a3
+        delta = a1 ** 2 - (a0 + a1) * a2 + a2 ** 2 + (a0 - a1) * a3
+        sqdelta = np.sqrt(np.where(delta >= 0, delta, 0.0))
+        tau = a0 - 2 * a1 + a2
+        r1 = (tau + sqdelta) / denom
+        r2 = (tau - sqdelta) / denom
+        has_roots = delta >= 0
+        use_r1 = has_roots & (0 < r1) & (r1 < 1)
+        use_r2 = has_roots & (0 < r2) & (r2 < 1)
+
+        # python's min/max keep the first extreme, so fold in the same order
+        values = [cubic_point(a0, a1, a2, a3, 0.0),
+                  cubic_point(a0, a1, a2, a3, 1.0),
+                  cubic_point(a0, a1, a2, a3, np.where(use_r1, r1, 0.0)),
+                  cubic_point(a0, a1, a2, a3, np.where(use_r2, r2, 0.0))]
+    masks = [None, None, use_r1, use_r2]
+    low = values[0]
+    high = values[0]
+    for value, mask in zip(values[1:], masks[1:]):
+        take_low = value < low
+        take_high = value > high
+        if mask is not None:
+            take_low &= mask
+            take_high &= mask
+        low = np.where(take_low, value, low)
+        high = np.where(take_high, value, high)
+
+    # nearly degenerate curves go through numpy's root finder in svgpathtools
+    for i in np.flatnonzero(~(np.abs(denom) > FLOAT_EPSILON)):
+        low[i], high[i] = bezier_real_minmax([a0[i], a1[i], a2[i], a3[i]])
+    return low, high
+
+
+def bounding_boxes(arrays):
+    """
+    Computes (x_min, x_max, y_min, y_max) arrays with one entry per path.
+    Unsupported paths get NaN bounds
+    """
+    x, y = arrays.x, arrays.y
+    x_low = np.minimum(x[:, 0], x[:, 3])
+    x_high = np.maximum(x[:, 0], x[:, 3])
+    y_low = np.minimum(y[:, 0], y[:, 3])
+    y_high = np.maximum(y[:, 0], y[:, 3])
+    cubic = arrays.kinds == CUBIC
+    if cubic.any():
+        x_low[cubic], x_high[cubic] = cubic_minmax(*(x[cubic, j] for j in range(4)))
+        y_low[cubic], y_high[cubic] = cubic_minmax(*(y[cubic, j] for j in range(4)))
+
+    bounds = np.full((4, len(arrays)), np.nan)
+    present = np.flatnonzero(np.diff(arrays.offsets) > 0)
+    if len(present):
+        starts = arrays.offsets[present]
+        bounds[0, present] = np.minimum.reduceat(x_low, starts)
+        bounds[1, present] = np.maximum.reduceat(x_high, starts)
+        bounds[2, present] = np.minimum.reduceat(y_low, starts)
+        bounds[3, present] = np.maximum.reduceat(y_high, starts)
+    return bounds[0], bounds[1], bounds[2], bounds[3]
+
+
+def segment_owners(arrays):
+    return np.repeat(np.arange(len(arrays)), np.diff(arrays.offsets))
+
+
+def join_segments(arrays, x, y, source_x, source_y):
+    """
+    Wherever a segment ended exactly where the next one started in the source
+    coordinates, snap the transformed end onto the transformed next start, as
+    svgpathtools.transform_segments_together does
+    """
+    if len(x) < 2:
+        return
+    joined = (source_x[:-1, 3] == source_x[1:, 0]) & (source_y[:-1, 3] == source_y[1:, 0])
+    # joints never cross from the last segment of one path to the next path
+    last = arrays.offsets[1:-1] - 1
+    joined[last[(last >= 0) & (last < len(joined))]] = False
+    x[:-1, 3] = np.where(joined, x[1:, 0], x[:-1, 3])
+    y[:-1, 3] = np.where(joined, y[1:, 0], y[:-1, 3])
+
+
+def translate(arrays, x, y, dx, dy):
+    owner = segment_owners(arrays)
+    return x + dx[owner][:, None], y + dy[owner][:, None]
+
+
+def scale(arrays, x, y, k):
+    """
+    Scales about the origin through the polynomial form of each segment,
+    replicating the complex arithmetic of svgpathtools.scale (which multiplies
+    each point as k * complex(x, y))
+    """
+    k = k[segment_owners(arrays)]
+
+    # python promotes real operands to complex(s, 0.0), so the zero terms stay
+    def mul(s, re, im):
+        return s * re - 0.0 * im, s * im + 0.0 * re
+
+    def div(re, im, s):
+        return (re + im * 0.0) / s, (im - re * 0.0) / s
+
+    out_x = np.zeros_like(x)
+    out_y = np.zeros_like(y)
+    line = arrays.kinds == LINE
+    if line.any():
+        px0, py0, px3, py3 = x[line, 0], y[line, 0], x[line, 3], y[line, 3]
+        kl = k[line]
+        c0 = mul(kl, px3 - px0, py3 - py0)
+        c1 = mul(kl, px0, py0)
+        c1 = (c1[0] + 0.0, c1[1] + 0.0)
+        out_x[line, 0], out_y[line, 0] = c1
+        out_x[line, 3], out_y[line, 3] = c0[0] + c1[0], c0[1] + c1[1]
+    cubic = arrays.kinds == CUBIC
+    if cubic.any():
+        p = [(x[cubic, j], y[cubic, j]) for j in range(4)]
+        kc = k[cubic]
+        three = np.full_like(kc, 3.0)
+        two = np.full_like(kc, 2.0)
+
+        def sub(a, b):
+            return a[0] - b[0], a[1] - b[1]
+
+        def add(a, b):
+            return a[0] + b[0], a[1] + b[1]
+
+        coeffs = [add(add((-p[0][0], -p[0][1]), mul(three, *sub(p[1], p[2]))), p[3]),
+                  mul(three, *add(sub(p[0], mul(two, *p[1])), p[2])),
+                  mul(three, *sub(p[1], p[0])),
+                  p[0]]
+        c = [mul(kc, *coeff) for coeff in coeffs]
+        c[3] = (c[3][0] + 0.0, c[3][1] + 0.0)
+        points = [c[3],
+                  add(div(*c[2], three), c[3]),
+                  add(div(*add(c[1], mul(two, *c[2])), three), c[3]),
+                  add(add(add(c[0], c[1]), c[2]), c[3])]
+        for j, (re, im) in enumerate(points):
+            out_x[cubic, j] = re
+            out_y[cubic, j] = im
+    return out_x, out_y
+
+
+def format_paths(arrays, x, y):
+    """
+    Formats each path the way svgpathtools.Path.d() does, returning None for
+    unsupported paths
+    """
+    # a segment starts a new subpath unless it begins where the last one ended
+    moves = np.ones(len(x), dtype=bool)
+    if len(x) > 1:
+        moves[1:] = (x[1:, 0] != x[:-1, 3]) | (y[1:, 0] != y[:-1, 3])
+    moves[arrays.offsets[:-1][np.diff(arrays.offsets) > 0]] = True
+
+    kinds = arrays.kinds.tolist()
+    moves = moves.tolist()
+    xs = x.tolist()
+    ys = y.tolist()
+    result = []
+    for p in range(len(arrays)):
+        if not arrays.supported[p]:
+            result.append(None)
+            continue
+        parts = []
+        for i in range(arrays.offsets[p], arrays.offsets[p + 1]):
+            sx, sy = xs[i], ys[i]
+            if moves[i]:
+                parts.append(f'M {sx[0]},{sy[0]}')
+            if kinds[i] == LINE:
+                parts.append(f'L {sx[3]},{sy[3]}')
+            else:
+                parts.append(f'C {sx[1]},{sy[1]} {sx[2]},{sy[2]} {sx[3]},{sy[3]}')
+        result.append(' '.join(parts))
+    return result
+
+
+def fit_paths(paths, size):
+    """
+    Scales and centers each path so that it fits in a size x size box while
+    keeping its aspect ratio, returning the transformed path data (or None
+    for paths that must be handled by svgpathtools instead)
+    """
+    arrays = parse_paths(paths)
+    x_min, x_max, y_min, y_max = bounding_boxes(arrays)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        w = x_max - x_min
+        h = y_max - y_min
+        kx = size / w
+        ky = size / h
+        k = np.where(ky < kx, ky, kx)
+        offset_x = (size - (w * k)) / 2
+        offset_y = (size - (h * k)) / 2
+
+    origin_x, origin_y = translate(arrays, arrays.x, arrays.y, -x_min, -y_min)
+    join_segments(arrays, origin_x, origin_y, arrays.x, arrays.y)
+    normalized_x, normalized_y = scale(arrays, origin_x, origin_y, k)
+    join_segments(arrays, normalized_x, normalized_y, origin_x, origin_y)
+    centered_x, centered_y = translate(arrays, normalized_x, normalized_y, offset_x, offset_y)
+    join_segments(arrays, centered_x, centered_y, normalized_x, normalized_y)
+    return format_paths(arrays, centered_x, centered_y)
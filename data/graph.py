@@ -0,0 +1,98 @@
+from collections import deque
+
+__author__      = "Joseph Azevedo"
+
+"""
+graph.py
+--------
+Connection graph analytics for the encoder, computed once per map so that the
+server and client can load them instead of rebuilding them from the edge list.
+The graph covers both land edges and water connections; self loops and
+repeated links are dropped.
+
+  offsets     compressed sparse row adjacency: the sorted neighbours of node i
+  neighbours  are neighbours[offsets[i]:offsets[i + 1]]
+  components  connected component of each node, numbered in order of each
+              component's lowest node
+  borders     sorted nodes with at least one neighbour in another region
+
+Hop distances are not written, since a table of every pair grows
+quadratically and the client only needs adjacency; hop_distances computes
+them from the adjacency arrays when they are needed
+"""
+
+UNREACHABLE = -1
+
+
+def build_graph(node_count, links, regions):
+    """
+    Builds the graph of a map from its (a, b) links and (first, last) region
+    ranges. Links to nodes outside of the map are ignored
+    """
+    offsets, neighbours = adjacency(node_count, links)
+    graph = {
+        'offsets': offsets,
+        'neighbours': neighbours,
+        'components': components(offsets, neighbours),
+        'borders': region_borders(offsets, neighbours, regions)
+    }
+    return graph
+
+
+def adjacency(node_count, links):
+    neighbour_sets = [set() for _ in range(node_count)]
+    for a, b in links:
+        if a != b and 0 <= a < node_count and 0 <= b < node_count:
+            neighbour_sets[a].add(b)
+            neighbour_sets[b].add(a)
+    offsets = [0]
+    neighbours = []
+    for neighbour_set in neighbour_sets:
+        neighbours.extend(sorted(neighbour_set))
+        offsets.append(len(neighbours))
+    return offsets, neighbours
+
+
+def components(offsets, neighbours):
+    component = [-1] * (len(offsets) - 1)
+    count = 0
+    for start in range(len(component)):
+        if component[start] == -1:
+            component[start] = count
+            label_reachable(offsets, neighbours, start, component, count)
+            count += 1
+    return component
+
+
+def region_borders(offsets, neighbours, regions):
+    region = [-1] * (len(offsets) - 1)
+    for index, (first, last) in enumerate(regions):
+        for node in range(max(first, 0), min(last + 1, len(region))):
+            region[node] = index
+    return [node for node in range(len(region)) if region[node] != -1 and
+            any(region[n] != region[node] for n in neighbours[offsets[node]:offsets[node + 1]])]
+
+
+def hop_distances(offsets, neighbours, start):
+    """
+    Hop distance from start to every node (UNREACHABLE where there is no path)
+    """
+    distances = [UNREACHABLE] * (len(offsets) - 1)
+    distances[start] = 0
+    label_reachable(offsets, neighbours, start, distances)
+    return distances
+
+
+def label_reachable(offsets, neighbours, start, labels, label=None):
+    """
+    Labels every unlabelled (-1) node reachable from start with the given
+    label, or with its hop distance from start if no label is given
+    """
+    queue = deque([start])
+    while queue:
+        node = queue.popleft()
+        next_label = labels[node] + 1 if label is None else label
+        for neighbour in neighbours[offsets[node]:offsets[node + 1]]:
+            if labels[neighbour] == -1:
+                labels[neighbour] = next_label
+                queue.append(neighbour)
@@ -0,0 +1,110 @@
+import math
+import numpy as np
+from svgpathtools import parse_path
+from .geometry import parse_paths, bounding_boxes
+
+__author__      = "Joseph Azevedo"
+
+"""
+hittest.py
+----------
+Point to territory lookup for the encoder output. The bounding box of every
+territory is indexed in a uniform grid laid over the map bounds, sized for
+about one territory per cell, so finding the territories under a point only
+means checking the few candidates of the cell it falls in:
+
+  width       extent of the grid from the origin, in map units
+  height
+  columns     number of cells across and down; cell (column, row) covers
+  rows        width / columns by height / rows map units
+  offsets     compressed sparse row offsets: the candidates of cell
+              i = row * columns + column are territories[offsets[i]:offsets[i + 1]]
+  territories the sorted territories whose bounding box overlaps each cell,
+              in cell order
+
+Bounding boxes are (x_min, y_min, x_max, y_max) lists rounded outwards to
+BOUNDS_PLACES decimal places, so they always contain their territory
+"""
+
+BOUNDS_PLACES = 2
+# Fraction of a cell that bounding boxes are widened by, so that points on the
+# edge of a cell find the territories of both cells despite rounding
+CELL_MARGIN = 1e-4
+
+
+def territory_bounds(paths):
+    """
+    Computes the bounding box of each path in a batch
+    """
+    x_min, x_max, y_min, y_max = bounding_boxes(parse_paths(paths))
+    bounds = []
+    for i, path_data in enumerate(paths):
+        if np.isnan(x_min[i]):
+            # paths with arcs or quadratic curves take the svgpathtools route
+            box = parse_path(path_data).bbox()
+        else:
+            box = (x_min[i], x_max[i], y_min[i], y_max[i])
+        bounds.append([round_down(box[0]), round_down(box[2]), round_up(box[1]), round_up(box[3])])
+    return bounds
+
+
+def round_down(value):
+    scale = 10 ** BOUNDS_PLACES
+    return math.floor(round(value * scale, 6)) / scale
+
+
+def round_up(value):
+    scale = 10 ** BOUNDS_PLACES
+    return math.ceil(round(value * scale, 6)) / scale
+
+
+def build_hit_grid(bounds, width, height):
+    """
+    Indexes the bounding boxes of every territory in a grid over the map
+    bounds (or over the territories themselves if the map has no size)
+    """
+    width = width if width > 0 else max((box[2] for box in bounds), default=1)
+    height = height if height > 0 else max((box[3] for box in bounds), default=1)
+    columns = max(1, round(math.sqrt(len(bounds) * width / height)))
+    rows = max(1, round(math.sqrt(len(bounds) * height / width)))
+    cells = [[] for _ in range(columns * rows)]
+    for territory, box in enumerate(bounds):
+        first_column, last_column = cell_span(box[0], box[2], width / columns, columns)
+        first_row, last_row = cell_span(box[1], box[3], height / rows, rows)
+        for row in range(first_row, last_row + 1):
+            for column in range(first_column, last_column + 1):
+                cells[row * columns + column].append(territory)
+    offsets = [0]
+    territories = []
+    for cell in cells:
+        territories.extend(cell)
+        offsets.append(len(territories))
+    return {
+        'width': width,
+        'height': height,
+        'columns': columns,
+        'rows': rows,
+        'offsets': offsets,
+        'territories': territories
+    }
+
+
+def cell_span(low, high, cell_size, count):
+    # territories reaching past the map bounds are kept in its edge cells
+    first = min(max(math.floor(low / cell_size - CELL_MARGIN), 0), count - 1)
+    last = min(max(math.floor(high / cell_size + CELL_MARGIN), 0), count - 1)
+    return first, last
+
+
+def candidates_at(grid, bounds, x, y):
+    """
+    Finds the territories whose bounding box contains a point, which are the
+    only ones that can contain the point itself
+    """
+    columns, rows = grid['columns'], grid['rows']
+    column = min(max(math.floor(x * columns / grid['width']), 0), columns - 1)
+    row = min(max(math.floor(y * rows / grid['height']), 0), rows - 1)
+    cell = row * columns + column
+    return [territory for territory in grid['territories'][grid['offsets'][cell]:grid['offsets'][cell + 1]]
+            if bounds[territory][0] <= x <= bounds[territory][2]
+            and bounds[territory][1] <= y <= bounds[territory][3]]
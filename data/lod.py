@@ -0,0 +1,268 @@
+import math
+import functools
+from collections import defaultdict
+from svgpathtools import parse_path
+from .geometry import parse_segments, LINE
+
+__author__      = "Joseph Azevedo"
+
+"""
+lod.py
+------
+Level of detail tiers for territory outlines. Every territory is flattened
+into polygon rings, which are then simplified (Douglas-Peucker) to within the
+error bound of each tier.
+
+Simplification is topology-aware: vertices are matched across territories
+(to PLACES decimal places, snapping vertices one step apart together so that
+curves flattened from either direction still match), and each ring is cut
+into arcs wherever the set of territories sharing its vertices changes. Each
+distinct arc is simplified once and reused, in its stored direction or
+reversed, by every ring that contains it, so neighbouring territories keep
+sharing exactly the same simplified border and junctions between three or
+more territories never move. A ring that would collapse below a triangle
+keeps the previous tier's outline instead.
+
+Tiers are written as relative path data whose deltas are taken between
+vertices already rounded to the tier's decimal places, so shared vertices
+come out identical in every territory (rounding each delta on its own, as the
+path minifier does, would let neighbouring outlines drift apart)
+"""
+
+# Maximum distance between a flattened curve and the curve itself
+FLATTEN_TOLERANCE = 0.05
+# Vertices closer than this many decimal places are treated as shared
+PLACES = 2
+
+
+def simplify_territories(paths, tiers):
+    """
+    Simplifies a batch of territory path strings to each of the given
+    (error bound in map units, decimal places) tiers, returning the list of
+    tier path strings of each territory in order
+    """
+    grid = {}
+    rings = [snap_rings(territory_rings(path_data), grid) for path_data in paths]
+    all_rings = [ring for territory in rings for ring in territory]
+    owners = defaultdict(set)
+    for ring_index, ring in enumerate(all_rings):
+        for point in ring:
+            owners[point].add(ring_index)
+    arcs = [ring_arcs(ring, owners) for ring in all_rings]
+
+    tier_rings = []
+    previous = all_rings
+    for tolerance, _ in tiers:
+        simplified = {}
+        current = []
+        for ring, previous_ring in zip(arcs, previous):
+            points = []
+            for arc in ring:
+                points.extend(simplify_arc(arc, tolerance, simplified)[:-1])
+            current.append(points if len(points) >= 3 else previous_ring)
+        tier_rings.append(current)
+        previous = current
+
+    results = []
+    ring_index = 0
+    for territory in rings:
+        indices = range(ring_index, ring_index + len(territory))
+        results.append([format_rings([current[i] for i in indices], places)
+                        for current, (_, places) in zip(tier_rings, tiers)])
+        ring_index += len(territory)
+    return results
+
+
+def territory_rings(path_data):
+    """
+    Flattens a path into closed rings of distinct (x, y) vertices, rounded to
+    PLACES decimal places
+    """
+    segments = parse_segments(path_data)
+    if segments:
+        polylines = []
+        end = None
+        for kind, coords in segments:
+            start = (coords[0], coords[1])
+            if start != end:
+                polylines.append([start])
+            if kind == LINE:
+                polylines[-1].append((coords[2], coords[3]))
+            else:
+                polylines[-1].extend(flatten_cubic(*coords))
+            end = polylines[-1][-1]
+    else:
+        # paths with arcs or quadratic curves take the svgpathtools route
+        polylines = [[(point.real, point.imag) for point in flatten_segments(subpath)]
+                     for subpath in parse_path(path_data).continuous_subpaths()]
+
+    rings = []
+    for polyline in polylines:
+        ring = []
+        for x, y in polyline:
+            point = (round(x, PLACES) + 0.0, round(y, PLACES) + 0.0)
+            if not ring or ring[-1] != point:
+                ring.append(point)
+        if len(ring) > 1 and ring[0] == ring[-1]:
+            ring.pop()
+        if len(ring) >= 3:
+            rings.append(ring)
+    return rings
+
+
+def snap_rings(rings, grid):
+    """
+    Replaces each vertex with the first vertex seen within one step of
+    PLACES decimal places in any direction, dropping repeated vertices
+    """
+    step = 10 ** PLACES
+    snapped = []
+    for ring in rings:
+        result = []
+        for point in ring:
+            cell = (round(point[0] * step), round(point[1] * step))
+            match = next((grid[(cell[0] + dx, cell[1] + dy)] for dx in (-1, 0, 1) for dy in (-1, 0, 1)
+                          if (cell[0] + dx, cell[1] + dy) in grid), None)
+            if match is None:
+                grid[cell] = match = point
+            if not result or result[-1] != match:
+                result.append(match)
+        if len(result) > 1 and result[0] == result[-1]:
+            result.pop()
+        if len(result) >= 3:
+            snapped.append(result)
+    return snapped
+
+
+def flatten_cubic(x0, y0, x1, y1, x2, y2, x3, y3):
+    # uniform subdivision, with enough steps to keep within FLATTEN_TOLERANCE
+    curvature = max(math.hypot(x0 - 2 * x1 + x2, y0 - 2 * y1 + y2),
+                    math.hypot(x1 - 2 * x2 + x3, y1 - 2 * y2 + y3))
+    steps = max(1, math.ceil(math.sqrt(0.75 * curvature / FLATTEN_TOLERANCE)))
+    points = []
+    for step in range(1, steps):
+        t = step / steps
+        s = 1 - t
+        a, b, c, d = s * s * s, 3 * s * s * t, 3 * s * t * t, t * t * t
+        points.append((a * x0 + b * x1 + c * x2 + d * x3, a * y0 + b * y1 + c * y2 + d * y3))
+    points.append((x3, y3))
+    return points
+
+
+def flatten_segments(subpath):
+    points = [subpath[0].start]
+    for segment in subpath:
+        steps = max(1, math.ceil(math.sqrt(segment.length() / FLATTEN_TOLERANCE)))
+        points.extend(segment.point(step / steps) for step in range(1, steps + 1))
+    return points
+
+
+def ring_arcs(ring, owners):
+    """
+    Cuts a ring into arcs that start and end at its fixed vertices: those
+    shared by three or more rings, or where the rings sharing the outline
+    change. Every arc includes both of its end points
+    """
+    count = len(ring)
+    fixed = [i for i in range(count)
+             if len(owners[ring[i]]) > 2
+             or owners[ring[i]] != owners[ring[i - 1]]
+             or owners[ring[i]] != owners[ring[(i + 1) % count]]]
+    if not fixed:
+        # an outline shared throughout starts at the same vertex from every ring
+        fixed = [ring.index(min(ring))]
+    arcs = []
+    for start, end in zip(fixed, fixed[1:] + [fixed[0] + count]):
+        arcs.append([ring[i % count] for i in range(start, end + 1)])
+    return arcs
+
+
+def simplify_arc(arc, tolerance, simplified):
+    """
+    Simplifies an arc through the cache of already simplified arcs, so that
+    the same arc traversed in either direction always simplifies identically
+    """
+    forward = tuple(arc)
+    backward = forward[::-1]
+    key = min(forward, backward)
+    if key not in simplified:
+        simplified[key] = douglas_peucker(key, tolerance)
+    return simplified[key] if key == forward else simplified[key][::-1]
+
+
+def douglas_peucker(points, tolerance):
+    last = len(points) - 1
+    if last < 2:
+        return list(points)
+    keep = [False] * len(points)
+    keep[0] = keep[last] = True
+    if points[0] == points[last]:
+        # closed arcs are first split at the vertex farthest from their ends
+        far = max(range(1, last), key=lambda i: distance(points[i], points[0]))
+        keep[far] = True
+        stack = [(0, far), (far, last)]
+    else:
+        stack = [(0, last)]
+    while stack:
+        first, end = stack.pop()
+        farthest, farthest_distance = None, tolerance
+        for i in range(first + 1, end):
+            d = segment_distance(points[i], points[first], points[end])
+            if d > farthest_distance:
+                farthest, farthest_distance = i, d
+        if farthest is not None:
+            keep[farthest] = True
+            stack.append((first, farthest))
+            stack.append((farthest, end))
+    return [point for point, kept in zip(points, keep) if kept]
+
+
+def distance(a, b):
+    return math.hypot(a[0] - b[0], a[1] - b[1])
+
+
+def segment_distance(point, start, end):
+    dx, dy = end[0] - start[0], end[1] - start[1]
+    length_squared = dx * dx + dy * dy
+    if length_squared == 0:
+        return distance(point, start)
+    t = max(0.0, min(1.0, ((point[0] - start[0]) * dx + (point[1] - start[1]) * dy) / length_squared))
+    return distance(point, (start[0] + t * dx, start[1] + t * dy))
+
+
+def format_rings(rings, places):
+    scale = 10 ** places
+    parts = []
+    for ring in rings:
+        points = []
+        for x, y in ring:
+            point = (round(x * scale), round(y * scale))
+            if not points or points[-1] != point:
+                points.append(point)
+        if len(points) > 1 and points[0] == points[-1]:
+            points.pop()
+        if len(points) < 3:
+            continue
+        numbers = [format_fixed(points[0][0], places), format_fixed(points[0][1], places)]
+        for (x0, y0), (x1, y1) in zip(points, points[1:]):
+            numbers += [format_fixed(x1 - x0, places), format_fixed(y1 - y0, places)]
+        parts.append('M' + join_numbers(numbers[:2]) + 'l' + join_numbers(numbers[2:]) + 'z')
+    return ''.join(parts)
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def format_fixed(value, places):
+    """
+    Formats an integer count of 10^-places units as a decimal number
+    (remembering recent numbers, since deltas repeat a lot across a map)
+    """
+    text = str(abs(value)).rjust(places + 1, '0')
+    if places:
+        text = '{}.{}'.format(text[:-places], text[-places:]).rstrip('0').rstrip('.')
+    return '-' + text if value < 0 else text
+
+
+def join_numbers(numbers):
+    # numbers only need separating when they would otherwise run together
+    return ''.join(number if i == 0 or number[0] == '-' else ' ' + number
+                   for i, number in enumerate(numbers))
@@ -0,0 +1,462 @@
+import re
+from decimal import Context, Decimal, localcontext
+
+__author__      = "Joseph Azevedo"
+
+"""
+minify.py
+---------
+Path data minifier used by the encoder in place of scour. It performs the
+subset of scour's path cleaning that the encoder relies on, producing the same
+output as scour.cleanPath with its default options:
+
+  - converting every command to its relative form
+  - reducing the precision of each coordinate to a number of significant
+    digits
+  - removing empty segments, no-op moves and straight curves, and merging
+    consecutive lines that run in the same direction
+  - collapsing repeated commands into implicit ones and using the h, v and s
+    shorthands where possible
+
+Unlike scour, which reads its precision from module globals, all settings are
+held by an explicit MinifyContext and all intermediate arithmetic runs in a
+local decimal context, so paths can be minified concurrently from multiple
+threads and with different precisions.
+"""
+
+COMMAND_REGEX = re.compile(r'([AaCcHhLlMmQqSsTtVvZz])')
+NUMBER_REGEX = re.compile(r'[-+]?(?:(?:[0-9]*\.[0-9]+)|(?:[0-9]+\.?))(?:[Ee][-+]?[0-9]+)?')
+# Unsigned decimal numbers, with or without an exponent. Integers are left as written
+DECIMAL_REGEX = re.compile(r'[0-9]*\.[0-9]+(?:[Ee][-+]?[0-9]+)?|[0-9]+[Ee][-+]?[0-9]+')
+# Number of arguments consumed per repetition of each command
+COMMAND_ARGS = {'m': 2, 'l': 2, 'h': 1, 'v': 1, 'c': 6, 's': 4, 'q': 4, 't': 2, 'a': 7, 'z': 0}
+# Which arguments of each repetition of a command are control points
+CONTROL_POINTS = {'c': (True, True, True, True, False, False), 's': (True, True, False, False),
+                  'q': (True, True, False, False)}
+DIGITS = frozenset('0123456789')
+# Arithmetic between coordinates uses python's default decimal context
+ARITHMETIC_CONTEXT = Context()
+ONE = Decimal(1)
+
+
+class MinifyContext:
+    """
+    Precision settings for minifying path data: the number of significant
+    digits kept for coordinates, and for curve control points. Contexts can be
+    shared between threads
+    """
+
+    def __init__(self, digits, control_digits=None):
+        self.digits = digits
+        self.control_digits = control_digits if control_digits is not None else digits
+        self.precision = Context(prec=self.digits)
+        self.control_precision = Context(prec=self.control_digits)
+
+    def format(self, value, control=False):
+        return format_number(value, self.control_precision if control else self.precision)
+
+    def format_all(self, data, controls=None):
+        """
+        Formats a command's coordinates, where controls flags the control
+        points of one repetition of the command (or None if it has none)
+        """
+        if controls is None:
+            return [format_number(value, self.precision) for value in data]
+        precisions = [self.control_precision if control else self.precision for control in controls]
+        size = len(precisions)
+        return [format_number(value, precisions[index % size]) for index, value in enumerate(data)]
+
+
+def minify_path(path_data, context):
+    with localcontext(ARITHMETIC_CONTEXT):
+        path = parse(path_data)
+        if not path:
+            return path_data
+        path = to_relative(path)
+        path = remove_empty_segments(path)
+        path = remove_straight_curves(path)
+        path = collapse_commands(path)
+        path = use_shorthands(path)
+        path = merge_collinear_lines(path, context)
+        path = collapse_repeated_commands(path)
+        minified = serialize(path, context)
+    # keep the original if (for whatever reason) minifying made it longer
+    return minified if len(minified) <= len(path_data) else path_data
+
+
+def round_numbers(text, places):
+    """
+    Rounds every decimal number in the text to the given number of places in a
+    single pass, dropping trailing zeros and writing exponents out in full
+    """
+    if isinstance(text, float):
+        text = str(text)
+    spec = '.{}f'.format(places)
+
+    def round_match(match):
+        rounded = format(float(match.group()), spec)
+        return rounded.rstrip('0').rstrip('.') if '.' in rounded else rounded
+    return DECIMAL_REGEX.sub(round_match, text)
+
+
+def parse(path_data):
+    # the text before the first command, then each command and its arguments
+    parts = COMMAND_REGEX.split(path_data)
+    path = [(cmd, NUMBER_REGEX.findall(arguments)) for cmd, arguments in zip(parts[1::2], parts[2::2])]
+    for cmd, numbers in [('', NUMBER_REGEX.findall(parts[0]))] + path:
+        if numbers and cmd in 'zZ':
+            raise ValueError('Expecting a command; got {} in path data [{}]'
+                             .format(numbers[0], path_data))
+    path = [(cmd, list(map(ARITHMETIC_CONTEXT.create_decimal, numbers))) for cmd, numbers in path]
+    for cmd, data in path:
+        count = COMMAND_ARGS[cmd.lower()]
+        if count and (not data or len(data) % count):
+            raise ValueError('Wrong number of arguments for {} in path data [{}]'
+                             .format(cmd, path_data))
+    return path
+
+
+def to_relative(path):
+    # the first moveto is absolute whether it is written as 'm' or 'M'
+    x = y = 0
+    start_x = start_y = 0
+    for index in range(len(path)):
+        cmd, data = path[index]
+        i = 0
+        if cmd == 'A':
+            for i in range(i, len(data), 7):
+                data[i + 5] -= x
+                data[i + 6] -= y
+                x += data[i + 5]
+                y += data[i + 6]
+            path[index] = ('a', data)
+        elif cmd == 'a':
+            x += sum(data[5::7])
+            y += sum(data[6::7])
+        elif cmd == 'H':
+            for i in range(i, len(data)):
+                data[i] -= x
+                x += data[i]
+            path[index] = ('h', data)
+        elif cmd == 'h':
+            x += sum(data)
+        elif cmd == 'V':
+            for i in range(i, len(data)):
+                data[i] -= y
+                y += data[i]
+            path[index] = ('v', data)
+        elif cmd == 'v':
+            y += sum(data)
+        elif cmd == 'M':
+            start_x, start_y = data[0], data[1]
+            if index != 0:
+                data[0] -= x
+                data[1] -= y
+            x, y = start_x, start_y
+            for i in range(2, len(data), 2):
+                data[i] -= x
+                data[i + 1] -= y
+                x += data[i]
+                y += data[i + 1]
+            path[index] = ('m', data)
+        elif cmd in ['L', 'T']:
+            for i in range(i, len(data), 2):
+                data[i] -= x
+                data[i + 1] -= y
+                x += data[i]
+                y += data[i + 1]
+            path[index] = (cmd.lower(), data)
+        elif cmd == 'm':
+            if index == 0:
+                start_x, start_y = data[0], data[1]
+                x, y = start_x, start_y
+                i = 2
+            else:
+                start_x = x + data[0]
+                start_y = y + data[1]
+            for i in range(i, len(data), 2):
+                x += data[i]
+                y += data[i + 1]
+        elif cmd in ['l', 't']:
+            x += sum(data[0::2])
+            y += sum(data[1::2])
+        elif cmd in ['S', 'Q']:
+            for i in range(i, len(data), 4):
+                data[i] -= x
+                data[i + 1] -= y
+                data[i + 2] -= x
+                data[i + 3] -= y
+                x += data[i + 2]
+                y += data[i + 3]
+            path[index] = (cmd.lower(), data)
+        elif cmd in ['s', 'q']:
+            x += sum(data[2::4])
+            y += sum(data[3::4])
+        elif cmd == 'C':
+            for i in range(i, len(data), 6):
+                for j in range(0, 6, 2):
+                    data[i + j] -= x
+                    data[i + j + 1] -= y
+                x += data[i + 4]
+                y += data[i + 5]
+            path[index] = ('c', data)
+        elif cmd == 'c':
+            x += sum(data[4::6])
+            y += sum(data[5::6])
+        elif cmd in ['z', 'Z']:
+            x, y = start_x, start_y
+            path[index] = ('z', data)
+    return path
+
+
+def remove_empty_segments(path):
+    for index in range(len(path)):
+        cmd, data = path[index]
+        # the starting point of a moveto is kept even if it is zero
+        i = 2 if cmd == 'm' else 0
+        if cmd in ['m', 'l', 't', 'c', 'q', 'a']:
+            size = COMMAND_ARGS[cmd]
+            # arcs only count as empty if their end point is zero
+            check = slice(5, 7) if cmd == 'a' else slice(0, size)
+            while i < len(data):
+                if all(value == 0 for value in data[i:i + size][check]):
+                    del data[i:i + size]
+                else:
+                    i += size
+        elif cmd in ['h', 'v']:
+            path[index] = (cmd, [coord for coord in data if coord != 0])
+
+    # remove no-op commands, working backwards (the first moveto always stays)
+    index = len(path)
+    subpath_needs_anchor = False
+    while index > 1:
+        index -= 1
+        cmd, data = path[index]
+        if cmd == 'z':
+            previous_cmd, previous_data = path[index - 1]
+            if previous_cmd == 'm' and len(previous_data) == 2:
+                # "mX Yz" -> "mX Y"
+                del path[index]
+            else:
+                # "m0 0 ...z" cannot become "l...z" as it changes where z returns
+                subpath_needs_anchor = True
+        elif cmd == 'm':
+            if len(path) - 1 == index and len(data) == 2:
+                # trailing move with nothing drawn after it
+                del path[index]
+                continue
+            if subpath_needs_anchor:
+                subpath_needs_anchor = False
+            elif data[0] == data[1] == 0:
+                path[index] = ('l', data[2:])
+
+    return [element for element in path if len(element[1]) > 0 or element[0] == 'z']
+
+
+def remove_straight_curves(path):
+    new_path = [path[0]]
+    for cmd, data in path[1:]:
+        new_data = data
+        if cmd == 'c':
+            new_data = []
+            for i in range(0, len(data), 6):
+                # relative coordinates put the previous point at the origin
+                p1x, p1y, p2x, p2y, dx, dy = data[i:i + 6]
+                if dx == 0:
+                    straight = p1x == 0 and p2x == 0
+                else:
+                    m = dy / dx
+                    straight = p1y == m * p1x and p2y == m * p2x
+                if straight:
+                    if new_data:
+                        new_path.append((cmd, new_data))
+                        new_data = []
+                    new_path.append(('l', [dx, dy]))
+                else:
+                    new_data.extend(data[i:i + 6])
+        if new_data or cmd == 'z':
+            new_path.append((cmd, new_data))
+    return new_path
+
+
+def collapse_commands(path):
+    # linetos directly after a moveto are folded into it as implicit linetos
+    new_path = []
+    previous_cmd, previous_data = path[0]
+    for cmd, data in path[1:]:
+        if cmd != 'm' and (cmd == previous_cmd or (cmd == 'l' and previous_cmd == 'm')):
+            previous_data.extend(data)
+        else:
+            new_path.append((previous_cmd, previous_data))
+            previous_cmd, previous_data = cmd, data
+    new_path.append((previous_cmd, previous_data))
+    return new_path
+
+
+def split_lines(new_path, cmd, data, start):
+    # emits line data as l (or m), h and v commands
+    line_tuples = data[:start]
+    for i in range(start, len(data), 2):
+        if data[i] == 0 or data[i + 1] == 0:
+            if line_tuples:
+                new_path.append((cmd, line_tuples))
+                line_tuples = []
+                cmd = 'l'
+            if data[i] == 0:
+                new_path.append(('v', [data[i + 1]]))
+            else:
+                new_path.append(('h', [data[i]]))
+        else:
+            line_tuples.extend(data[i:i + 2])
+    if line_tuples:
+        new_path.append((cmd, line_tuples))
+
+
+def use_shorthands(path):
+    new_path = []
+    for cmd, data in path:
+        if cmd == 'l':
+            split_lines(new_path, cmd, data, 0)
+        elif cmd == 'm':
+            split_lines(new_path, cmd, data, 2)
+        elif cmd == 'c':
+            # the implied first control point is the reflection of the previous
+            # curve's second control point, or the current point (the origin)
+            control = (0, 0)
+            if new_path and new_path[-1][0] == 's':
+                previous_data = new_path[-1][1]
+                control = (previous_data[-2] - previous_data[-4],
+                           previous_data[-1] - previous_data[-3])
+            curve_tuples = []
+            for i in range(0, len(data), 6):
+                if control[0] == data[i] and control[1] == data[i + 1]:
+                    if curve_tuples:
+                        new_path.append(('c', curve_tuples))
+                        curve_tuples = []
+                    new_path.append(('s', data[i + 2:i + 6]))
+                else:
+                    curve_tuples.extend(data[i:i + 6])
+                control = (data[i + 4] - data[i + 2], data[i + 5] - data[i + 3])
+            if curve_tuples:
+                new_path.append(('c', curve_tuples))
+        elif cmd == 'q':
+            control = (0, 0)
+            curve_tuples = []
+            for i in range(0, len(data), 4):
+                if control[0] == data[i] and control[1] == data[i + 1]:
+                    if curve_tuples:
+                        new_path.append(('q', curve_tuples))
+                        curve_tuples = []
+                    new_path.append(('t', data[i + 2:i + 4]))
+                else:
+                    curve_tuples.extend(data[i:i + 4])
+                control = (data[i + 2] - data[i], data[i + 3] - data[i + 1])
+            if curve_tuples:
+                new_path.append(('q', curve_tuples))
+        else:
+            new_path.append((cmd, data))
+    return new_path
+
+
+def is_same_sign(a, b):
+    return (a <= 0 and b <= 0) or (a >= 0 and b >= 0)
+
+
+def is_same_direction(x1, y1, x2, y2, context):
+    if is_same_sign(x1, x2) and is_same_sign(y1, y2):
+        diff = y1 / x1 - y2 / x2
+        return context.precision.plus(1 + diff) == 1
+    return False
+
+
+def merge_collinear_lines(path, context):
+    # "h-100-100" becomes "h-200", but "h300-100" does not change
+    for cmd, data in path:
+        if cmd in ['h', 'v']:
+            i = 0
+            while i + 1 < len(data):
+                if is_same_sign(data[i], data[i + 1]):
+                    data[i] += data[i + 1]
+                    del data[i + 1]
+                else:
+                    i += 1
+        elif cmd in ['l', 'm']:
+            # the first pair of a moveto is not drawn
+            i = 2 if cmd == 'm' else 0
+            while i + 2 < len(data):
+                if is_same_direction(*data[i:i + 4], context=context):
+                    data[i] += data[i + 2]
+                    data[i + 1] += data[i + 3]
+                    del data[i + 2:i + 4]
+                else:
+                    i += 2
+    return path
+
+
+def collapse_repeated_commands(path):
+    new_path = [path[0]]
+    previous_cmd = ''
+    previous_data = []
+    for cmd, data in path[1:]:
+        if previous_cmd != '' and (cmd != previous_cmd or cmd == 'm'):
+            new_path.append((previous_cmd, previous_data))
+            previous_cmd = ''
+            previous_data = []
+        if cmd == previous_cmd and cmd != 'm':
+            previous_data.extend(data)
+        else:
+            previous_cmd = cmd
+            previous_data = data
+    if previous_cmd != '':
+        new_path.append((previous_cmd, previous_data))
+    return new_path
+
+
+def serialize(path, context):
+    return ''.join(cmd + serialize_coordinates(cmd, data, context) for cmd, data in path)
+
+
+def serialize_coordinates(cmd, data, context):
+    if not data:
+        return ''
+    numbers = context.format_all(data, CONTROL_POINTS.get(cmd))
+    parts = [numbers[0]]
+    previous = numbers[0]
+    for number in numbers[1:]:
+        first = number[0]
+        # numbers only need a separator if they start with a digit, or with a dot
+        # that would otherwise continue the previous number, and exponents are
+        # kept apart from a following negative number
+        if first in DIGITS or (first == '.' and not ('.' in previous or 'e' in previous)) or \
+                (first == '-' and 'e' in previous):
+            parts.append(' ')
+        parts.append(number)
+        previous = number
+    return ''.join(parts)
+
+
+def format_number(value, precision):
+    """
+    Formats a coordinate with the given decimal context's precision, without
+    dropping integer digits and using scientific notation only when shorter
+    """
+    reduced = precision.plus(value)
+    text = str(reduced)
+    if 'E' in text:
+        # str writes large and tiny numbers with an exponent
+        text = format(reduced, 'f')
+    plain = text.rstrip('0').rstrip('.') if '.' in text else text
+    if '.' not in plain:
+        # requantize the original value so that integer digits are never lost
+        # (123.4 becomes 123 rather than 120)
+        plain = str(value.quantize(ONE))
+    # with a decimal point, scientific notation is only shorter for numbers
+    # starting with at least two zeros after it
+    if len(plain) > 3 and ('.' not in plain or plain.startswith(('0.00', '-0.00'))):
+        # the significant digits of the reduced value, as Decimal.normalize
+        digits = text.lstrip('-').replace('.', '').strip('0')
+        scientific = '{}{}{}{}e{}'.format('-' if reduced.is_signed() else '', digits[0],
+                                          '.' if len(digits) > 1 else '', digits[1:], reduced.adjusted())
+        if len(scientific) < len(plain):
+            return scientific
+    return plain
@@ -0,0 +1,157 @@
+import numpy as np
+from .geometry import parse_segments
+
+__author__      = "Joseph Azevedo"
+
+"""
+precision.py
+------------
+Per map (or per territory) precision tuning for territory path data. Rather
+than cleaning every path to the same number of significant digits, the
+encoder can look for the lowest accuracy whose cleaned path stays within a
+geometric error bound of the source path, in map units, so large or coarse
+maps do not pay for digits that are never visible.
+
+The error of a cleaned path is measured on the control polygons of both
+paths (every segment's end and control points, joined in order): the
+largest distance from a vertex of either polygon to the other polygon.
+Rounding moves a curve by no more than it moves its control points, and the
+vertices dropped by merging lines and straightening curves lie close to the
+cleaned polygon, so this is a cheap stand-in for the distance between the
+curves themselves that needs no flattening
+"""
+
+# Edges with the nearest midpoints that bound the distance of each vertex in
+# farthest_vertex
+NEAREST_EDGES = 4
+# Vertex to edge pairs measured at once by farthest_vertex, bounding the size
+# of its intermediate arrays
+CHUNK_PAIRS = 1 << 16
+
+
+def control_polygon(path_data):
+    """
+    Parses a path into the (start, end) points of each edge of its control
+    polygon, as two n x 2 arrays, or None if the path cannot be parsed (it
+    uses arcs or quadratic curves)
+    """
+    segments = parse_segments(path_data)
+    if not segments:
+        return None
+    starts = []
+    ends = []
+    for _, coords in segments:
+        points = [(coords[i], coords[i + 1]) for i in range(0, len(coords), 2)]
+        starts.extend(points[:-1])
+        ends.extend(points[1:])
+    return np.array(starts), np.array(ends)
+
+
+def farthest_vertex(polygon, other):
+    """
+    Largest distance from a vertex of a control polygon to the closest edge
+    of another. The edges with the nearest midpoints give each vertex an
+    upper bound on its distance, and an edge can only come closer than that
+    if its midpoint lies within the bound plus half the longest edge, so
+    each vertex is measured against those edges alone (in chunks of vertex
+    and edge pairs), keeping time and memory close to linear. Polygons
+    small enough for a single chunk are measured against every edge
+    """
+    points = np.concatenate(polygon)
+    starts, ends = other
+    direction = ends - starts
+    length_squared = np.maximum((direction ** 2).sum(axis=1), 1e-12)
+    if len(points) * len(starts) <= CHUNK_PAIRS:
+        # small polygons are measured against every edge at once
+        return float(edge_distances(points[:, None, :], starts[None], direction[None],
+                                    length_squared[None]).max())
+    from scipy.spatial import cKDTree
+    tree = cKDTree((starts + ends) / 2)
+    _, nearest = tree.query(points, min(NEAREST_EDGES, len(starts)))
+    nearest = nearest.reshape(len(points), -1)
+    bounds = edge_distances(points[:, None, :], starts[nearest], direction[nearest], length_squared[nearest])
+    radii = bounds + np.sqrt(length_squared.max()) / 2 + 1e-9
+    # group the vertices into chunks of about CHUNK_PAIRS candidate edges
+    counts = tree.query_ball_point(points, radii, return_length=True)
+    breaks = np.searchsorted(np.cumsum(counts), np.arange(CHUNK_PAIRS, counts.sum(), CHUNK_PAIRS))
+    farthest = 0.0
+    for indices in np.split(np.arange(len(points)), np.unique(breaks[breaks > 0])):
+        if not len(indices):
+            continue
+        candidates = tree.query_ball_point(points[indices], radii[indices])
+        edges = np.concatenate([np.asarray(c, dtype=np.intp) for c in candidates])
+        vertices = np.repeat(indices, counts[indices])
+        offset = points[vertices] - starts[edges]
+        t = np.clip((offset * direction[edges]).sum(axis=1) / length_squared[edges], 0, 1)
+        closest = offset - t[:, None] * direction[edges]
+        distances = np.minimum.reduceat((closest ** 2).sum(axis=1),
+                                        np.concatenate([[0], np.cumsum(counts[indices])[:-1]]))
+        farthest = max(farthest, float(distances.max()))
+    return np.sqrt(farthest)
+
+
+def edge_distances(points, starts, direction, length_squared):
+    """
+    Distance from each of n points to the closest of its edges, given as
+    n x 1 x 2 points against n x k (or 1 x k) edges
+    """
+    offset = points - starts
+    t = np.clip((offset * direction).sum(axis=2) / length_squared, 0, 1)
+    closest = offset - t[..., None] * direction
+    return np.sqrt((closest ** 2).sum(axis=2).min(axis=1))
+
+
+def polygon_error(reference, path_data):
+    """
+    Distance between the control polygon of a path and a reference control
+    polygon (see control_polygon), or infinity if the path cannot be parsed
+    """
+    polygon = control_polygon(path_data)
+    if polygon is None:
+        return float('inf')
+    return float(max(farthest_vertex(reference, polygon), farthest_vertex(polygon, reference)))
+
+
+def lowest_accuracy(evaluate, max_error, accuracies):
+    """
+    Finds the lowest of the ascending accuracies whose result stays within
+    the error bound, by bisection (higher accuracies never round further).
+    evaluate(accuracy) returns the (data, error) of the path at an accuracy.
+    Returns None if even the highest accuracy exceeds the bound
+    """
+    low, high = 0, len(accuracies) - 1
+    if evaluate(accuracies[high])[1] > max_error:
+        return None
+    while low < high:
+        middle = (low + high) // 2
+        if evaluate(accuracies[middle])[1] <= max_error:
+            high = middle
+        else:
+            low = middle + 1
+    return accuracies[low]
+
+
+def tune_accuracies(evaluators, max_error, accuracies, per_territory=False):
+    """
+    Picks the accuracy of each path from its evaluator (see lowest_accuracy),
+    falling back to the highest accuracy for paths that never fit. Unless
+    tuning per territory, every path is given the lowest accuracy at which
+    all of them fit. Paths without an evaluator are left as None
+    """
+    lowest = [None if evaluate is None else lowest_accuracy(evaluate, max_error, accuracies)
+              for evaluate in evaluators]
+    lowest = [accuracies[-1] if accuracy is None and evaluate is not None else accuracy
+              for accuracy, evaluate in zip(lowest, evaluators)]
+    if per_territory:
+        return lowest
+    tuned = [accuracy for accuracy in lowest if accuracy is not None]
+    if not tuned:
+        return lowest
+    map_accuracy = accuracies[-1]
+    for accuracy in accuracies[accuracies.index(max(tuned)):]:
+        # bisection assumes error shrinks as accuracy grows, which a path may
+        # not follow exactly, so check every path at the shared accuracy
+        if all(evaluate(accuracy)[1] <= max_error for evaluate in evaluators if evaluate is not None):
+            map_accuracy = accuracy
+            break
+    return [None if evaluate is None else map_accuracy for evaluate in evaluators]
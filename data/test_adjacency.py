@@ -0,0 +1,62 @@
+import re
+from .generate import generate_map
+from .adjacency import infer_links, diff_links, segment_key
+from .encoder import ADJACENCY_PLACES, EncodeOptions, encode_svg
+
+__author__      = "Joseph Azevedo"
+
+"""
+test_adjacency.py
+-----------------
+Checks of edge inference from shared borders (adjacency.py): it finds the
+drawn edges of a map whose outlines share their borders, and the encoder
+keeps the drawn edges of one whose outlines do not
+"""
+
+# Groups of edge lines and water connection polylines in generated maps
+LINE_GROUP_REGEX = re.compile(r'<g>\s*(?:<(?:line|polyline)\b[^>]*/>\s*)+</g>\s*')
+
+
+def edge_links(data):
+    return [(edge['a'], edge['b']) for edge in data['edges']]
+
+
+def test_segments_match_in_either_direction():
+    scale = 10 ** ADJACENCY_PLACES
+    assert segment_key([0, 0, 1, 1, 2, 0], scale) == segment_key([2, 0, 1, 1, 0, 0], scale)
+    assert segment_key([1, 1, 1.001, 1.001], scale) is None
+
+
+def test_diff_ignores_direction_and_self_loops():
+    assert diff_links([(1, 0), (2, 2), (3, 4)], [(0, 1), (2, 5)]) == ([(3, 4)], [(2, 5)])
+
+
+def test_inferred_edges_match_drawn_edges(synthetic_svg, synthetic_territories):
+    drawn = encode_svg(synthetic_svg, EncodeOptions())
+    inferred, unsupported = infer_links([t.source_data for t in synthetic_territories], ADJACENCY_PLACES)
+    assert unsupported == 0
+    assert diff_links(edge_links(drawn), inferred) == ([], [])
+
+    log = []
+    data = encode_svg(synthetic_svg, EncodeOptions(infer_edges=True, log=log.append))
+    assert edge_links(data) == inferred
+    assert not any('Warning' in line for line in log)
+
+
+def test_drawn_edges_are_kept_without_shared_borders(skirmish_svg):
+    # skirmish's outlines are drawn with gaps between them
+    log = []
+    data = encode_svg(skirmish_svg, EncodeOptions(infer_edges=True, log=log.append))
+    assert data is not None
+    assert edge_links(data) == edge_links(encode_svg(skirmish_svg, EncodeOptions()))
+    assert any('Warning' in line and 'drawn edges are kept' in line for line in log)
+
+
+def test_edges_are_inferred_without_drawn_edges():
+    # a generated map with its edge and water connection groups taken out
+    svg = LINE_GROUP_REGEX.sub('', generate_map(30))
+    assert '<line' not in svg and '<polyline' not in svg
+    data = encode_svg(svg, EncodeOptions(infer_edges=True))
+    assert data is not None
+    assert len(data['edges']) > 0
+    assert edge_links(data) == edge_links(encode_svg(generate_map(30), EncodeOptions(infer_edges=True)))
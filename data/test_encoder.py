@@ -0,0 +1,65 @@
+import os
+import sys
+import json
+import pathlib
+import subprocess
+from .conftest import SKIRMISH_SOURCE
+from .encoder import PathCache, EncodeOptions, encode_svg, encode_batch
+
+__author__      = "Joseph Azevedo"
+
+"""
+test_encoder.py
+---------------
+Checks of the encoder's in-memory API: the forms encode_svg accepts its
+source in, the path caches encode_batch keeps between maps and batches, and
+that the encoder finds its own modules wherever it is imported or run from
+"""
+
+
+def test_sources_encode_the_same(skirmish_svg):
+    data = encode_svg(skirmish_svg)
+    assert encode_svg(skirmish_svg.decode()) == data
+    assert encode_svg(pathlib.Path(SKIRMISH_SOURCE)) == data
+    with open(SKIRMISH_SOURCE, 'rb') as source_file:
+        assert encode_svg(source_file) == data
+
+
+def test_maps_without_territories_encode_to_none():
+    assert encode_svg('<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 10 10"></svg>') is None
+
+
+def test_batches_reuse_path_caches(skirmish_svg, synthetic_svg):
+    sources = [skirmish_svg, synthetic_svg]
+    path_caches = [PathCache(), PathCache()]
+    first = encode_batch(sources, EncodeOptions(), path_caches)
+    assert all(path_cache.entries['paths'] for path_cache in path_caches)
+    assert encode_batch(sources, EncodeOptions(), path_caches) == first
+    assert encode_batch(sources) == first
+
+
+DIRECTORY = os.path.dirname(os.path.abspath(__file__))
+SIBLINGS = ['adjacency', 'gameboard', 'geometry', 'graph', 'hittest', 'lod',
+            'minify', 'precision', 'topology', 'watch']
+
+
+def test_imported_from_another_directory(tmp_path):
+    # none of the encoder's modules is importable under its bare name from here
+    script = (
+        'import sys, json, pathlib; from data.encoder import encode_svg; '
+        'data = encode_svg(pathlib.Path({!r})); '
+        'print(json.dumps([len(data["nodes"]), sorted(set({!r}) & set(sys.modules))]))'
+    ).format(SKIRMISH_SOURCE, SIBLINGS)
+    environment = dict(os.environ, PYTHONPATH=os.path.dirname(DIRECTORY))
+    output = subprocess.run([sys.executable, '-c', script], cwd=str(tmp_path), env=environment,
+                            check=True, stdout=subprocess.PIPE).stdout
+    assert json.loads(output) == [len(encode_svg(pathlib.Path(SKIRMISH_SOURCE))['nodes']), []]
+
+
+def test_run_from_another_directory(tmp_path):
+    subprocess.run([sys.executable, os.path.join(DIRECTORY, 'encoder.py'),
+                    os.path.dirname(SKIRMISH_SOURCE), str(tmp_path)],
+                   cwd=str(tmp_path), check=True, stdout=subprocess.PIPE)
+    with open(os.path.join(DIRECTORY, 'maps', 'skirmish.json'), 'r') as expected_file, \
+            open(str(tmp_path / 'skirmish.json'), 'r') as output_file:
+        assert json.load(output_file) == json.load(expected_file)
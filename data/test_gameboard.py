@@ -0,0 +1,54 @@
+import os
+import json
+import pytest
+from .gameboard import VERSION, HEADER, encode_gameboard, decode_gameboard
+
+__author__      = "Joseph Azevedo"
+
+"""
+test_gameboard.py
+-----------------
+Checks of the binary gameboard format (gameboard.py) against the json output
+of the skirmish map
+"""
+
+MAPS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'maps')
+
+
+@pytest.fixture(scope='module')
+def gameboard():
+    with open(os.path.join(MAPS, 'skirmish.json'), 'r') as json_file:
+        return json.load(json_file)
+
+
+def test_binary_output_matches_json_output(gameboard):
+    with open(os.path.join(MAPS, 'skirmish.bin'), 'rb') as binary_file:
+        assert binary_file.read() == encode_gameboard(gameboard)
+
+
+def test_round_trip(gameboard):
+    decoded = decode_gameboard(encode_gameboard(gameboard))
+    assert len(decoded['nodes']) == len(gameboard['nodes'])
+    for node, decoded_node in zip(gameboard['nodes'], decoded['nodes']):
+        assert decoded_node['node'] == node['node']
+        assert decoded_node['data'] == node['data']
+        assert decoded_node['iconData'] == node['iconData']
+        assert decoded_node['lod'] == node['lod']
+        assert decoded_node['center']['x'] == pytest.approx(float(node['center']['x']))
+        assert decoded_node['center']['y'] == pytest.approx(float(node['center']['y']))
+        assert ('castle' in decoded_node) == ('castle' in node)
+        assert decoded_node['bounds'] == pytest.approx(node['bounds'])
+    for key in ['edges', 'regions', 'graph']:
+        assert decoded[key] == gameboard[key]
+    assert [(c['a'], c['b']) for c in decoded['waterConnections']] == \
+        [(c['a'], c['b']) for c in gameboard['waterConnections']]
+    assert decoded['lodTolerances'] == pytest.approx(gameboard['lodTolerances'])
+    assert decoded['hitGrid'] == pytest.approx(gameboard['hitGrid'])
+
+
+def test_rejects_other_versions(gameboard):
+    data = bytearray(encode_gameboard(gameboard))
+    data[4] = VERSION + 1
+    with pytest.raises(ValueError):
+        decode_gameboard(bytes(data))
+    assert HEADER.unpack_from(encode_gameboard(gameboard), 0)[1] == VERSION
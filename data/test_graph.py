@@ -0,0 +1,33 @@
+from .graph import UNREACHABLE, build_graph, hop_distances
+
+__author__      = "Joseph Azevedo"
+
+"""
+test_graph.py
+-------------
+Checks of the connection graph analytics (graph.py) on a small map: a chain
+0-1-2-3 split into two regions, and a separate pair 4-5
+"""
+
+LINKS = [(0, 1), (1, 2), (2, 3), (3, 2), (4, 5), (5, 5), (6, 0)]
+REGIONS = [(0, 1), (2, 5)]
+
+
+def test_adjacency_drops_repeats_self_loops_and_outside_links():
+    graph = build_graph(6, LINKS, REGIONS)
+    assert graph['offsets'] == [0, 1, 3, 5, 6, 7, 8]
+    assert graph['neighbours'] == [1, 0, 2, 1, 3, 2, 5, 4]
+
+
+def test_components_and_borders():
+    graph = build_graph(6, LINKS, REGIONS)
+    assert graph['components'] == [0, 0, 0, 0, 1, 1]
+    assert graph['borders'] == [1, 2]
+
+
+def test_hop_distances():
+    graph = build_graph(6, LINKS, REGIONS)
+    assert hop_distances(graph['offsets'], graph['neighbours'], 0) == \
+        [0, 1, 2, 3, UNREACHABLE, UNREACHABLE]
+    assert hop_distances(graph['offsets'], graph['neighbours'], 5) == \
+        [UNREACHABLE] * 4 + [1, 0]
@@ -0,0 +1,52 @@
+import pytest
+from svgpathtools import parse_path
+from .hittest import candidates_at
+from .encoder import EncodeOptions, encode_svg
+
+__author__      = "Joseph Azevedo"
+
+"""
+test_hittest.py
+---------------
+Checks of the hit testing grid (hittest.py) written for the skirmish map:
+every point of a territory finds that territory among its candidates
+"""
+
+SAMPLES = 40
+# Relative path data sums to the outline's points with some float error
+PLACES = 6
+
+
+@pytest.fixture(scope='module')
+def gameboard(skirmish_svg):
+    return encode_svg(skirmish_svg, EncodeOptions())
+
+
+def outline_points(path_data):
+    path = parse_path(path_data)
+    return [(round(point.real, PLACES), round(point.imag, PLACES))
+            for point in (path.point(i / SAMPLES) for i in range(SAMPLES))]
+
+
+def test_outlines_find_their_territory(gameboard):
+    grid = gameboard['hitGrid']
+    bounds = [node['bounds'] for node in gameboard['nodes']]
+    for index, node in enumerate(gameboard['nodes']):
+        for x, y in outline_points(node['data']):
+            assert index in candidates_at(grid, bounds, x, y)
+
+
+def test_centers_find_their_territory(gameboard):
+    grid = gameboard['hitGrid']
+    bounds = [node['bounds'] for node in gameboard['nodes']]
+    for index, node in enumerate(gameboard['nodes']):
+        assert node['node'] == index
+        x, y = float(node['center']['x']), float(node['center']['y'])
+        assert index in candidates_at(grid, bounds, x, y)
+
+
+def test_cells_list_few_candidates(gameboard):
+    grid = gameboard['hitGrid']
+    assert grid['columns'] * grid['rows'] == pytest.approx(len(gameboard['nodes']), rel=0.25)
+    assert grid['offsets'][0] == 0 and grid['offsets'][-1] == len(grid['territories'])
+    assert len(grid['territories']) / len(grid['offsets'][1:]) < 4
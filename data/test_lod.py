@@ -0,0 +1,61 @@
+import pytest
+from .lod import simplify_territories
+from .adjacency import infer_links
+from .generate import generate_map
+from .encoder import ADJACENCY_PLACES, LOD_TIERS, LOD_PIXEL_ERROR, MIN_SCALE, MIN_VIEWPORT, \
+    VIEWPORT_FILL, EncodeOptions, encode_svg, reachable_lod_tiers
+
+__author__      = "Joseph Azevedo"
+
+"""
+test_lod.py
+-----------
+Checks of the level of detail tiers (lod.py): neighbouring territories keep
+sharing exactly the same simplified border at every tier, and the encoder
+only writes the tiers the client zooms out far enough on each map to draw
+"""
+
+TIERS = [(1, 1), (2, 0), (4, 0)]
+
+
+@pytest.fixture(scope='module')
+def synthetic_tiers(synthetic_territories):
+    return simplify_territories([t.source_data for t in synthetic_territories], TIERS)
+
+
+def test_neighbours_share_simplified_borders(synthetic_territories, synthetic_tiers):
+    # shared borders are found by exact segment matches, so every pair of
+    # neighbours is only found again if both draw the same simplified border
+    links, _ = infer_links([t.source_data for t in synthetic_territories], ADJACENCY_PLACES)
+    assert links
+    for tier in range(len(TIERS)):
+        tier_links, unsupported = infer_links([paths[tier] for paths in synthetic_tiers], ADJACENCY_PLACES)
+        assert unsupported == 0
+        assert tier_links == links
+
+
+def test_coarser_tiers_are_smaller(synthetic_territories, synthetic_tiers):
+    sizes = [sum(len(paths[tier]) for paths in synthetic_tiers) for tier in range(len(TIERS))]
+    assert sizes == sorted(sizes, reverse=True)
+    assert sizes[0] < sum(len(t.source_data) for t in synthetic_territories)
+
+
+def test_encoder_writes_only_reachable_tiers(skirmish_svg):
+    # the client never zooms out far enough on skirmish to draw a tier
+    log = []
+    data = encode_svg(skirmish_svg, EncodeOptions(log=log.append))
+    assert data['lodTolerances'] == []
+    assert all(node['lod'] == [] for node in data['nodes'])
+    assert any('level of detail tiers' in line for line in log)
+
+    large = encode_svg(generate_map(1000, vertices=12, seed=1).encode())
+    assert large['lodTolerances'] == [tolerance for tolerance, _ in LOD_TIERS]
+    assert all(len(node['lod']) == len(LOD_TIERS) for node in large['nodes'])
+
+
+def test_reachable_tiers_follow_the_map_size():
+    coarsest = max(tolerance for tolerance, _ in LOD_TIERS)
+    extent = coarsest * VIEWPORT_FILL * MIN_VIEWPORT / LOD_PIXEL_ERROR
+    assert reachable_lod_tiers((extent, extent / 2)) == LOD_TIERS
+    assert len(reachable_lod_tiers((extent - 1, extent / 2))) < len(LOD_TIERS)
+    assert reachable_lod_tiers((0, 0)) == [tier for tier in LOD_TIERS if tier[0] * MIN_SCALE <= LOD_PIXEL_ERROR]
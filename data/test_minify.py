@@ -0,0 +1,49 @@
+from concurrent.futures import ThreadPoolExecutor
+from .minify import MinifyContext, minify_path, round_numbers
+
+__author__      = "Joseph Azevedo"
+
+"""
+test_minify.py
+--------------
+Checks of the path minifier (minify.py): the cleaning steps it shares with
+scour, and that contexts of different precisions can be used concurrently
+"""
+
+PATHS = [
+    'M10,10 L20,10 L30,10 L30,20 Z',
+    'M 0 0 C 0 0 10 10 10 10 L 10.123456 20.00001',
+    'M1.5e-3 100000 l0 0 h5',
+    'M 12.3456 7.891 C 13.1 8.2 14.7 9.9 15.25 10.5 S 17.75 12.125 18 13 Z'
+]
+
+
+def test_merges_lines_and_uses_shorthands():
+    assert minify_path(PATHS[0], MinifyContext(5)) == 'm10 10h10 10v10z'
+
+
+def test_straightens_curves_and_reduces_precision():
+    assert minify_path(PATHS[1], MinifyContext(5)) == 'm0 0 10 10 0.12346 10'
+
+
+def test_removes_empty_segments_and_writes_short_numbers():
+    assert minify_path(PATHS[2], MinifyContext(5)) == 'm0.0015 1e5h5'
+
+
+def test_never_lengthens_a_path():
+    context = MinifyContext(5)
+    assert all(len(minify_path(path_data, context)) <= len(path_data) for path_data in PATHS + ['M0 0'])
+
+
+def test_contexts_are_reentrant():
+    contexts = [MinifyContext(digits) for digits in (3, 5, 7)]
+    expected = [[minify_path(path_data, context) for path_data in PATHS] for context in contexts]
+    with ThreadPoolExecutor(3) as pool:
+        results = list(pool.map(lambda context: [minify_path(path_data, context)
+                                                 for _ in range(50) for path_data in PATHS], contexts))
+    assert results == [paths * 50 for paths in expected]
+
+
+def test_round_numbers():
+    assert round_numbers('M1.23456,2e-3 L10,3.10', 2) == 'M1.23,0 L10,3.1'
+    assert round_numbers(0.125, 1) == '0.1'
@@ -0,0 +1,79 @@
+import math
+import random
+import pytest
+import numpy as np
+from .precision import control_polygon, polygon_error, farthest_vertex, lowest_accuracy, tune_accuracies
+from .encoder import MAP_ACCURACY, EncodeOptions, encode_svg
+
+__author__      = "Joseph Azevedo"
+
+"""
+test_precision.py
+-----------------
+Checks of precision tuning (precision.py): tuned territory paths stay within
+the error bound of their source, at fewer digits than the default
+"""
+
+MAX_ERROR = 1
+ACCURACIES = [2, 3, 4, 5, 6]
+
+
+def random_polygon(rng, count, long_edges=0):
+    points = np.array([(rng.uniform(0, 100), rng.uniform(0, 100)) for _ in range(count)])
+    points[:long_edges] *= 50
+    return points[:-1], points[1:]
+
+
+def every_edge_distance(polygon, other):
+    points = np.concatenate(polygon)
+    starts, ends = other
+    direction = ends - starts
+    offset = points[:, None, :] - starts[None, :, :]
+    t = np.clip((offset * direction).sum(axis=2) / np.maximum((direction ** 2).sum(axis=1), 1e-12), 0, 1)
+    return np.sqrt(((offset - t[..., None] * direction) ** 2).sum(axis=2).min(axis=1).max())
+
+
+@pytest.mark.parametrize('long_edges', [0, 3])
+def test_farthest_vertex_matches_every_edge(long_edges):
+    rng = random.Random(long_edges)
+    for count in [2, 3, 40, 400]:
+        polygon, other = random_polygon(rng, count), random_polygon(rng, 300, long_edges)
+        assert farthest_vertex(polygon, other) == pytest.approx(every_edge_distance(polygon, other))
+
+
+def test_lowest_accuracy_bisects_to_the_lowest_fit():
+    tried = []
+
+    def evaluate(accuracy):
+        tried.append(accuracy)
+        return None, 10.0 ** -accuracy
+
+    assert lowest_accuracy(evaluate, 1e-4, ACCURACIES) == 4
+    assert len(tried) < len(ACCURACIES)
+    assert lowest_accuracy(evaluate, 1e-9, ACCURACIES) is None
+
+
+def test_tune_accuracies_shares_the_map_accuracy():
+    evaluators = [lambda accuracy: (None, 10.0 ** -accuracy),
+                  lambda accuracy: (None, 10.0 ** (1 - accuracy)),
+                  None]
+    assert tune_accuracies(evaluators, 1e-3, ACCURACIES) == [4, 4, None]
+    assert tune_accuracies(evaluators, 1e-3, ACCURACIES, per_territory=True) == [3, 4, None]
+
+
+@pytest.mark.parametrize('per_territory', [False, True])
+def test_tuned_paths_stay_within_the_bound(skirmish_svg, skirmish_territories, per_territory):
+    data = encode_svg(skirmish_svg, EncodeOptions(max_error=MAX_ERROR, per_territory=per_territory))
+    default = encode_svg(skirmish_svg, EncodeOptions())
+    sources = {t.number: t.source_data for t in skirmish_territories}
+    for node in data['nodes']:
+        error = polygon_error(control_polygon(sources[node['node']]), node['data'])
+        assert math.isfinite(error) and error <= MAX_ERROR
+    assert sum(len(node['data']) for node in data['nodes']) < \
+        sum(len(node['data']) for node in default['nodes'])
+
+
+def test_default_accuracy_is_unchanged(skirmish_svg, skirmish_territories):
+    data = encode_svg(skirmish_svg, EncodeOptions())
+    assert [node['data'] for node in data['nodes']] == [t.data for t in skirmish_territories]
+    assert MAP_ACCURACY in ACCURACIES
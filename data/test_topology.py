@@ -0,0 +1,39 @@
+from .topology import build_topology, decode_territories
+from .encoder import TOPOLOGY_PLACES, EncodeOptions, encode_svg
+
+__author__      = "Joseph Azevedo"
+
+"""
+test_topology.py
+----------------
+Checks of the shared border encoding (topology.py), and that the encoder only
+writes shared arcs for maps where they are smaller than the path data
+"""
+
+
+def test_decoded_paths_encode_to_the_same_arcs(synthetic_territories):
+    # decoding snaps outlines to TOPOLOGY_PLACES, after which it is exact
+    arcs, territory_refs = build_topology([t.source_data for t in synthetic_territories], TOPOLOGY_PLACES)
+    decoded = decode_territories(arcs, territory_refs, TOPOLOGY_PLACES)
+    assert None not in decoded
+    assert build_topology(decoded, TOPOLOGY_PLACES) == (arcs, territory_refs)
+
+
+def test_shared_borders_are_stored_once(synthetic_territories):
+    arcs, territory_refs = build_topology([t.source_data for t in synthetic_territories], TOPOLOGY_PLACES)
+    references = [ref for rings in territory_refs for ring in rings for ref in ring]
+    assert len(arcs) < len(references)
+    assert sorted({ref if ref >= 0 else ~ref for ref in references}) == list(range(len(arcs)))
+
+
+def test_encoder_writes_arcs_only_when_smaller(synthetic_svg, skirmish_svg):
+    synthetic = encode_svg(synthetic_svg, EncodeOptions(topology=True))
+    assert 'topology' in synthetic
+    assert all('arcs' in node and 'data' not in node for node in synthetic['nodes'])
+
+    # every border of skirmish is drawn by one territory only
+    log = []
+    skirmish = encode_svg(skirmish_svg, EncodeOptions(topology=True, log=log.append))
+    assert 'topology' not in skirmish
+    assert skirmish == encode_svg(skirmish_svg, EncodeOptions())
+    assert any('Shared arcs would take' in line for line in log)
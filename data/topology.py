@@ -0,0 +1,215 @@
+import re
+from collections import defaultdict
+from .geometry import parse_segments
+from .lod import format_fixed, join_numbers
+
+__author__      = "Joseph Azevedo"
+
+"""
+topology.py
+-----------
+Shared border (arc topology) encoding, similar in spirit to TopoJSON.
+Neighbouring territories draw their common border once in each outline; here
+every outline is cut into arcs wherever the set of territories drawing its
+segments changes, each distinct arc is stored once, and each territory
+becomes a list of rings, each a list of signed arc references (i for arc i
+as stored, ~i for arc i traversed backwards).
+
+Coordinates are snapped to a fixed number of decimal places so that both
+copies of a shared border match exactly. Arcs are written as path data
+starting with an absolute move followed by relative h, v, l, c and s
+commands only, whose deltas are exact integers in units of 10^-places, so reversing and
+joining arcs is exact and every decoder rebuilds the same path strings
+"""
+
+# Arc references and rings of a territory whose path cannot be split into
+# arcs (it uses arcs or quadratic curves), which keeps its own path data
+UNSUPPORTED = None
+# Numbers read by each repetition of the commands written in arcs
+COMMAND_SIZES = {'h': 1, 'v': 1, 'l': 2, 's': 4, 'c': 6}
+ARC_TOKEN_REGEX = re.compile(r'([Mhvlcs])|(-?[0-9]+(?:\.[0-9]+)?)')
+
+
+def build_topology(paths, places):
+    """
+    Splits a batch of path strings into shared arcs, returning the list of
+    arc path strings and the rings of arc references of each path (or
+    UNSUPPORTED)
+    """
+    scale = 10 ** places
+    territory_rings = [path_rings(path_data, scale) for path_data in paths]
+    owners = defaultdict(set)
+    for territory, rings in enumerate(territory_rings):
+        for ring in rings or []:
+            for segment in ring:
+                owners[canonical(segment)].add(territory)
+
+    arcs = []
+    arc_indices = {}
+    territory_refs = []
+    for rings in territory_rings:
+        if rings is UNSUPPORTED:
+            territory_refs.append(UNSUPPORTED)
+            continue
+        refs = []
+        for ring in rings:
+            ring_refs = []
+            for arc in ring_arcs(ring, owners):
+                backward = reverse(arc)
+                key = min(arc, backward)
+                if key not in arc_indices:
+                    arc_indices[key] = len(arcs)
+                    arcs.append(format_segments(key, places))
+                index = arc_indices[key]
+                ring_refs.append(index if key == arc else ~index)
+            refs.append(ring_refs)
+        territory_refs.append(refs)
+    return arcs, territory_refs
+
+
+def path_rings(path_data, scale):
+    """
+    Parses a path into rings of segments, each a tuple of (x, y) points in
+    units of 1 / scale. Segments that snap to a single point are dropped
+    """
+    segments = parse_segments(path_data)
+    if not segments:
+        return UNSUPPORTED
+    rings = []
+    end = None
+    for _, coords in segments:
+        points = tuple((round(coords[i] * scale), round(coords[i + 1] * scale))
+                       for i in range(0, len(coords), 2))
+        if all(point == points[0] for point in points):
+            continue
+        if points[0] != end:
+            rings.append([])
+        rings[-1].append(points)
+        end = points[-1]
+    return rings
+
+
+def canonical(segment):
+    return min(segment, segment[::-1])
+
+
+def reverse(arc):
+    return tuple(segment[::-1] for segment in reversed(arc))
+
+
+def ring_arcs(ring, owners):
+    """
+    Cuts a ring of segments into arcs wherever the territories drawing its
+    segments change. Rings drawn the same way throughout are kept whole,
+    starting from their lowest vertex so that every territory cuts them alike
+    """
+    count = len(ring)
+    closed = ring[-1][-1] == ring[0][0]
+    segment_owners = [owners[canonical(segment)] for segment in ring]
+    cuts = [i for i in range(count)
+            if (i == 0 and not closed) or segment_owners[i] != segment_owners[i - 1]]
+    if not cuts:
+        cuts = [min(range(count), key=lambda i: ring[i][0])]
+    arcs = []
+    for start, end in zip(cuts, cuts[1:] + [cuts[0] + count]):
+        arcs.append(tuple(ring[i % count] for i in range(start, end)))
+    return arcs
+
+
+def format_segments(segments, places):
+    """
+    Writes a chain of segments as an absolute move followed by relative
+    commands, using the h, v and s shorthands where they apply and repeating
+    a command letter only when it changes
+    """
+    start = segments[0][0]
+    parts = ['M' + join_numbers([format_fixed(start[0], places), format_fixed(start[1], places)])]
+    command = None
+    numbers = []
+    previous = None
+    for segment in segments:
+        origin = segment[0]
+        deltas = [(x - origin[0], y - origin[1]) for x, y in segment[1:]]
+        if len(segment) == 2:
+            if deltas[0][1] == 0:
+                segment_command, deltas = 'h', [deltas[0][0]]
+            elif deltas[0][0] == 0:
+                segment_command, deltas = 'v', [deltas[0][1]]
+            else:
+                segment_command, deltas = 'l', [d for delta in deltas for d in delta]
+        elif previous is not None and len(previous) == 4 and \
+                deltas[0] == (previous[3][0] - previous[2][0], previous[3][1] - previous[2][1]):
+            # the first control point reflects the previous curve's second one
+            segment_command, deltas = 's', [d for delta in deltas[1:] for d in delta]
+        else:
+            segment_command, deltas = 'c', [d for delta in deltas for d in delta]
+        if segment_command != command:
+            if numbers:
+                parts.append(command + join_numbers(numbers))
+            command = segment_command
+            numbers = []
+        numbers += [format_fixed(d, places) for d in deltas]
+        previous = segment
+    parts.append(command + join_numbers(numbers))
+    return ''.join(parts)
+
+
+def parse_arc(arc, scale):
+    """
+    Reads an arc path string back into its tuple of segments
+    """
+    segments = []
+    command = None
+    values = []
+    for letter, number in ARC_TOKEN_REGEX.findall(arc) + [('', '')]:
+        if number:
+            values.append(round(float(number) * scale))
+            continue
+        if command == 'M':
+            current = (values[0], values[1])
+        elif command is not None:
+            size = COMMAND_SIZES[command]
+            for i in range(0, len(values), size):
+                x, y = current
+                if command == 'h':
+                    points = [(x + values[i], y)]
+                elif command == 'v':
+                    points = [(x, y + values[i])]
+                else:
+                    points = [(x + values[j], y + values[j + 1]) for j in range(i, i + size, 2)]
+                    if command == 's':
+                        # reflect the previous curve's second control point
+                        control = segments[-1][2]
+                        points.insert(0, (x + x - control[0], y + y - control[1]))
+                segments.append(tuple([current] + points))
+                current = points[-1]
+        command = letter
+        values = []
+    return tuple(segments)
+
+
+def format_refs(rings):
+    """
+    Writes the rings of arc references of a territory as one string of space
+    separated references per ring, which keeps indented json output compact
+    """
+    return [' '.join(map(str, ring)) for ring in rings]
+
+
+def parse_refs(rings):
+    return [list(map(int, ring.split())) for ring in rings]
+
+
+def decode_territories(arcs, territory_refs, places):
+    """
+    Rebuilds the path data of each territory from the arc path strings and
+    its rings of arc references (None for UNSUPPORTED territories)
+    """
+    scale = 10 ** places
+    parsed = [parse_arc(arc, scale) for arc in arcs]
+    return [None if rings is UNSUPPORTED else
+            ''.join(format_segments([segment for ref in ring for segment in
+                                     (parsed[ref] if ref >= 0 else reverse(parsed[~ref]))],
+                                    places) + 'z'
+                    for ring in rings)
+            for rings in territory_refs]
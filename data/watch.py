@@ -0,0 +1,165 @@
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+
+__author__      = "Joseph Azevedo"
+
+"""
+watch.py
+--------
+Watches a directory for files being written, for re-encoding maps as soon as
+they are saved. On Linux the kernel reports changes through inotify (called
+through ctypes, so nothing extra needs installing); elsewhere, or if inotify
+is unavailable, the directory is polled for changed modification times and
+sizes instead.
+
+Saving a file often takes several writes (or a write to a temporary file and
+a rename), so changes are collected until the directory has been quiet for a
+short while and then reported together
+"""
+
+# Seconds the directory must stay quiet before a burst of changes is reported
+DEBOUNCE = 0.3
+# Seconds between scans of the directory when polling
+POLL_INTERVAL = 0.5
+
+# inotify constants, from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+INOTIFY_EVENT = struct.Struct('iIII')
+INOTIFY_BUFFER = 64 * 1024
+
+
+def watch_directory(path, extension, debounce=DEBOUNCE, polling=False):
+    """
+    Generates the set of paths ending in the extension that were written,
+    moved or deleted in the directory (not its subdirectories) during each
+    burst of changes, forever
+    """
+    watcher = None if polling else InotifyWatcher.open(path)
+    if watcher is None:
+        watcher = PollingWatcher(path)
+    try:
+        while True:
+            changed = watcher.wait(None)
+            while True:
+                more = watcher.wait(debounce)
+                if not more:
+                    break
+                changed |= more
+            changed = {p for p in changed if p.endswith(extension)}
+            if changed:
+                yield changed
+    finally:
+        watcher.close()
+
+
+def list_files(path):
+    return {os.path.join(path, name) for name in os.listdir(path)
+            if os.path.isfile(os.path.join(path, name))}
+
+
+class InotifyWatcher:
+    """
+    Reports the files changed in a directory through inotify
+    """
+
+    def __init__(self, path, descriptor):
+        self.path = path
+        self.descriptor = descriptor
+
+    @staticmethod
+    def open(path):
+        """
+        Starts watching a directory, or returns None if inotify is unavailable
+        """
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            descriptor = libc.inotify_init1(IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if descriptor < 0:
+            return None
+        if libc.inotify_add_watch(descriptor, os.fsencode(path), INOTIFY_MASK) < 0:
+            os.close(descriptor)
+            return None
+        return InotifyWatcher(path, descriptor)
+
+    def wait(self, timeout):
+        """
+        Waits up to timeout seconds (or indefinitely if None) for changes,
+        returning the set of changed paths
+        """
+        try:
+            ready, _, _ = select.select([self.descriptor], [], [], timeout)
+        except InterruptedError:
+            return set()
+        if not ready:
+            return set()
+        try:
+            buffer = os.read(self.descriptor, INOTIFY_BUFFER)
+        except OSError as error:
+            if error.errno in (errno.EINTR, errno.EAGAIN):
+                return set()
+            raise
+        changed = set()
+        offset = 0
+        while offset < len(buffer):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(buffer, offset)
+            offset += INOTIFY_EVENT.size
+            name = buffer[offset:offset + length].rstrip(b'\0')
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                # events were dropped, so anything may have changed
+                changed |= list_files(self.path)
+            elif name:
+                changed.add(os.path.join(self.path, os.fsdecode(name)))
+        return changed
+
+    def close(self):
+        os.close(self.descriptor)
+
+
+class PollingWatcher:
+    """
+    Reports the files changed in a directory by comparing the modification
+    time and size of each file between scans
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        for file_path in list_files(self.path):
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            snapshot[file_path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = POLL_INTERVAL if deadline is None else deadline - time.monotonic()
+            time.sleep(max(0, min(POLL_INTERVAL, remaining)))
+            snapshot = self.scan()
+            changed = {p for p in snapshot.keys() | self.snapshot.keys()
+                       if snapshot.get(p) != self.snapshot.get(p)}
+            self.snapshot = snapshot
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def close(self):
+        pass
@@ -0,0 +1,179 @@
+import os
+import re
+import sys
+import timeit
+import random
+import importlib.util
+
+"""
+benchmark-docs.py
+-----------------
+Checks the single pass page rewriter in transform-docs.py against the regex
+passes it replaced, over a corpus of generated Scaladoc-like pages, then
+times both on large pages.
+"""
+
+HELP = """
+benchmark-docs.py
+
+Usage:
+  benchmark-docs.py [options]
+
+Options:
+  -h --help        Show this help description
+  --pages N        Number of generated pages to validate (default 300)
+  --kilobytes N    Size of the large page to time (default 2000)
+  --repeat N       Number of timed runs to keep the best of (default 3)"""
+
+SEED = 2340
+# The regexes transform-docs.py used before rewriting pages in a single pass
+TITLE_REGEX = r'<title>[ ]*<[/]title>'
+LINK_REGEX = r'(<a.*href=".+)([.]html)(.*".*?>)'
+LINK_REPLACE_REGEX = r'\g<1>\g<3>'
+PACKAGES = ['controllers', 'game', 'game/mode', 'game/state', 'actors', 'common']
+TITLE = 'Gameboard'
+# Unclosed links the regexes are timed on (they take seconds at a few hundred)
+UNCLOSED_LINKS = 400
+
+
+def load_transform():
+    # the script's name is not a valid module name
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'transform-docs.py')
+    spec = importlib.util.spec_from_file_location('transform_docs', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def main():
+    if '--help' in sys.argv or '-h' in sys.argv:
+        print(HELP)
+        quit()
+    transform = load_transform()
+    rng = random.Random(SEED)
+    validate(transform, rng, option('--pages', 300))
+    benchmark(transform, rng, option('--kilobytes', 2000) * 1024, option('--repeat', 3))
+
+
+def option(name, default):
+    if name in sys.argv:
+        index = sys.argv.index(name)
+        if index + 1 < len(sys.argv):
+            return int(sys.argv[index + 1])
+    return default
+
+
+def best_time(function, repeat):
+    return min(timeit.repeat(function, number=1, repeat=repeat))
+
+
+def report(label, reference_time, optimized_time, count, unit):
+    print('{}:'.format(label))
+    print('    - reference: {:.3f} s ({:.0f} {}/s)'.format(
+        reference_time, count / reference_time, unit))
+    print('    - optimized: {:.3f} s ({:.0f} {}/s)'.format(
+        optimized_time, count / optimized_time, unit))
+    print('    - speedup:   {:.1f}x'.format(reference_time / optimized_time))
+
+
+def reference_transform(html, title, replace):
+    html = re.sub(TITLE_REGEX, replace.format(title), html)
+    return re.sub(LINK_REGEX, LINK_REPLACE_REGEX, html)
+
+
+def reference_per_link(html, title, replace):
+    # the regex only rewrites one link per line, so give every link its own
+    html = re.sub(TITLE_REGEX, replace.format(title), html)
+    return ''.join(re.sub(LINK_REGEX, LINK_REPLACE_REGEX, part) for part in re.split(r'(?=<a )', html))
+
+
+def member(rng, external=False, separator=''):
+    """
+    A Scaladoc member entry, whose permalink and type links point at pages
+    in other packages and are split by the separator
+    """
+    name = 'member{}'.format(rng.randrange(10000))
+    package = rng.choice(PACKAGES)
+    depth = '../' * rng.randrange(3)
+    target = 'https://www.scala-lang.org/api/2.12.8/scala/Int.html' if external else \
+        '{}{}/Type{}.html'.format(depth, package, rng.randrange(500))
+    return ('<li name="{0}" visbl="pub" class="indented0 " data-isabs="false" fullComment="yes" '
+            'group="Ungrouped"><a id="{0}:Int"></a><a id="{0}:Int"></a><span class="permalink">'
+            '<a href="{1}{2}/{3}.html#{0}:Int" title="Permalink"><i class="material-icons">&#xE157;</i>'
+            '</a></span>{5}<span class="symbol"><span class="name">{0}</span><span class="result">: '
+            '<a href="{4}" class="extype" name="{0}">Type</a></span></span></li>'
+            .format(name, depth, package, TITLE, target, separator))
+
+
+def page(rng, members, link_per_line, external=False):
+    separator = '\n' if link_per_line else ''
+    body = separator.join(member(rng, external and i % 3 == 0, separator) for i in range(members))
+    return ('<!DOCTYPE html >\n<html>\n<head>\n<meta http-equiv="X-UA-Compatible" content="IE=edge" />\n'
+            '<meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, '
+            'user-scalable=no" />\n<title></title>\n<meta name="description" content="" />\n'
+            '<link href="../lib/index.css" media="screen" type="text/css" rel="stylesheet" />\n'
+            '<script type="text/javascript" src="../lib/jquery.js"></script>\n</head>\n<body>\n'
+            '<div id="definition"><a href="Gameboard$.html" title="See companion object">'
+            '<img alt="Class/Object" src="../lib/class_comp.svg" /></a><h1>' + TITLE + '</h1></div>\n'
+            '<ol>' + body + '</ol>\n</body>\n</html>\n')
+
+
+def validate(transform, rng, pages):
+    replace = transform.TITLE_REPLACE
+    # the regex rewrites pages with a link per line correctly
+    for _ in range(pages):
+        html = page(rng, rng.randrange(1, 40), True)
+        if transform.transform_html(html, TITLE) != reference_transform(html, TITLE, replace):
+            print('Page with a link per line rewrites differently than through the regexes')
+            sys.exit(1)
+    # on pages with many links per line it only rewrites the last one
+    missed = 0
+    for _ in range(pages):
+        html = page(rng, rng.randrange(1, 40), False)
+        rewritten = transform.transform_html(html, TITLE)
+        if rewritten != reference_per_link(html, TITLE, replace):
+            print('Page with many links per line rewrites differently than through the regexes '
+                  'with a link per line')
+            sys.exit(1)
+        missed += reference_transform(html, TITLE, replace).count('.html"')
+        if transform.transform_html(rewritten, TITLE) != rewritten:
+            print('Rewriting a page twice changes it again')
+            sys.exit(1)
+    # and links out of the docs keep their extension
+    html = page(rng, 30, False, external=True)
+    rewritten = transform.transform_html(html, TITLE)
+    external = 'href="https://www.scala-lang.org/api/2.12.8/scala/Int.html"'
+    if rewritten.count(external) != html.count(external) or \
+            re.search(r'href="(?!https:)[^"]*[.]html', rewritten):
+        print('Page with external links rewrites them or misses internal links')
+        sys.exit(1)
+    print('Rewrote {} generated pages the same as the regexes (per link), which leave {} links '
+          'unrewritten on pages with many links per line'.format(2 * pages + 1, missed))
+
+
+def benchmark(transform, rng, size, repeat):
+    replace = transform.TITLE_REPLACE
+    for link_per_line in [True, False]:
+        html = page(rng, 1, link_per_line)
+        while len(html) < size:
+            html = page(rng, 2 * html.count('<li '), link_per_line)
+        report('Large page, {} ({} KB)'.format('a link per line' if link_per_line else
+                                               'single line of members', len(html) // 1024),
+               best_time(lambda: reference_transform(html, TITLE, replace), repeat),
+               best_time(lambda: transform.transform_html(html, TITLE), repeat), len(html) / 1024, 'KB')
+
+    # an unclosed attribute on a long line makes the greedy groups backtrack
+    # from every link to the end of the line and back, in cubic time
+    pathological = '<a href="x' * UNCLOSED_LINKS
+    report('Unclosed links on one line ({} links)'.format(UNCLOSED_LINKS),
+           best_time(lambda: reference_transform(pathological, TITLE, replace), 1),
+           best_time(lambda: transform.transform_html(pathological, TITLE), repeat),
+           len(pathological) / 1024, 'KB')
+    pathological = '<a href="x' * (size // len('<a href="x'))
+    print('    - optimized on {} KB: {:.3f} s'.format(
+        len(pathological) // 1024, best_time(lambda: transform.transform_html(pathological, TITLE), repeat)))
+
+
+# Run script
+if __name__ == '__main__':
+    main()
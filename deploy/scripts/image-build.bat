@@ -109,7 +109,7 @@ copy "%deploy_root%\%start_script%" "%dist_target%\%start_script%" > nul
 if NOT "!--transform-docs!"=="" (
   PUSHD %dist_target%
   echo %intermediate_prefix% Transforming docs files
-  py %~dp0%transform-script% %CD%\%dist_target%\%docs_root%
+  py %~dp0%transform-script% %CD%\%dist_target%\%docs_root% --jobs --compress --no-manifest
   POPD
 )
 
@@ -1,10 +1,37 @@
 from pathlib import Path
+from multiprocessing import Pool
+import functools
+import hashlib
+import gzip
+import json
+import io
 import re
 import os
 import sys
 
-DOCS_ROOT = sys.argv[1]
-TITLE_REGEX = r'<title>[ ]*<[/]title>'
+HELP = """
+transform-docs.py
+
+Usage:
+  transform-docs.py <docs_root> [options]
+
+Options:
+  -h --help         Show this help description
+  -j --jobs [N]     Transform pages in N parallel processes (defaults to
+                    the number of CPUs when N is omitted)
+  -f --force        Transform every page, even those the manifest records
+                    as already transformed
+  --manifest FILE   Where to record the hash of each transformed page
+                    (defaults to .transform-manifest.json in docs_root)
+  --no-manifest     Neither read nor write a manifest, for docs that are
+                    freshly unpacked on every build
+  -c --compress     Minify pages, write .gz and .br copies of each compressed
+                    at the highest level alongside it, and list the hash of
+                    each page in asset-manifest.json in docs_root for
+                    serving. The .br copies are optional: they need brotli
+                    (pip install -r requirements.txt beside this script),
+                    and only .gz copies are written without it"""
+
 TITLE_REPLACE = '''<title>CS 2340 Risk | API Docs - {0}</title>
 <link rel="shortcut icon" type="image/png" href="/static/images/favicon.png">
 <meta name="theme-color" content="#103a51">
@@ -18,26 +45,269 @@ TITLE_REPLACE = '''<title>CS 2340 Risk | API Docs - {0}</title>
 <meta property="og:site_name" content="CS 2340 Risk"/>
 <link rel="stylesheet" href="/static/docs/api.css">'''
 REMOVE = '<meta name="description" content="" />'
-LINK_REGEX = r'(<a.*href=".+)([.]html)(.*".*?>)'
-LINK_REPLACE_REGEX = r'\g<1>\g<3>'
+# Comments, scripts and styles (after their <), whose contents are left alone.
+# Tag and attribute names match in any case through character classes, as
+# re.IGNORECASE slows down the search for every tag
+SKIP = (r'!--.*?(?:-->|\Z)|[sS][cC][rR][iI][pP][tT](?=[\s/>]).*?(?:</script|\Z)'
+        r'|[sS][tT][yY][lL][eE](?=[\s/>]).*?(?:</style|\Z)')
+# The attributes of an <a> tag before its first href, with quoted values (which
+# may contain < or >) skipped, stopping at a < outside them so that unclosed
+# tags do not run on into the next. They are matched as an atomic group (the
+# text matched by a lookahead, through a backreference), so that anchors
+# without an href fail at once instead of backtracking through every attribute
+LINK_ATTRIBUTES = (r'''(?=(?P<attributes>(?:[^<>"'\s/]+|[\s/](?![hH][rR][eE][fF][\s=/>])|"[^"]*"|'[^']*')*))'''
+                   r'''(?P=attributes)''')
+# An <a> tag up to the end of the path in its href, where that path ends in
+# .html and is not a link out of the docs. The path stops at a query or
+# fragment, or at the end of the (double, single or un-) quoted value
+LINK = (r'''[aA](?=[\s/>]){}[\s/][hH][rR][eE][fF]\s*=\s*(?:(?P<double>")|(?P<single>')|)'''
+        r'''(?![a-zA-Z][a-zA-Z0-9+.-]*:|//)(?(double)[^"?#]*|(?(single)[^'?#]*|[^\s>"'?#]*))'''
+        r'''(?=[.]html(?:[?#]|(?(double)"|(?(single)'|[\s>]))))''').format(LINK_ATTRIBUTES)
+# Comments, scripts, styles and links to other pages, each replaced by a < and
+# its group keep (so links lose the .html extension that follows it), or an
+# empty <title>, with nothing but spaces between its tags
+REWRITE_REGEX = re.compile(r'<(?:(?P<keep>{}|(?P<link>{}))(?(link)[.]html)|[tT][iI][tT][lL][eE]>[ ]*</title>)'
+                           .format(SKIP, LINK), re.DOTALL)
+# Whitespace between tags that starts a new line, or a <pre> or <textarea>
+# whose whitespace is kept, when minifying
+MINIFY_REGEX = re.compile(r'(<(pre|textarea)[\s>].*?(?:</\2\s*>|\Z))|(?<=>)[ \t\r]*\n\s*(?=<)',
+                          re.IGNORECASE | re.DOTALL)
+MANIFEST_FILE = '.transform-manifest.json'
+# Content hash and precompressed copies of each page, read by FileController
+ASSET_MANIFEST_FILE = 'asset-manifest.json'
+# Extension of the precompressed copy of a page, by content encoding
+COMPRESSED_EXTENSIONS = {'br': '.br', 'gzip': '.gz'}
+# Pages handed to each worker at a time
+CHUNK_SIZE = 16
+# Hashes of the pages as last transformed, set in each worker process
+MANIFEST = {}
+
+TRANSFORMED = 'transformed'
+UNCHANGED = 'unchanged'
+SKIPPED = 'skipped'
 
 
 def main():
-    print('                 - Searching {}'.format(DOCS_ROOT))
-    file_path_list = Path(DOCS_ROOT).glob('**/*.html')
-    for path in file_path_list:
-        # because path is object not string
-        path_in_str = str(path)
-        title = resolve_title(path_in_str)
-        print("                 - Transforming {}".format(path_in_str))
-        with open(path_in_str, 'r+') as file:
-            html = file.read()
-            replace = TITLE_REPLACE.format(title)
-            html = re.sub(TITLE_REGEX, replace, html)
-            html = re.sub(LINK_REGEX, LINK_REPLACE_REGEX, html)
+    if '--help' in sys.argv or '-h' in sys.argv or len(sys.argv) < 2:
+        # Display help and stop
+        print(HELP)
+        quit()
+
+    docs_root = sys.argv[1]
+    jobs = parse_jobs()
+    force = '--force' in sys.argv or '-f' in sys.argv
+    compress = '--compress' in sys.argv or '-c' in sys.argv
+    manifest_path = parse_manifest_path(docs_root)
+    if compress and brotli_module() is None:
+        print('                 - brotli is not installed (pip install -r {}), so only .gz copies are '
+              'written'.format(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'requirements.txt')))
+    print('                 - Searching {}'.format(docs_root))
+    paths = sorted(str(path) for path in Path(docs_root).glob('**/*.html'))
+
+    # pages whose current contents hash to what was last written are
+    # already transformed
+    manifest = {} if force or manifest_path is None else load_manifest(manifest_path, compress)
+    transform = functools.partial(transform_page, docs_root=docs_root, compress=compress)
+    if jobs > 1 and len(paths) > 1:
+        # each worker receives the manifest once rather than with every page
+        with Pool(min(jobs, len(paths)), initializer=set_manifest, initargs=(manifest,)) as pool:
+            results = list(pool.imap_unordered(transform, paths, CHUNK_SIZE))
+    else:
+        set_manifest(manifest)
+        results = [transform(path) for path in paths]
+
+    counts = {TRANSFORMED: 0, UNCHANGED: 0, SKIPPED: 0}
+    hashes = {}
+    assets = {}
+    for key, digest, status, encodings in sorted(results):
+        hashes[key] = digest
+        assets[key] = {'hash': digest, 'encodings': encodings}
+        counts[status] += 1
+        if status == TRANSFORMED:
+            print('                 - Transformed {}'.format(os.path.join(docs_root, key)))
+    print('                 - Transformed {} pages ({} already up to date, {} skipped through the '
+          'manifest)'.format(counts[TRANSFORMED], counts[UNCHANGED], counts[SKIPPED]))
+    if manifest_path is not None:
+        save_manifest(manifest_path, hashes, compress)
+    save_asset_manifest(os.path.join(docs_root, ASSET_MANIFEST_FILE), assets if compress else None)
+
+
+def parse_jobs():
+    for flag in ['--jobs', '-j']:
+        if flag in sys.argv:
+            index = sys.argv.index(flag)
+            if index + 1 < len(sys.argv) and sys.argv[index + 1].isdigit():
+                return max(1, int(sys.argv[index + 1]))
+            return os.cpu_count() or 1
+    return 1
+
+
+def parse_manifest_path(docs_root):
+    if '--no-manifest' in sys.argv:
+        return None
+    if '--manifest' in sys.argv:
+        index = sys.argv.index('--manifest')
+        if index + 1 < len(sys.argv):
+            return sys.argv[index + 1]
+    return os.path.join(docs_root, MANIFEST_FILE)
+
+
+def load_manifest(path, compress):
+    # pages transformed with and without compression differ
+    try:
+        with open(path, 'r') as manifest_file:
+            manifest = json.load(manifest_file)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get('compress') != compress:
+        return {}
+    return manifest.get('pages', {})
+
+
+def save_manifest(path, manifest, compress):
+    save_json(path, {'compress': compress, 'pages': manifest})
+
+
+def save_asset_manifest(path, assets):
+    """
+    Writes the sha256 hash of every page, and the content encodings it has
+    precompressed copies in, for the server to tag and negotiate
+    them. Without compression (assets is None) the manifest is removed
+    """
+    if assets is not None:
+        save_json(path, assets)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def save_json(path, data):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as json_file:
+        json.dump(data, json_file, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def set_manifest(manifest):
+    global MANIFEST
+    MANIFEST = manifest
+
+
+def transform_page(path, docs_root, compress=False):
+    """
+    Transforms a single page in place, returning its path relative to the
+    docs root, the hash of its transformed contents, whether it was
+    transformed, already up to date or skipped through the manifest, and the
+    content encodings it has precompressed copies in. Pages are only
+    rewritten when their contents change, so their modification times (and
+    image build layers) are left alone otherwise
+    """
+    # pages are globbed from the docs root, so their paths start with it
+    key = path[len(os.path.join(docs_root, '')):].replace(os.sep, '/')
+    with open(path, 'r+b') as file:
+        raw = file.read()
+        digest = hashlib.sha256(raw).hexdigest()
+        if MANIFEST.get(key) == digest:
+            # the copies were written along with the page
+            return key, digest, SKIPPED, compressed_encodings(path)
+
+        # decode and encode like a file opened in text mode would
+        html = io.TextIOWrapper(io.BytesIO(raw)).read()
+        transformed = transform_html(html, resolve_title(path))
+        if compress:
+            transformed = minify_html(transformed)
+        if transformed == html:
+            output = raw
+            status = UNCHANGED
+        else:
+            buffer = io.BytesIO()
+            writer = io.TextIOWrapper(buffer, write_through=True)
+            writer.write(transformed)
+            output = buffer.getvalue()
             file.seek(0)
-            file.write(html)
+            file.write(output)
             file.truncate()
+            digest = hashlib.sha256(output).hexdigest()
+            status = TRANSFORMED
+    return key, digest, status, write_compressed(path, output if compress else None)
+
+
+def minify_html(html):
+    """
+    Drops the indentation and blank lines between tags, leaving a single
+    line break (which renders the same), except within <pre> and <textarea>
+    """
+    return MINIFY_REGEX.sub(lambda match: match.group(1) or '\n', html)
+
+
+def write_compressed(path, content):
+    """
+    Writes a copy of the content next to path in each content encoding that
+    makes it smaller, compressed at the highest level, or removes the copies
+    of an earlier run if content is None. Returns the encodings written.
+    Copies that already hold the same bytes are left alone, like unchanged
+    pages
+    """
+    compressed = {} if content is None else compress_content(content)
+    for encoding, extension in COMPRESSED_EXTENSIONS.items():
+        if encoding in compressed:
+            if not has_contents(path + extension, compressed[encoding]):
+                temp_path = path + extension + '.tmp'
+                with open(temp_path, 'wb') as compressed_file:
+                    compressed_file.write(compressed[encoding])
+                os.replace(temp_path, path + extension)
+        elif os.path.exists(path + extension):
+            os.remove(path + extension)
+    return sorted(compressed)
+
+
+def has_contents(path, content):
+    # only files of the same size are read to compare
+    try:
+        if os.path.getsize(path) != len(content):
+            return False
+        with open(path, 'rb') as file:
+            return file.read() == content
+    except OSError:
+        return False
+
+
+def compressed_encodings(path):
+    return sorted(encoding for encoding, extension in COMPRESSED_EXTENSIONS.items()
+                  if os.path.exists(path + extension))
+
+
+def compress_content(content):
+    # no timestamp in the gzip header, so unchanged pages compress the same
+    compressed = {'gzip': gzip.compress(content, compresslevel=9, mtime=0)}
+    brotli = brotli_module()
+    if brotli is not None:
+        compressed['br'] = brotli.compress(content, quality=11, mode=brotli.MODE_TEXT)
+    return {encoding: data for encoding, data in compressed.items() if len(data) < len(content)}
+
+
+def brotli_module():
+    try:
+        import brotli
+        return brotli
+    except ImportError:
+        return None
+
+
+def transform_html(html, title):
+    """
+    Fills in the empty <title> of a page and drops the .html extension from
+    the links to other pages, leaving comments, scripts and styles alone.
+    Only the href values of <a> tags are edited, so every link is rewritten
+    however many share a line. Both are made in a single regex substitution,
+    whose search skips from one candidate tag to the next without
+    backtracking, so the time taken is linear in the size of the page
+    """
+    replacement = TITLE_REPLACE.format(title)
+
+    def rewrite(match):
+        keep = match.group('keep')
+        return replacement if keep is None else '<' + keep
+    return REWRITE_REGEX.sub(rewrite, html)
 
 
 def resolve_title(path):
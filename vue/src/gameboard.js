@@ -0,0 +1,169 @@
+// Decoder for the compact binary gameboard written by data/encoder.py (see
+// data/gameboard.py for the layout), received as a binary websocket frame.
+// Produces the same object as the gameboard field of the SendGameboard packet
+
+const MAGIC = 'RSKB';
+const VERSION = 5;
+
+class Reader {
+  constructor(bytes) {
+    this.bytes = bytes;
+    this.view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+    this.offset = 0;
+  }
+
+  byte() {
+    return this.bytes[this.offset++];
+  }
+
+  int() {
+    const value = this.view.getInt32(this.offset, true);
+    this.offset += 4;
+    return value;
+  }
+
+  float() {
+    const value = this.view.getFloat32(this.offset, true);
+    this.offset += 4;
+    return value;
+  }
+
+  ints(count) {
+    const values = [];
+    for (let i = 0; i < count; i++) values.push(this.int());
+    return values;
+  }
+
+  location() {
+    const a = this.float();
+    return {a: a, b: this.float()};
+  }
+
+  varint() {
+    // plain arithmetic instead of bitwise operators, which truncate to 32 bits
+    let value = 0;
+    let scale = 1;
+    let byte;
+    do {
+      byte = this.byte();
+      value += (byte & 0x7F) * scale;
+      scale *= 128;
+    } while (byte >= 0x80);
+    return value;
+  }
+
+  path() {
+    const commands = [];
+    const count = this.varint();
+    for (let i = 0; i < count; i++) {
+      const command = String.fromCharCode(this.byte());
+      commands.push([command, this.varint()]);
+    }
+    let path = '';
+    commands.forEach(([command, count]) => {
+      path += command;
+      for (let i = 0; i < count; i++) {
+        const value = this.varint();
+        const negative = Math.floor(value / 8) % 2 === 1;
+        // numbers are only separated when they would otherwise run together
+        if (i > 0 && !negative) path += ' ';
+        path += (negative ? '-' : '') + fixedPoint(Math.floor(value / 16), value % 8);
+      }
+    });
+    return path;
+  }
+}
+
+const fixedPoint = (digits, decimals) => {
+  const text = digits.toString();
+  if (decimals === 0) return text;
+  const padded = text.padStart(decimals + 1, '0');
+  return padded.slice(0, -decimals) + '.' + padded.slice(-decimals);
+};
+
+export const decodeGameboard = (buffer) => {
+  const reader = new Reader(new Uint8Array(buffer));
+  const magic = String.fromCharCode(...reader.bytes.subarray(0, MAGIC.length));
+  reader.offset = MAGIC.length;
+  if (magic !== MAGIC || reader.byte() !== VERSION) {
+    throw new Error(`Not a version ${VERSION} binary gameboard`);
+  }
+  const nodeCount = reader.int();
+  const edgeCount = reader.int();
+  const waterCount = reader.int();
+  const regionCount = reader.int();
+  const size = reader.location();
+
+  const nodes = [];
+  for (let i = 0; i < nodeCount; i++) {
+    nodes.push({center: reader.location(), dto: {connections: []}});
+  }
+  const castleFlags = nodes.map(() => reader.byte() !== 0);
+  castleFlags.forEach((flag, i) => {
+    if (flag) nodes[i].dto.castle = reader.location();
+  });
+  nodes.forEach(node => {
+    node.path = reader.path();
+    node.iconPath = reader.path();
+  });
+  for (let i = 0; i < edgeCount; i++) {
+    const a = reader.int();
+    const b = reader.int();
+    // connections are sets on the server
+    if (!nodes[a].dto.connections.includes(b)) nodes[a].dto.connections.push(b);
+    if (!nodes[b].dto.connections.includes(a)) nodes[b].dto.connections.push(a);
+  }
+  const regions = [];
+  for (let i = 0; i < regionCount; i++) {
+    const first = reader.int();
+    const last = reader.int();
+    const region = [];
+    for (let n = first; n <= last; n++) region.push(n);
+    regions.push(region);
+  }
+  const waterConnections = [];
+  for (let i = 0; i < waterCount; i++) {
+    const a = reader.int();
+    const b = reader.int();
+    const tension = reader.float();
+    const midpoints = [];
+    const count = reader.varint();
+    for (let m = 0; m < count; m++) {
+      const x = reader.float();
+      midpoints.push([x, reader.float()]);
+    }
+    waterConnections.push({a: a, b: b, midpoints: midpoints, bz: false, tension: tension});
+  }
+  const offsets = reader.ints(nodeCount + 1);
+  const graph = {
+    offsets: offsets,
+    neighbours: reader.ints(offsets[nodeCount]),
+    components: reader.ints(nodeCount)
+  };
+  graph.borders = reader.ints(reader.varint());
+  const lodTolerances = [];
+  const tierCount = reader.byte();
+  for (let i = 0; i < tierCount; i++) lodTolerances.push(reader.float());
+  nodes.forEach(node => {
+    node.lodPaths = lodTolerances.map(() => reader.path());
+  });
+  const bounds = nodes.map(() => [reader.float(), reader.float(), reader.float(), reader.float()]);
+  const hitGrid = {
+    width: reader.float(),
+    height: reader.float(),
+    columns: reader.int(),
+    rows: reader.int(),
+    bounds: bounds
+  };
+  hitGrid.offsets = reader.ints(hitGrid.columns * hitGrid.rows + 1);
+  hitGrid.territories = reader.ints(hitGrid.offsets[hitGrid.offsets.length - 1]);
+  return {
+    nodes: nodes,
+    regions: regions,
+    waterConnections: waterConnections,
+    size: size,
+    lodTolerances: lodTolerances,
+    graph: graph,
+    hitGrid: hitGrid
+  };
+};
@@ -1,17 +1,39 @@
 // noinspection ES6UnusedImports
 import Vue from 'vue';
 import Vuex from 'vuex';
-import {ON_SEND_GAMEBOARD, ON_UPDATE_PLAYER_STATE, ON_UPDATE_BOARD_STATE,
+import {ON_SEND_GAMEBOARD, ON_SEND_BINARY_GAMEBOARD, ON_UPDATE_PLAYER_STATE, ON_UPDATE_BOARD_STATE,
         INCREMENT_TROOP, SUBMIT_REINFORCEMENTS, UNSUBMIT_REINFORCEMENTS,
         UPDATE_ATTACK_TERRITORY, UPDATE_DEFEND_TERRITORY, RESET_ATTACK,
         UPDATE_MOVE_ORIGIN, UPDATE_MOVE_TARGET, CLEAR_PLACEMENT} from '.././mutation-types';
  import {ADD_TROOPS} from '.././action-types';
 import {initializeGameboardScreen, NETWORK_CTX} from "./game/InitializeGameboardScreen";
 import {seqStringToArray, specialSeqToArray} from '../.././util.js'
+import {decodeGameboard} from '../.././gameboard.js'
 import {UPDATE_ATTACKERS, UPDATE_DEFENDERS, UPDATE_DEFENDING_PLAYER_INDEX, UPDATE_ATTACKING_PLAYER_INDEX} from "../mutation-types";
 
 Vue.use(Vuex);
 
+const setGameboard = (state, gameboard) => {
+  state.gameboard.nodeCount        = gameboard.nodes.length;
+  state.gameboard.regions          = gameboard.regions;
+  state.gameboard.waterConnections = gameboard.waterConnections;
+  state.gameboard.size             = gameboard.size;
+
+  state.gameboard.territories      = gameboard.nodes.map(n => n.dto);
+  state.gameboard.pathData         = gameboard.nodes.map(n => n.path);
+  state.gameboard.lodData          = gameboard.nodes.map(n => n.lodPaths || []);
+  state.gameboard.lodTolerances    = gameboard.lodTolerances || [];
+  state.gameboard.iconData         = gameboard.nodes.map(n => n.iconPath);
+  state.gameboard.centers          = gameboard.nodes.map(n => n.center);
+  state.gameboard.castles          = gameboard.nodes
+    .map   ((n, i) => { return {
+      elem:  n,
+      index: i
+    };})
+    .filter(n => 'castle' in n.elem.dto)
+    .map   (n => n.index);
+};
+
 export default {
   state: {
     playerStateList: [],
@@ -31,6 +53,8 @@ export default {
     gameboard: {
       nodeCount: 0,
       pathData: [],
+      lodData: [],
+      lodTolerances: [],
       iconData: [],
       waterConnections: [],
       centers: [],
@@ -121,22 +145,13 @@ export default {
     },
     [ON_SEND_GAMEBOARD](state, data) {
       if ('gameboard' in data) {
-        state.gameboard.nodeCount        = data.gameboard.nodes.length;
-        state.gameboard.regions          = data.gameboard.regions;
-        state.gameboard.waterConnections = data.gameboard.waterConnections;
-        state.gameboard.size             = data.gameboard.size;
-
-        state.gameboard.territories      = data.gameboard.nodes.map(n => n.dto);
-        state.gameboard.pathData         = data.gameboard.nodes.map(n => n.path);
-        state.gameboard.iconData         = data.gameboard.nodes.map(n => n.iconPath);
-        state.gameboard.centers          = data.gameboard.nodes.map(n => n.center);
-        state.gameboard.castles          = data.gameboard.nodes
-          .map   ((n, i) => { return {
-            elem:  n,
-            index: i
-          };})
-          .filter(n => 'castle' in n.elem.dto)
-          .map   (n => n.index);
+        setGameboard(state, data.gameboard);
+      }
+      initializeGameboardScreen(NETWORK_CTX);
+    },
+    [ON_SEND_BINARY_GAMEBOARD](state, data) {
+      if ('data' in data) {
+        setGameboard(state, decodeGameboard(data.data));
       }
       initializeGameboardScreen(NETWORK_CTX);
     },
@@ -38,5 +38,6 @@ export const ON_UPDATE_PLAYER_STATE = 'ON_UPDATE_PLAYER_STATE';
 export const ON_PING_PLAYER = 'ON_PING_PLAYER';
 export const ON_SEND_CONFIG = 'ON_SEND_CONFIG';
 export const ON_SEND_GAMEBOARD = 'ON_SEND_GAMEBOARD';
+export const ON_SEND_BINARY_GAMEBOARD = 'ON_SEND_BINARY_GAMEBOARD';
 export const ON_UPDATE_BOARD_STATE = 'ON_UPDATE_BOARD_STATE';
 export const ON_SEND_ATTACK_RESULT = 'ON_SEND_ATTACK_RESULT'; 
\ No newline at end of file